@@ -0,0 +1,117 @@
+# assets.py
+
+"""
+Registry of bundled images (welcome/log pictures, the market fallback, the
+default card image) and the Telegram file_ids they were uploaded as.
+
+The first send of a local file uploads it and stores the returned file_id
+under the file's sha256; every later send reuses the id, so nothing is read
+from disk or uploaded again until the file's content changes.
+"""
+
+import hashlib
+import os
+
+from pyrogram.errors import BadRequest
+
+from database import get_db
+
+ASSET_DIRS = ("", "assets")
+MEDIA_ATTRS = ("photo", "video", "animation", "document")
+
+
+def _candidates(name):
+    for folder in ASSET_DIRS:
+        yield os.path.join(folder, name)
+
+
+def _sent_file_id(message):
+    for attr in MEDIA_ATTRS:
+        media = getattr(message, attr, None)
+        if media is not None:
+            return media.file_id
+    return None
+
+
+class AssetRegistry:
+    def __init__(self, db):
+        self.db = db
+        self._paths = {}    # name -> resolved path, or None if it isn't a local file
+        self._digests = {}  # path -> (mtime_ns, size, sha256)
+        rows = db.read_blocking(lambda conn: conn.execute("SELECT sha256, file_id FROM uploaded_assets").fetchall())
+        self._ids = dict(rows)  # sha256 -> file_id
+
+    # ---------------- Lookups ----------------
+    def locate(self, name):
+        """Path of a bundled file, or None when `name` is not a local file (e.g. already a file_id)."""
+        if not isinstance(name, str) or "." not in name:
+            return None  # Telegram file_ids never contain a dot
+        if name not in self._paths:
+            self._paths[name] = next((p for p in _candidates(name) if os.path.isfile(p)), None)
+        return self._paths[name]
+
+    def exists(self, name):
+        return self.locate(name) is not None
+
+    def _digest(self, path):
+        st = os.stat(path)
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def file_id(self, name):
+        """Cached file_id for a bundled file's current content, or None."""
+        path = self.locate(name)
+        return self._ids.get(self._digest(path)) if path else None
+
+    # ---------------- Sending ----------------
+    async def send(self, send, media, **kwargs):
+        """
+        `await send(media, **kwargs)`, with a bundled file swapped for its cached
+        file_id. The first send of a file uploads it and remembers the id.
+        """
+        path = self.locate(media)
+        if path is None:
+            return await send(media, **kwargs)
+
+        digest = self._digest(path)
+        file_id = self._ids.get(digest)
+        if file_id:
+            try:
+                return await send(file_id, **kwargs)
+            except BadRequest as e:
+                print(f"⚠️ Cached file_id for {path} rejected ({e}), uploading again")
+                await self._forget(digest)
+
+        message = await send(path, **kwargs)
+        file_id = _sent_file_id(message)
+        if file_id:
+            await self._remember(digest, path, file_id)
+        return message
+
+    async def _remember(self, digest, path, file_id):
+        self._ids[digest] = file_id
+        await self.db.execute(
+            "INSERT OR REPLACE INTO uploaded_assets (sha256, path, file_id) VALUES (?, ?, ?)",
+            (digest, path, file_id)
+        )
+
+    async def _forget(self, digest):
+        self._ids.pop(digest, None)
+        await self.db.execute("DELETE FROM uploaded_assets WHERE sha256=?", (digest,))
+
+
+# ---------------- Shared instance ----------------
+_assets = None
+
+
+def get_assets():
+    """Return the process-wide AssetRegistry, loading it on first use."""
+    global _assets
+    if _assets is None:
+        _assets = AssetRegistry(get_db())
+    return _assets
@@ -0,0 +1,314 @@
+# broadcast.py
+
+"""
+Throttled, resumable broadcasts for /announce.
+
+A job is a broadcast_jobs row plus one broadcast_recipients row per chat,
+written up front. A runner walks the pending recipients in chat_id order
+(keyset, so a restart resumes where it stopped) and feeds a small worker pool;
+every send first takes a token from one global bucket, and a FloodWait stops
+the whole bucket for the requested time. Results are written back in batches.
+Chats that turn out to be blocked or deleted are flagged in users/groups and
+left out of later jobs.
+"""
+
+import asyncio
+import time
+
+from pyrogram.errors import (
+    FloodWait, UserIsBlocked, InputUserDeactivated, ChatWriteForbidden, ChannelPrivate,
+)
+
+from config import Config, app
+from database import get_db, hot_query
+import lifecycle
+
+# broadcast_recipients.state
+PENDING, SENT, FAILED, PRUNED = 0, 1, 2, 3
+
+# Errors that mean the chat will never accept a message from us again. Peer
+# errors such as PeerIdInvalid are left out: they also fire for chats this
+# session hasn't resolved yet (new session, user never wrote to it), so they
+# only fail the recipient for this job.
+DEAD_CHAT_ERRORS = (UserIsBlocked, InputUserDeactivated, ChatWriteForbidden, ChannelPrivate)
+
+MAX_ATTEMPTS = 3          # per recipient, FloodWaits included
+BATCH_SIZE = 200          # recipients pulled from SQLite per query
+FLUSH_SECONDS = 2         # how often results are written back
+PROGRESS_SECONDS = 15     # how often the status message is edited
+FIRST_CHAT_ID = -(2 ** 63)
+
+PENDING_SQL = hot_query("broadcast.pending", """
+    SELECT chat_id FROM broadcast_recipients
+     WHERE job_id = ? AND chat_id > ? AND state = 0
+     ORDER BY chat_id
+     LIMIT ?
+""", (1, FIRST_CHAT_ID, BATCH_SIZE))
+
+STATUS_LABELS = {
+    "running": "📤 Sending...",
+    "paused": "⏸️ Paused",
+    "cancelled": "🛑 Cancelled",
+    "done": "✅ Complete!",
+}
+
+
+class TokenBucket:
+    """
+    `rate` sends per second with bursts up to `capacity`. Telegram allows a bot
+    roughly 30 messages/s overall; the per-chat limits (1/s, 20/min in groups)
+    can't be hit by a broadcast because each chat gets one message per job.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds):
+        """FloodWait: nobody sends for `seconds`."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def progress_text(job):
+    job_id, status, total, sent, failed, pruned = job
+    return (
+        f"📢 Announcement #{job_id} — {STATUS_LABELS.get(status, status)}\n\n"
+        f"✅ Sent: {sent}\n❌ Failed: {failed}\n🧹 Pruned: {pruned}\n"
+        f"📊 Progress: {sent + failed + pruned}/{total}"
+    )
+
+
+def queued_text(job_id):
+    return (
+        f"📢 Announcement #{job_id} queued!\n"
+        f"Use /bstatus {job_id}, /bpause {job_id} or /bcancel {job_id} to manage it."
+    )
+
+
+class Broadcaster:
+    def __init__(self, db, rate=Config.BROADCAST_RATE, workers=Config.BROADCAST_WORKERS):
+        self.db = db
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self._status = {}   # job_id -> status, for jobs with a runner in this process
+        self._runners = {}  # job_id -> asyncio.Task
+
+    # ---------------- Jobs ----------------
+    async def create(self, kind, text, file_id, status_chat_id, status_message_id):
+        """
+        Snapshot every reachable user and group into a new job and start it.
+        The status message is set to "queued" before the runner starts, so
+        the runner's progress edits always come after it.
+        """
+        def _create(conn):
+            job_id = conn.execute("""
+                INSERT INTO broadcast_jobs (kind, text, file_id, status, status_chat_id, status_message_id)
+                VALUES (?, ?, ?, 'running', ?, ?)
+            """, (kind, text, file_id, status_chat_id, status_message_id)).lastrowid
+            conn.execute("""
+                INSERT OR IGNORE INTO broadcast_recipients (job_id, chat_id)
+                SELECT ?, user_id FROM users WHERE blocked = 0
+                UNION
+                SELECT ?, chat_id FROM groups WHERE blocked = 0
+            """, (job_id, job_id))
+            total = conn.execute("SELECT COUNT(*) FROM broadcast_recipients WHERE job_id=?", (job_id,)).fetchone()[0]
+            conn.execute("UPDATE broadcast_jobs SET total=? WHERE id=?", (total, job_id))
+            return job_id
+        job_id = await self.db.write(_create)
+        try:
+            await app.edit_message_text(status_chat_id, status_message_id, queued_text(job_id))
+        except Exception:
+            pass  # message deleted: the job runs anyway
+        self._start(job_id)
+        return job_id
+
+    async def get(self, job_id):
+        return await self.db.fetchone(
+            "SELECT id, status, total, sent, failed, pruned FROM broadcast_jobs WHERE id=?", (job_id,)
+        )
+
+    async def latest(self):
+        return await self.db.fetchone(
+            "SELECT id, status, total, sent, failed, pruned FROM broadcast_jobs ORDER BY id DESC LIMIT 1"
+        )
+
+    async def set_status(self, job_id, status):
+        """Pause, resume or cancel. Returns False if the job is unknown or already finished."""
+        allowed = {"paused": ("running",), "running": ("paused",), "cancelled": ("running", "paused")}[status]
+        cur = await self.db.execute(
+            f"UPDATE broadcast_jobs SET status=? WHERE id=? AND status IN ({','.join('?' * len(allowed))})",
+            (status, job_id, *allowed)
+        )
+        if cur.rowcount != 1:
+            return False
+        self._status[job_id] = status
+        if status == "running":
+            self._start(job_id)
+        elif status == "cancelled" and job_id not in self._runners:
+            await self._finish(job_id, "cancelled")
+        return True
+
+    def _start(self, job_id):
+        self._status[job_id] = "running"
+        task = self._runners.get(job_id)
+        if task is None or task.done():
+            self._runners[job_id] = asyncio.create_task(self._run(job_id))
+
+    # ---------------- Runner ----------------
+    async def _run(self, job_id):
+        job = await self.db.fetchone(
+            "SELECT kind, text, file_id, status_chat_id, status_message_id FROM broadcast_jobs WHERE id=?", (job_id,)
+        )
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        results = []  # (state, chat_id) not yet written back
+        workers = [asyncio.create_task(self._worker(job, queue, results)) for _ in range(self.workers)]
+        ticker = asyncio.create_task(self._ticker(job_id, job, results))
+        cursor = FIRST_CHAT_ID
+        try:
+            while self._status.get(job_id) == "running":
+                batch = await self.db.fetchall(PENDING_SQL, (job_id, cursor, BATCH_SIZE))
+                if not batch:
+                    break
+                for (chat_id,) in batch:
+                    if self._status.get(job_id) != "running":
+                        break
+                    await queue.put(chat_id)
+                cursor = batch[-1][0]
+            await queue.join()
+        finally:
+            ticker.cancel()
+            for w in workers:
+                w.cancel()
+            await self._flush(job_id, results)
+            self._runners.pop(job_id, None)
+
+        status = self._status.get(job_id)
+        if status == "running":
+            if await self.db.fetchone(PENDING_SQL, (job_id, FIRST_CHAT_ID, 1)):
+                # Resumed while this runner was winding down from a pause
+                self._start(job_id)
+                return
+            status = "done"
+        if status in ("done", "cancelled"):
+            await self._finish(job_id, status)
+        await self._report(job_id, job)
+
+    async def _worker(self, job, queue, results):
+        while True:
+            chat_id = await queue.get()
+            try:
+                results.append((await self._deliver(job, chat_id), chat_id))
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, job, chat_id):
+        for _ in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            try:
+                await self._send(job, chat_id)
+                return SENT
+            except FloodWait as e:
+                self.bucket.block(e.value + 1)
+            except DEAD_CHAT_ERRORS:
+                return PRUNED
+            except Exception as e:
+                print(f"❌ Broadcast to {chat_id} failed: {e}")
+                return FAILED
+        return FAILED
+
+    async def _send(self, job, chat_id):
+        kind, text, file_id = job[0], job[1], job[2]
+        if kind == "photo":
+            await app.send_photo(chat_id, file_id, caption=text)
+        elif kind == "video":
+            await app.send_video(chat_id, file_id, caption=text)
+        else:
+            await app.send_message(chat_id, text)
+
+    async def _ticker(self, job_id, job, results):
+        last_progress = time.monotonic()
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            await self._flush(job_id, results)
+            if time.monotonic() - last_progress >= PROGRESS_SECONDS:
+                last_progress = time.monotonic()
+                await self._report(job_id, job)
+
+    # ---------------- Persistence ----------------
+    async def _flush(self, job_id, results):
+        if not results:
+            return
+        batch = results[:]
+        del results[:]
+
+        def _apply(conn):
+            conn.executemany(
+                "UPDATE broadcast_recipients SET state=? WHERE job_id=? AND chat_id=?",
+                [(state, job_id, chat_id) for state, chat_id in batch]
+            )
+            pruned = [(chat_id,) for state, chat_id in batch if state == PRUNED]
+            conn.executemany("UPDATE users SET blocked=1 WHERE user_id=?", pruned)
+            conn.executemany("UPDATE groups SET blocked=1 WHERE chat_id=?", pruned)
+            counts = [sum(1 for state, _ in batch if state == s) for s in (SENT, FAILED, PRUNED)]
+            conn.execute(
+                "UPDATE broadcast_jobs SET sent=sent+?, failed=failed+?, pruned=pruned+? WHERE id=?",
+                (*counts, job_id)
+            )
+        await self.db.write(_apply)
+
+    async def _finish(self, job_id, status):
+        def _apply(conn):
+            conn.execute(
+                "UPDATE broadcast_jobs SET status=?, finished_at=strftime('%s','now') WHERE id=?", (status, job_id)
+            )
+            # Counters live on the job row; the per-chat queue is no longer needed
+            conn.execute("DELETE FROM broadcast_recipients WHERE job_id=?", (job_id,))
+        await self.db.write(_apply)
+        self._status.pop(job_id, None)
+
+    async def _report(self, job_id, job):
+        info = await self.get(job_id)
+        if not info or not job[3]:
+            return
+        try:
+            await app.edit_message_text(job[3], job[4], progress_text(info))
+        except Exception:
+            pass  # message deleted or unchanged
+
+    # ---------------- Lifecycle ----------------
+    async def resume_all(self):
+        rows = await self.db.fetchall("SELECT id FROM broadcast_jobs WHERE status='running'")
+        for (job_id,) in rows:
+            print(f"📢 Resuming announcement #{job_id}")
+            self._start(job_id)
+
+    async def stop(self):
+        # Jobs stay 'running' in the table and resume on the next start
+        tasks = list(self._runners.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ---------------- Shared instance ----------------
+broadcaster = Broadcaster(get_db())
+lifecycle.on_startup(broadcaster.resume_all)
+lifecycle.on_shutdown(broadcaster.stop)
@@ -0,0 +1,103 @@
+# cache.py
+
+"""
+Small in-process caches.
+
+TTLCache is an LRU-bounded dict whose entries go stale `ttl` seconds after
+they were stored. A stale entry is still served by fetch() while a single
+background task reloads it (stale-while-revalidate), so a hot key never makes
+a caller wait on Telegram or SQLite once it has been loaded.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, stored_at), least recently used first
+        self._loading = {}          # key -> asyncio.Task reloading it
+        self.hits = self.misses = self.stale = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    # ---------------- Plain access ----------------
+    def lookup(self, key):
+        """(value, fresh) for a cached key, (MISSING, False) otherwise."""
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING, False
+        self._data.move_to_end(key)
+        value, stored_at = entry
+        return value, time.monotonic() - stored_at < self.ttl
+
+    def age(self, key):
+        """Seconds since `key` was stored, or None if it isn't cached."""
+        entry = self._data.get(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def get(self, key, default=None):
+        """Fresh cached value, or `default`."""
+        value, fresh = self.lookup(key)
+        return value if fresh else default
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    # ---------------- Loading ----------------
+    async def fetch(self, key, loader):
+        """
+        Cached value for `key`, calling `await loader()` on a miss. A stale value
+        is returned immediately and reloaded in the background; concurrent
+        callers share one load per key.
+        """
+        value, fresh = self.lookup(key)
+        if fresh:
+            self.hits += 1
+            return value
+        if value is not MISSING:
+            self.stale += 1
+            self._start_load(key, loader)
+            return value
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def _start_load(self, key, loader):
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.create_task(self._load(key, loader))
+        return task
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        except Exception as e:
+            print(f"❌ Cache reload of {key!r} failed: {e}")
+            # Keep serving the stale value, if there is one
+            value, _ = self.lookup(key)
+            if value is MISSING:
+                raise
+            return value
+        finally:
+            self._loading.pop(key, None)
@@ -0,0 +1,90 @@
+# card_sampler.py
+
+"""
+Shared random card picker.
+
+Card ids live in memory in buckets keyed by (rarity, is_video). A pick chooses
+a bucket (weighted by its size) and then one index inside it, so it costs the same no matter how big waifu_cards grows, instead of the
+`ORDER BY RANDOM()` sort or a full-table fetchall per pick.
+
+The buckets are built from the catalogue cache and rebuilt lazily on the next
+pick whenever the catalogue reports a change.
+"""
+
+import random
+
+from catalogue import get_catalogue
+
+# Bucket keys to skip for /marry: Cinematic Legend videos are reward-only
+NO_CINEMATIC_VIDEO = frozenset({("Cinematic Legend", True)})
+
+
+class CardSampler:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self._buckets = {}  # (rarity, is_video) -> [card ids]
+        self._stale = True
+        catalogue.subscribe(self._on_change)
+
+    # ---------------- Loading ----------------
+    def _on_change(self, old, new):
+        self._stale = True
+
+    def _ensure_loaded(self):
+        if not self._stale:
+            return
+        buckets = {}
+        for card in self.catalogue.by_id.values():
+            buckets.setdefault((card.rarity, card.is_video), []).append(card.id)
+        self._buckets = buckets
+        self._stale = False
+
+    # ---------------- Filtering ----------------
+    def _candidates(self, rarities=None, video=None, exclude=()):
+        allowed = set(rarities) if rarities is not None else None
+        out = []
+        for key, ids in self._buckets.items():
+            rarity, is_video = key
+            if not ids or key in exclude:
+                continue
+            if allowed is not None and rarity not in allowed:
+                continue
+            if video is not None and is_video != video:
+                continue
+            out.append((rarity, ids))
+        return out
+
+    # ---------------- Public API ----------------
+    def pick(self, rarities=None, video=None, exclude=()):
+        """
+        Return one random card id (or None if nothing matches), every matching
+        card equally likely.
+
+        rarities: only these rarities; video: True/False to filter by media kind;
+        exclude: (rarity, is_video) buckets to skip.
+        """
+        self._ensure_loaded()
+        buckets = self._candidates(rarities, video, exclude)
+        if not buckets:
+            return None
+        _, ids = random.choices(buckets, weights=[len(ids) for _, ids in buckets])[0]
+        return random.choice(ids)
+
+    def fetch_random(self, columns, **filters):
+        """Pick a card and return the comma-separated `columns` of it as a tuple."""
+        wid = self.pick(**filters)
+        if wid is None:
+            return None
+        return self.catalogue.get(wid).values(*(c.strip() for c in columns.split(",")))
+
+
+# ---------------- Shared instance ----------------
+_sampler = None
+
+
+def get_sampler():
+    """Return the process-wide CardSampler, creating it on first use."""
+    global _sampler
+    if _sampler is None:
+        _sampler = CardSampler(get_catalogue())
+    return _sampler
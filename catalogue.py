@@ -0,0 +1,125 @@
+# catalogue.py
+
+"""
+Process-wide card catalogue cache.
+
+The whole waifu_cards table is loaded once at startup into compact Card
+objects, so handler lookups by id / rarity / anime are dict hits and never
+touch SQLite. Handlers that change a card call `await refresh(card_id)` after
+their write; subscribers (the sampler, search index, stats...) are told about
+every change and can update themselves incrementally.
+"""
+
+from bisect import bisect_left, insort
+
+from database import get_db
+
+CARD_FIELDS = ("id", "name", "anime", "rarity", "event", "media_type", "media_file", "media_file_id")
+CARD_SQL = f"SELECT {', '.join(CARD_FIELDS)} FROM waifu_cards"
+
+
+class Card:
+    __slots__ = CARD_FIELDS
+
+    def __init__(self, id, name, anime, rarity, event, media_type, media_file, media_file_id):
+        self.id = id
+        self.name = name
+        self.anime = anime
+        self.rarity = rarity
+        self.event = event
+        self.media_type = media_type
+        self.media_file = media_file
+        self.media_file_id = media_file_id
+
+    @property
+    def is_video(self):
+        return (self.media_type or "").lower() == "video"
+
+    def values(self, *fields):
+        """Tuple of the given fields, for code that unpacks card rows."""
+        return tuple(getattr(self, f) for f in fields)
+
+    def __repr__(self):
+        return f"Card({self.id}, {self.name!r}, {self.rarity!r})"
+
+
+class Catalogue:
+    def __init__(self, db):
+        self.db = db
+        self.by_id = {}       # id -> Card
+        self.by_rarity = {}   # rarity -> sorted [ids]
+        self.by_anime = {}    # anime -> sorted [ids]
+        self.version = 0      # bumped on every change
+        self._listeners = []
+        rows = db.read_blocking(lambda conn: conn.execute(CARD_SQL).fetchall())
+        for row in rows:
+            self._index(Card(*row))
+        print(f"🎴 Loaded {len(self.by_id)} cards into the catalogue")
+
+    # ---------------- Lookups ----------------
+    def get(self, card_id):
+        try:
+            return self.by_id.get(int(card_id))
+        except (TypeError, ValueError):
+            return None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def ids_by_rarity(self, rarity):
+        return self.by_rarity.get(rarity, [])
+
+    def ids_by_anime(self, anime):
+        return self.by_anime.get(anime, [])
+
+    # ---------------- Change notifications ----------------
+    def subscribe(self, fn):
+        """Call fn(old_card, new_card) on every change; either side is None for add/delete."""
+        self._listeners.append(fn)
+        return fn
+
+    async def refresh(self, card_id):
+        """Re-read one card after it was added, edited or deleted."""
+        card_id = int(card_id)
+        row = await self.db.fetchone(f"{CARD_SQL} WHERE id = ?", (card_id,))
+        old = self.by_id.get(card_id)
+        new = Card(*row) if row else None
+        if old is not None:
+            self._unindex(old)
+        if new is not None:
+            self._index(new)
+        self.version += 1
+        for fn in self._listeners:
+            try:
+                fn(old, new)
+            except Exception as e:
+                print(f"❌ Catalogue listener {getattr(fn, '__qualname__', fn)} failed: {e}")
+        return new
+
+    # ---------------- Internals ----------------
+    def _index(self, card):
+        self.by_id[card.id] = card
+        insort(self.by_rarity.setdefault(card.rarity, []), card.id)
+        insort(self.by_anime.setdefault(card.anime, []), card.id)
+
+    def _unindex(self, card):
+        del self.by_id[card.id]
+        for index, key in ((self.by_rarity, card.rarity), (self.by_anime, card.anime)):
+            ids = index.get(key, [])
+            i = bisect_left(ids, card.id)
+            if i < len(ids) and ids[i] == card.id:
+                ids.pop(i)
+            if not ids:
+                index.pop(key, None)
+
+
+# ---------------- Shared instance ----------------
+_catalogue = None
+
+
+def get_catalogue():
+    """Return the process-wide Catalogue, loading it on first use."""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = Catalogue(get_db())
+    return _catalogue
@@ -0,0 +1,81 @@
+# catalogue_stats.py
+
+"""
+Materialized catalogue statistics.
+
+Card counts per anime, rarity, event and media kind are built once from the
+catalogue cache and then kept up to date from its change notifications
+(addwaifu / edit / delcard all go through catalogue.refresh), so /sanime,
+/rarity and /stats read counters instead of running GROUP BY / COUNT(*) over
+waifu_cards. The anime ranking is re-sorted lazily, only after a change.
+"""
+
+from collections import Counter
+
+from catalogue import get_catalogue
+from media import media_kind
+
+
+def _keys(card):
+    return (
+        ("anime", card.anime),
+        ("rarity", card.rarity),
+        ("event", card.event),
+        ("kind", media_kind(card.media_type) or "other"),
+    )
+
+
+class CatalogueStats:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.counts = {"anime": Counter(), "rarity": Counter(), "event": Counter(), "kind": Counter()}
+        self.total = 0
+        self._ranking = None  # [(anime, count)] by count desc, rebuilt after a change
+        for card in catalogue.by_id.values():
+            self._apply(card, 1)
+        catalogue.subscribe(self._on_change)
+
+    # ---------------- Maintenance ----------------
+    def _on_change(self, old, new):
+        if old is not None:
+            self._apply(old, -1)
+        if new is not None:
+            self._apply(new, 1)
+
+    def _apply(self, card, delta):
+        for field, key in _keys(card):
+            counter = self.counts[field]
+            counter[key] += delta
+            if counter[key] <= 0:
+                del counter[key]
+        self.total += delta
+        self._ranking = None
+
+    # ---------------- Lookups ----------------
+    def rarity_count(self, rarity):
+        return self.counts["rarity"].get(rarity, 0)
+
+    def anime_distribution(self, filter_anime=None):
+        """[(anime, count)], most cards first; `filter_anime` keeps names containing it (case-insensitive)."""
+        if self._ranking is None:
+            self._ranking = sorted(self.counts["anime"].items(), key=lambda item: (-item[1], item[0] or ""))
+        if not filter_anime:
+            return self._ranking
+        needle = filter_anime.casefold()
+        return [(anime, count) for anime, count in self._ranking if needle in (anime or "").casefold()]
+
+    def top(self, field, n=None):
+        """[(value, count)] for "rarity", "event" or "kind", most cards first."""
+        return self.counts[field].most_common(n)
+
+
+# ---------------- Shared instance ----------------
+_stats = None
+
+
+def get_catalogue_stats():
+    """Return the process-wide CatalogueStats, building it on first use."""
+    global _stats
+    if _stats is None:
+        _stats = CatalogueStats(get_catalogue())
+    return _stats
@@ -20,6 +20,56 @@ class Config:
     # Database
     # -------------------------------
     DB_PATH = os.environ.get("DB_PATH", "waifu_bot.db")  # default if not set
+    DB_READERS = int(os.environ.get("DB_READERS", 4))  # size of the read connection pool
+
+    # -------------------------------
+    # Card drops
+    # -------------------------------
+    DROP_FLUSH_SECONDS = int(os.environ.get("DROP_FLUSH_SECONDS", 30))    # checkpoint counters at least this often
+    DROP_FLUSH_MESSAGES = int(os.environ.get("DROP_FLUSH_MESSAGES", 200))  # ...or after this many counted messages
+
+    # -------------------------------
+    # Announcements
+    # -------------------------------
+    BROADCAST_RATE = int(os.environ.get("BROADCAST_RATE", 25))       # messages per second, Telegram allows ~30
+    BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", 8))  # concurrent sends
+
+    # -------------------------------
+    # Economy ledger
+    # -------------------------------
+    LEDGER_FLUSH_MS = int(os.environ.get("LEDGER_FLUSH_MS", 50))          # write queued entries at least this often
+    LEDGER_FLUSH_EVENTS = int(os.environ.get("LEDGER_FLUSH_EVENTS", 500))  # ...or as soon as this many are queued
+
+    # -------------------------------
+    # Card media checks
+    # -------------------------------
+    MEDIA_VALIDATE_RATE = int(os.environ.get("MEDIA_VALIDATE_RATE", 50))                 # cards checked per second
+    MEDIA_VALIDATE_INTERVAL = int(os.environ.get("MEDIA_VALIDATE_INTERVAL", 24 * 60 * 60))  # seconds between passes
+
+    # -------------------------------
+    # Inline gallery
+    # -------------------------------
+    INLINE_CACHE_SIZE = int(os.environ.get("INLINE_CACHE_SIZE", 2000))  # result pages kept in memory
+    INLINE_CACHE_TIME = int(os.environ.get("INLINE_CACHE_TIME", 300))   # seconds Telegram may cache an answer
+    INVENTORY_CACHE_USERS = int(os.environ.get("INVENTORY_CACHE_USERS", 1000))   # collections kept in memory
+    INVENTORY_CACHE_ROWS = int(os.environ.get("INVENTORY_CACHE_ROWS", 200000))   # ...and at most this many rows
+
+    # -------------------------------
+    # Pending interactions (gifts, proposals, previews...)
+    # -------------------------------
+    STATE_MAX_ENTRIES = int(os.environ.get("STATE_MAX_ENTRIES", 100000))  # across all handlers, LRU beyond this
+    STATE_SWEEP_TICK = int(os.environ.get("STATE_SWEEP_TICK", 1))         # seconds per timer-wheel slot
+
+    # -------------------------------
+    # Caches
+    # -------------------------------
+    AVATAR_CACHE_SIZE = int(os.environ.get("AVATAR_CACHE_SIZE", 5000))      # profile photos remembered
+    AVATAR_CACHE_TTL = int(os.environ.get("AVATAR_CACHE_TTL", 6 * 60 * 60))  # seconds before a photo is re-checked
+    MEMBERSHIP_CACHE_SIZE = int(os.environ.get("MEMBERSHIP_CACHE_SIZE", 50000))           # (chat, user) answers remembered
+    MEMBERSHIP_TTL = int(os.environ.get("MEMBERSHIP_TTL", 6 * 60 * 60))                  # seconds a "member" answer is trusted
+    MEMBERSHIP_NEGATIVE_TTL = int(os.environ.get("MEMBERSHIP_NEGATIVE_TTL", 60))         # ...and a "not a member" one
+    MEMBERSHIP_PREWARM_INTERVAL = int(os.environ.get("MEMBERSHIP_PREWARM_INTERVAL", 600))  # seconds between prewarm passes
+    MEMBERSHIP_PREWARM_RATE = int(os.environ.get("MEMBERSHIP_PREWARM_RATE", 5))           # prewarm checks per second
 
     # -------------------------------
     # Owner & Support details
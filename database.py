@@ -1,253 +1,452 @@
 # database.py
 
+import asyncio
+import functools
 import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-from datetime import datetime
-import os
+from migrations import migrate
+
+# Applied to every pooled connection (journal_mode=WAL is set once by migrate)
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",     # safe with WAL, one fsync per checkpoint
+    "PRAGMA cache_size=-16000",      # 16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",    # 128 MB memory-mapped reads
+    "PRAGMA busy_timeout=5000",      # wait on locks instead of failing
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# ---------------- Hot query registry ----------------
+HOT_QUERIES = {}  # name -> (sql, sample params)
+
+
+def hot_query(name, sql, sample_params=()):
+    """Register a request-path query so /dbexplain can check that it uses an index."""
+    HOT_QUERIES[name] = (sql, tuple(sample_params))
+    return sql
+
+
+def is_full_scan(detail):
+    """True for EXPLAIN QUERY PLAN steps that walk a whole table without an index."""
+    return detail.startswith("SCAN ") and "INDEX" not in detail
+
+
+# ---------------- Leaderboard counters (run inside a write transaction) ----------------
+# user_id -> (cards, crystals) after this transaction; only the writer thread touches it
+_touched_totals = {}
+# users whose user_waifus rows this transaction changed
+_touched_inventory = set()
+# table -> rows this transaction created, for the in-memory user/group counts
+_new_rows = Counter()
+# economy ledger entries this transaction produced (see ledger.py)
+_ledger_entries = []
+
+
+def touch_inventory(user_id):
+    """Mark a user's inventory as changed so on_inventory_change listeners hear about it."""
+    _touched_inventory.add(user_id)
+
+
+def record_entry(user_id, reason, cards=0, crystals=0, waifu_id=None, counterparty=None, chat_id=None):
+    """Queue an economy ledger entry; it is only handed to on_ledger listeners if the transaction commits."""
+    _ledger_entries.append((int(time.time()), user_id, counterparty, waifu_id, cards, crystals, reason, chat_id))
+
+
+def bump_totals(conn, user_id, cards=0, crystals=0):
+    """Adjust a user's user_totals row alongside the change that caused it."""
+    row = conn.execute("""
+        INSERT INTO user_totals (user_id, cards, crystals) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE
+           SET cards = cards + excluded.cards,
+               crystals = crystals + excluded.crystals
+        RETURNING cards, crystals
+    """, (user_id, cards, crystals)).fetchone()
+    _touched_totals[user_id] = row
+
+
+# ---------------- Wallet (run inside a write transaction) ----------------
+# user_totals.crystals is the one crystal balance; nothing else holds crystals.
+def credit(conn, user_id, amount, reason="credit", **context):
+    """Add `amount` crystals to a user's wallet. `context` (waifu_id, counterparty, chat_id) goes to the ledger."""
+    bump_totals(conn, user_id, crystals=amount)
+    record_entry(user_id, reason, crystals=amount, **context)
+
+
+def debit(conn, user_id, amount, reason="debit", **context):
+    """
+    Take `amount` crystals in one conditional UPDATE, so a balance can never go
+    negative or be spent twice. Returns False (and changes nothing) if the
+    user can't afford it.
+    """
+    row = conn.execute("""
+        UPDATE user_totals SET crystals = crystals - ?
+         WHERE user_id = ? AND crystals >= ?
+        RETURNING cards, crystals
+    """, (amount, user_id, amount)).fetchone()
+    if row is None:
+        return False
+    _touched_totals[user_id] = row
+    record_entry(user_id, reason, crystals=-amount, **context)
+    return True
+
+
+# ---------------- Row creation (run inside a write transaction) ----------------
+def ensure_user(conn, user_id, username=None, first_name=None):
+    """Create the user's users row if it is missing. Returns True when it was created."""
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO users (user_id, username, first_name) VALUES (?, ?, ?)",
+        (user_id, username, first_name)
+    )
+    _new_rows["users"] += cur.rowcount
+    return cur.rowcount == 1
+
+
+# ---------------- Rarity rollup (run inside a write transaction) ----------------
+def bump_rarity(conn, user_id, waifu_id, delta):
+    """Adjust user_rarities for `delta` copies of a card gained (or lost when negative)."""
+    conn.execute("""
+        INSERT INTO user_rarities (user_id, rarity, count)
+        SELECT ?, rarity, ? FROM waifu_cards WHERE id = ?
+        ON CONFLICT(user_id, rarity) DO UPDATE SET count = count + excluded.count
+    """, (user_id, delta, waifu_id))
+
+
+def move_card_rarity(conn, waifu_id, old_rarity, new_rarity=None):
+    """
+    Shift every owner's copies of a card from old_rarity to new_rarity (a rarity
+    edit), or just drop them from the rollup when new_rarity is None (card deleted).
+    """
+    conn.execute("""
+        UPDATE user_rarities SET count = count - uw.amount
+          FROM user_waifus uw
+         WHERE uw.waifu_id = ? AND user_rarities.user_id = uw.user_id AND user_rarities.rarity = ?
+    """, (waifu_id, old_rarity))
+    if new_rarity is not None:
+        conn.execute("""
+            INSERT INTO user_rarities (user_id, rarity, count)
+            SELECT user_id, ?, amount FROM user_waifus WHERE waifu_id = ?
+            ON CONFLICT(user_id, rarity) DO UPDATE SET count = count + excluded.count
+        """, (new_rarity, waifu_id))
+
+
+# ---------------- Inventory helpers (run inside a write transaction) ----------------
+def grant_waifu(conn, user_id, waifu_id, amount=1, reason="grant", **context):
+    """Add `amount` copies of a card to a user's inventory (counterparty / chat_id go to the ledger)."""
+    conn.execute("""
+        INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
+        VALUES (?, ?, ?, strftime('%s','now'))
+        ON CONFLICT(user_id, waifu_id) DO UPDATE
+           SET amount = amount + excluded.amount,
+               last_collected = excluded.last_collected
+    """, (user_id, waifu_id, amount))
+    bump_totals(conn, user_id, cards=amount)
+    bump_rarity(conn, user_id, waifu_id, amount)
+    touch_inventory(user_id)
+    record_entry(user_id, reason, cards=amount, waifu_id=waifu_id, **context)
+
+
+def record_collection(conn, user_id, amount=1):
+    """Count a newly acquired card in the user's bucket for the current UTC day."""
+    conn.execute("""
+        INSERT INTO collection_buckets (day, user_id, cards)
+        VALUES (CAST(strftime('%s','now') AS INTEGER) / 86400, ?, ?)
+        ON CONFLICT(day, user_id) DO UPDATE SET cards = cards + excluded.cards
+    """, (user_id, amount))
+
+
+def take_waifu(conn, user_id, waifu_id, reason="take", **context):
+    """Remove one copy of a card from a user. Returns False if they don't own it."""
+    row = conn.execute(
+        "SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, waifu_id)
+    ).fetchone()
+    if not row or row[0] <= 0:
+        return False
+    if row[0] > 1:
+        conn.execute("UPDATE user_waifus SET amount=amount-1 WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
+    else:
+        conn.execute("DELETE FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
+    bump_totals(conn, user_id, cards=-1)
+    bump_rarity(conn, user_id, waifu_id, -1)
+    touch_inventory(user_id)
+    record_entry(user_id, reason, cards=-1, waifu_id=waifu_id, **context)
+    return True
+
+
+def purge_card(conn, waifu_id, reason="purge", **context):
+    """
+    Remove every owner's copies of a card that is being deleted, so user_totals
+    keeps matching user_waifus. Call move_card_rarity first: the rollup needs the
+    rows this deletes. Returns the number of owners.
+    """
+    owners = conn.execute(
+        "DELETE FROM user_waifus WHERE waifu_id=? RETURNING user_id, amount", (waifu_id,)
+    ).fetchall()
+    for user_id, amount in owners:
+        bump_totals(conn, user_id, cards=-amount)
+        touch_inventory(user_id)
+        record_entry(user_id, reason, cards=-amount, waifu_id=waifu_id, **context)
+    return len(owners)
 
-DEFAULT_WAIFU_IMAGE = "photo_2025-08-29_13-53-48.jpg"
 
 class Database:
-    def __init__(self, db_path=Config.DB_PATH):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.setup()
-        self.setup_profile_tables()
-        self.setup_additional_tables()
-        self.ensure_waifu_cards_schema()
-        self.ensure_default_waifu_image()
-
-    # ---------------- Setup ----------------
-    def setup(self):
-        """Create users, groups, logs tables and ensure columns exist"""
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                language TEXT DEFAULT 'en',
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                daily_crystals INTEGER DEFAULT 0,
-                weekly_crystals INTEGER DEFAULT 0,
-                monthly_crystals INTEGER DEFAULT 0,
-                daily_claim TEXT,
-                weekly_claim TEXT,
-                monthly_claim TEXT,
-                first_logged INTEGER DEFAULT 0,
-                store_refresh_claim TEXT
-            )
-        """)
-        self.conn.commit()
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS groups (
-                chat_id INTEGER PRIMARY KEY,
-                title TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
-
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_type TEXT,
-                user_id INTEGER,
-                chat_id INTEGER,
-                details TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
-
-        # Ensure legacy columns exist
-        for col in ["daily_claim", "weekly_claim", "monthly_claim", "first_logged", "store_refresh_claim"]:
-            self._add_missing_column(col)
-
-    def _add_missing_column(self, column_name):
-        self.cursor.execute("PRAGMA table_info(users)")
-        columns = [info[1] for info in self.cursor.fetchall()]
-        if column_name not in columns:
-            if column_name == "first_logged":
-                self.cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} INTEGER DEFAULT 0")
-            else:
-                self.cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} TEXT")
-            self.conn.commit()
-
-    # ---------------- Additional Tables ----------------
-    def setup_additional_tables(self):
-        """Create inventory table and given_crystals column"""
-        self.cursor.execute("PRAGMA table_info(users)")
-        cols = [c[1] for c in self.cursor.fetchall()]
-        if "given_crystals" not in cols:
-            self.cursor.execute("ALTER TABLE users ADD COLUMN given_crystals INTEGER DEFAULT 0")
-            self.conn.commit()
-
-        # User inventory table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_waifus (
-                user_id INTEGER,
-                waifu_id INTEGER,
-                amount INTEGER DEFAULT 1,
-                PRIMARY KEY (user_id, waifu_id)
-            )
-        """)
-        self.conn.commit()
+    """
+    Process-wide async data-access layer.
+
+    Writes are serialized on one writer connection/thread, reads are spread over a
+    bounded pool of reader connections, and every query runs in an executor so the
+    Pyrogram event loop never blocks on SQLite. Use `get_db()` instead of building
+    new instances.
+    """
+
+    def __init__(self, db_path=Config.DB_PATH, readers=Config.DB_READERS):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-reader")
+        self._commit_listeners = []
+        self._inventory_listeners = []
+        self._ledger_listeners = []
+
+        # Schema work happens once per process, on the writer connection
+        self.schema_version = self._writer.submit(self._call, migrate).result()
+
+        # Users and groups are only ever added, so /stats keeps their totals in
+        # memory: counted once here, then bumped by the writes that create rows
+        self.row_counts = Counter(self.read_blocking(lambda conn: {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("users", "groups")
+        }))
+
+    # ---------------- Connections ----------------
+    def _connection(self):
+        """One connection per pool thread, opened lazily."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, fn, *args):
+        return fn(self._connection(), *args)
+
+    @staticmethod
+    def _reset_touched():
+        _touched_totals.clear()
+        _touched_inventory.clear()
+        _new_rows.clear()
+        _ledger_entries.clear()
+
+    def _transaction(self, conn, fn, *args):
+        """Returns (result, user totals touched, inventories touched, rows created, ledger entries) for the committed transaction."""
+        self._reset_touched()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self._reset_touched()
+            raise
+        conn.execute("COMMIT")
+        touched, inventories, created = dict(_touched_totals), set(_touched_inventory), Counter(_new_rows)
+        entries = list(_ledger_entries)
+        self._reset_touched()
+        return result, touched, inventories, created, entries
+
+    async def _submit(self, executor, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(self._call, fn, *args))
+
+    # ---------------- Core API ----------------
+    async def read(self, fn, *args):
+        """Run fn(conn, *args) on a reader connection."""
+        return await self._submit(self._readers, fn, *args)
+
+    async def write(self, fn, *args):
+        """Run fn(conn, *args) inside a single write transaction."""
+        result, touched, inventories, created, entries = await self._submit(self._writer, self._transaction, fn, *args)
+        self.row_counts.update(created)
+        for listeners, payload in (
+            (self._commit_listeners, touched),
+            (self._inventory_listeners, inventories),
+            (self._ledger_listeners, entries),
+        ):
+            if not payload:
+                continue
+            for listener in listeners:
+                try:
+                    listener(payload)
+                except Exception as e:
+                    print(f"❌ Commit listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+        return result
+
+    def on_commit(self, fn):
+        """Call fn({user_id: (cards, crystals)}) after each commit that changed user totals."""
+        self._commit_listeners.append(fn)
+        return fn
+
+    def on_inventory_change(self, fn):
+        """Call fn({user_ids}) after each commit that changed someone's user_waifus rows."""
+        self._inventory_listeners.append(fn)
+        return fn
+
+    def on_ledger(self, fn):
+        """Call fn([entry, ...]) with the economy ledger entries of each commit that produced some."""
+        self._ledger_listeners.append(fn)
+        return fn
+
+    def read_blocking(self, fn, *args):
+        """Synchronous read() for startup code that runs before the event loop."""
+        return self._readers.submit(self._call, fn, *args).result()
+
+    async def fetchone(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql, params=()):
+        """Run one write statement; returns the cursor (rowcount / lastrowid)."""
+        return await self.write(lambda conn: conn.execute(sql, params))
+
+    async def executemany(self, sql, seq_of_params):
+        return await self.write(lambda conn: conn.executemany(sql, seq_of_params))
+
+    async def explain(self, sql, params=()):
+        """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+        rows = await self.fetchall(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[3] for row in rows]
 
     # ---------------- User Management ----------------
-    def add_user(self, user_id, username=None, first_name=None):
-        self.cursor.execute("""
-            INSERT OR IGNORE INTO users (user_id, username, first_name)
-            VALUES (?, ?, ?)
-        """, (user_id, username, first_name))
-        self.conn.commit()
-
-    def is_first_logged(self, user_id):
-        self.cursor.execute("SELECT first_logged FROM users WHERE user_id = ?", (user_id,))
-        row = self.cursor.fetchone()
+    async def add_user(self, user_id, username=None, first_name=None):
+        # A user talking to us again is reachable, even if a broadcast pruned them
+        def _add(conn):
+            if not ensure_user(conn, user_id, username, first_name):
+                conn.execute("UPDATE users SET blocked = 0 WHERE user_id = ?", (user_id,))
+        await self.write(_add)
+
+    def total_users(self):
+        return self.row_counts["users"]
+
+    async def is_first_logged(self, user_id):
+        row = await self.fetchone("SELECT first_logged FROM users WHERE user_id = ?", (user_id,))
         return row[0] == 1 if row else False
 
-    def set_first_logged(self, user_id):
-        self.cursor.execute("UPDATE users SET first_logged = 1 WHERE user_id = ?", (user_id,))
-        self.conn.commit()
-
-    # ---------------- Crystal Management ----------------
-    def add_crystals(self, user_id, daily=0, weekly=0, monthly=0, given=0):
-        self.add_user(user_id)
-        self.cursor.execute("""
-            UPDATE users SET
-                daily_crystals = daily_crystals + ?,
-                weekly_crystals = weekly_crystals + ?,
-                monthly_crystals = monthly_crystals + ?,
-                given_crystals = given_crystals + ?
-            WHERE user_id = ?
-        """, (int(daily), int(weekly), int(monthly), int(given), user_id))
-        self.conn.commit()
-
-    def get_crystals(self, user_id):
-        self.cursor.execute("""
-            SELECT daily_crystals, weekly_crystals, monthly_crystals,
-                   daily_claim, weekly_claim, monthly_claim, given_crystals
-            FROM users WHERE user_id=?
-        """, (user_id,))
-        row = self.cursor.fetchone()
-        if not row:
-            return (0, 0, 0, 0, None, 0)
-        daily, weekly, monthly, daily_c, weekly_c, monthly_c, given = row
-        total = daily + weekly + monthly + given
-        timestamps = [ts for ts in [daily_c, weekly_c, monthly_c] if ts]
-        last_claim = max(timestamps) if timestamps else None
-        return (daily, weekly, monthly, total, last_claim, given)
-
-    def get_last_claim(self, user_id, claim_type):
+    async def set_first_logged(self, user_id):
+        await self.execute("UPDATE users SET first_logged = 1 WHERE user_id = ?", (user_id,))
+
+    # ---------------- Crystal Wallet ----------------
+    async def credit_crystals(self, user_id, amount, reason="credit", **context):
+        def _credit(conn):
+            ensure_user(conn, user_id)
+            credit(conn, user_id, int(amount), reason, **context)
+        await self.write(_credit)
+
+    async def debit_crystals(self, user_id, amount, reason="debit", **context):
+        """Spend crystals if the balance covers them. Returns True on success."""
+        return await self.write(lambda conn: debit(conn, user_id, int(amount), reason, **context))
+
+    async def get_balance(self, user_id):
+        row = await self.fetchone("SELECT crystals FROM user_totals WHERE user_id = ?", (user_id,))
+        return int(row[0] or 0) if row else 0
+
+    async def get_last_claims(self, user_id):
+        """{'daily': iso or None, 'weekly': ..., 'monthly': ...}"""
+        row = await self.fetchone(
+            "SELECT daily_claim, weekly_claim, monthly_claim FROM users WHERE user_id = ?", (user_id,)
+        )
+        return dict(zip(("daily", "weekly", "monthly"), row or (None, None, None)))
+
+    async def get_last_claim(self, user_id, claim_type):
         col = f"{claim_type}_claim"
-        self.cursor.execute(f"SELECT {col} FROM users WHERE user_id = ?", (user_id,))
-        result = self.cursor.fetchone()
+        result = await self.fetchone(f"SELECT {col} FROM users WHERE user_id = ?", (user_id,))
         return result[0] if result else None
 
-    def update_last_claim(self, user_id, claim_type, time_iso):
+    async def update_last_claim(self, user_id, claim_type, time_iso):
         col = f"{claim_type}_claim"
-        self.cursor.execute(f"UPDATE users SET {col} = ? WHERE user_id = ?", (time_iso, user_id))
-        self.conn.commit()
+        await self.execute(f"UPDATE users SET {col} = ? WHERE user_id = ?", (time_iso, user_id))
 
     # ---------------- Purchase / Inventory ----------------
-    def purchase_waifu(self, user_id, waifu_id, price=0):
-        """Deduct crystals proportionally and add waifu safely"""
-        self.add_user(user_id)
-        daily, weekly, monthly, total, last_claim, given = self.get_crystals(user_id)
-        if total < price:
-            return False
-
-        remaining = price
-        for col in ["daily_crystals", "weekly_crystals", "monthly_crystals", "given_crystals"]:
-            self.cursor.execute(f"SELECT {col} FROM users WHERE user_id=?", (user_id,))
-            value = int(self.cursor.fetchone()[0])
-            deduction = min(value, remaining)
-            self.cursor.execute(f"UPDATE users SET {col} = {col} - ? WHERE user_id=?", (deduction, user_id))
-            remaining -= deduction
-            if remaining <= 0:
-                break
-
-        # Safe inventory addition
-        self.cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        row = self.cursor.fetchone()
-        if row:
-            self.cursor.execute("UPDATE user_waifus SET amount = amount + 1 WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        else:
-            self.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_id, waifu_id))
-
-        self.conn.commit()
-        return True
+    async def add_waifu_to_inventory(self, user_id, waifu_id, amount=1, reason="grant", **context):
+        await self.write(lambda conn: grant_waifu(conn, user_id, waifu_id, amount, reason, **context))
+
+    async def collect_waifu(self, user_id, waifu_id, reason="collect", **context):
+        """Grant a card the user just acquired (drop, claim, marry...) and count it for the windowed tops."""
+        def _collect(conn):
+            grant_waifu(conn, user_id, waifu_id, reason=reason, **context)
+            record_collection(conn, user_id)
+        await self.write(_collect)
+
+    async def claim_drop(self, chat_id, waifu_id, user_id):
+        """
+        Compare-and-set a group drop: only the first caller whose UPDATE still
+        sees collected_by IS NULL gets the card. Returns True for the winner.
+        """
+        def _claim(conn):
+            cur = conn.execute("""
+                UPDATE current_drops SET collected_by=?
+                 WHERE chat_id=? AND waifu_id=? AND collected_by IS NULL
+            """, (user_id, chat_id, waifu_id))
+            if cur.rowcount != 1:
+                return False
+            grant_waifu(conn, user_id, waifu_id, reason="drop", chat_id=chat_id)
+            record_collection(conn, user_id)
+            return True
+        return await self.write(_claim)
+
+    async def purchase_waifu(self, user_id, waifu_id, price=0):
+        """Debit the price and add the card in one transaction. Returns False if the user can't afford it."""
+        def _purchase(conn):
+            if not debit(conn, user_id, price, "purchase", waifu_id=waifu_id):
+                return False
+            grant_waifu(conn, user_id, waifu_id, reason="purchase")
+            record_collection(conn, user_id)
+            return True
+        return await self.write(_purchase)
 
     # ---------------- Groups / Logs ----------------
-    def add_group(self, chat_id, title):
-        self.cursor.execute("""
-            INSERT OR IGNORE INTO groups (chat_id, title)
-            VALUES (?, ?)
-        """, (chat_id, title))
-        self.conn.commit()
-
-    def get_total_groups(self):
-        self.cursor.execute("SELECT COUNT(*) FROM groups")
-        return self.cursor.fetchone()[0]
-
-    def log_event(self, event_type, user_id=None, chat_id=None, details=None):
-        self.cursor.execute("""
+    async def add_group(self, chat_id, title):
+        def _add(conn):
+            cur = conn.execute("INSERT OR IGNORE INTO groups (chat_id, title) VALUES (?, ?)", (chat_id, title))
+            _new_rows["groups"] += cur.rowcount
+            if not cur.rowcount:
+                conn.execute("UPDATE groups SET blocked = 0 WHERE chat_id = ?", (chat_id,))
+        await self.write(_add)
+
+    async def get_total_groups(self):
+        return self.row_counts["groups"]
+
+    async def log_event(self, event_type, user_id=None, chat_id=None, details=None):
+        await self.execute("""
             INSERT INTO logs (event_type, user_id, chat_id, details)
             VALUES (?, ?, ?, ?)
         """, (event_type, user_id, chat_id, details))
-        self.conn.commit()
-
-    # ---------------- Profile System ----------------
-    def setup_profile_tables(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id INTEGER PRIMARY KEY,
-                level INTEGER DEFAULT 1,
-                rank TEXT DEFAULT 'Newbie',
-                badge TEXT DEFAULT 'None',
-                total_collected INTEGER DEFAULT 0,
-                progress INTEGER DEFAULT 0,
-                balance INTEGER DEFAULT 0,
-                global_position TEXT DEFAULT 'Unranked',
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_rarities (
-                user_id INTEGER,
-                rarity TEXT,
-                count INTEGER DEFAULT 0,
-                PRIMARY KEY (user_id, rarity),
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        self.conn.commit()
-
-    # ---------------- WAIFU CARDS ----------------
-    def ensure_waifu_cards_schema(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS waifu_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                anime TEXT,
-                rarity TEXT,
-                event TEXT,
-                media_type TEXT,
-                media_file TEXT,
-                media_file_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
-
-    def ensure_default_waifu_image(self):
-        """Set default image if media_file or media_file_id is empty"""
-        self.cursor.execute("UPDATE waifu_cards SET media_file=? WHERE media_file IS NULL OR media_file=''", (DEFAULT_WAIFU_IMAGE,))
-        self.cursor.execute("UPDATE waifu_cards SET media_file_id=? WHERE media_file_id IS NULL OR media_file_id=''", (DEFAULT_WAIFU_IMAGE,))
-        self.conn.commit()
-
 
     # ---------------- Close ----------------
     def close(self):
-        self.conn.close()
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+# ---------------- Shared instance ----------------
+_db = None
+
+
+def get_db():
+    """Return the process-wide Database, creating it on first use."""
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
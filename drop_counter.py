@@ -0,0 +1,107 @@
+# drop_counter.py
+
+"""
+Per-group /setdrop counters.
+
+`hit()` runs on every group message, so it only touches a dict and a dirty
+set. Changed rows are written to the `drop_counters` table in one batch every
+Config.DROP_FLUSH_SECONDS, or sooner once Config.DROP_FLUSH_MESSAGES messages
+have been counted, and once more on shutdown. Targets and progress are reloaded
+at startup, so drops survive restarts and deploys.
+"""
+
+import asyncio
+
+from config import Config
+from database import get_db
+import lifecycle
+
+UPSERT_SQL = """
+    INSERT INTO drop_counters (chat_id, target, count, updated_at)
+    VALUES (?, ?, ?, strftime('%s','now'))
+    ON CONFLICT(chat_id) DO UPDATE
+       SET target = excluded.target,
+           count = excluded.count,
+           updated_at = excluded.updated_at
+"""
+
+
+class DropCounters:
+    def __init__(self, db, flush_seconds=Config.DROP_FLUSH_SECONDS, flush_messages=Config.DROP_FLUSH_MESSAGES):
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self.flush_messages = flush_messages
+        self.settings = {}  # {chat_id: {"target": int, "count": int}}
+        self._dirty = set()
+        self._pending = 0   # messages counted since the last flush
+        self._flush_task = None
+        self._loop_task = None
+
+    # ---------------- Hot path ----------------
+    def hit(self, chat_id):
+        """Count one message. Returns True when the group's drop is due (and resets it)."""
+        state = self.settings.get(chat_id)
+        if state is None:
+            return False
+
+        state["count"] += 1
+        due = state["count"] >= state["target"]
+        if due:
+            state["count"] = 0
+        self._dirty.add(chat_id)
+
+        self._pending += 1
+        if self._pending >= self.flush_messages and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+        return due
+
+    async def set_target(self, chat_id, target):
+        """Set a group's drop target, restart its count and persist it right away."""
+        self.settings[chat_id] = {"target": target, "count": 0}
+        self._dirty.add(chat_id)
+        await self.flush()
+
+    # ---------------- Persistence ----------------
+    async def load(self):
+        rows = await self.db.fetchall("SELECT chat_id, target, count FROM drop_counters")
+        self.settings = {chat_id: {"target": target, "count": count} for chat_id, target, count in rows}
+        print(f"🎴 Loaded drop counters for {len(self.settings)} groups")
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        self._pending = 0
+        rows = [
+            (chat_id, self.settings[chat_id]["target"], self.settings[chat_id]["count"])
+            for chat_id in dirty if chat_id in self.settings
+        ]
+        try:
+            await self.db.executemany(UPSERT_SQL, rows)
+        except Exception as e:
+            # Keep them dirty so the next flush retries
+            self._dirty |= dirty
+            print(f"❌ Failed to flush drop counters: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    # ---------------- Lifecycle ----------------
+    async def start(self):
+        await self.load()
+        self._loop_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+
+
+# ---------------- Shared instance ----------------
+drop_counters = DropCounters(get_db())
+lifecycle.on_startup(drop_counters.start)
+lifecycle.on_shutdown(drop_counters.stop)
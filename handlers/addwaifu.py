@@ -3,14 +3,16 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
 from config import Config, app
-from database import Database
+from database import get_db
+from catalogue import get_catalogue
+from media import send_card
+from state import state
 import os, uuid
 
-db = Database()
-db.ensure_waifu_cards_schema()  # make sure table/columns exist at import
+db = get_db()
 
 # Keep preview payloads here by a short token -> data
-PENDING_ADDS = {}
+PENDING_ADDS = state.namespace("addwaifu", ttl=15 * 60)
 
 # Build allowed IDs set
 ALLOWED_IDS = {getattr(Config, "OWNER_ID", 0)}
@@ -111,10 +113,7 @@ async def add_waifu_start(client, message: Message):
     ])
 
     # Send preview with the same media
-    if media_type == "photo":
-        await message.reply_photo(media_file_id, caption=caption, reply_markup=buttons)
-    else:
-        await message.reply_video(media_file_id, caption=caption, reply_markup=buttons)
+    await send_card(message, media_type, media_file_id, caption, reply_markup=buttons)
 
 # ------------- Callback handlers -------------
 @app.on_callback_query(filters.regex(r"^aw_(ok|no):"))
@@ -149,11 +148,8 @@ async def add_waifu_callback(client, cq: CallbackQuery):
 
     # Confirm
     try:
-        # Ensure schema again (safe)
-        db.ensure_waifu_cards_schema()
-
         # Insert; write both media_file and media_file_id for compatibility
-        db.cursor.execute("""
+        cur = await db.execute("""
             INSERT INTO waifu_cards (name, anime, rarity, event, media_type, media_file, media_file_id)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (
@@ -165,8 +161,8 @@ async def add_waifu_callback(client, cq: CallbackQuery):
             payload["media_file_id"],   # media_file (compat) = file_id as well
             payload["media_file_id"]    # media_file_id
         ))
-        db.conn.commit()
-        new_id = db.cursor.lastrowid
+        new_id = cur.lastrowid
+        await get_catalogue().refresh(new_id)
 
         # Clean state
         PENDING_ADDS.pop(token, None)
@@ -1,12 +1,7 @@
-from pyrogram import Client, filters
-import sqlite3
-import asyncio
+from pyrogram import filters
 
 from config import app, OWNER_ID
-
-# Connect to your existing database
-conn = sqlite3.connect("waifu_bot.db", check_same_thread=False)
-cur = conn.cursor()
+from broadcast import broadcaster, progress_text
 
 @app.on_message(filters.command("announce") & filters.user(OWNER_ID))
 async def announce_cmd(client, message):
@@ -47,40 +42,43 @@ async def announce_cmd(client, message):
             return
         text = parts[1]
 
-    status = await message.reply("📢 Sending announcement...")
+    status = await message.reply("📢 Preparing announcement...")
+
+    # --- Queue the job; broadcast.py marks it queued and sends it in the background ---
+    if media:
+        kind, file_id, text = media
+    else:
+        kind, file_id = "text", None
+    await broadcaster.create(kind, text, file_id, status.chat.id, status.id)
+
 
-    # --- Load users & groups from DB ---
-    try:
-        cur.execute("SELECT user_id FROM users")
-        users = [row[0] for row in cur.fetchall()]
-    except Exception:
-        users = []
+# ---------------- Job controls ----------------
+async def _job_id_arg(message):
+    """Job id from the command, or the latest job when none is given."""
+    parts = message.text.split()
+    if len(parts) > 1:
+        return int(parts[1]) if parts[1].isdigit() else None
+    job = await broadcaster.latest()
+    return job[0] if job else None
 
-    try:
-        cur.execute("SELECT chat_id FROM groups")
-        groups = [row[0] for row in cur.fetchall()]
-    except Exception:
-        groups = []
 
-    total = len(users) + len(groups)
-    sent, failed = 0, 0
+@app.on_message(filters.command("bstatus") & filters.user(OWNER_ID))
+async def broadcast_status_cmd(client, message):
+    job_id = await _job_id_arg(message)
+    job = await broadcaster.get(job_id) if job_id else None
+    if not job:
+        await message.reply("❌ No such announcement.")
+        return
+    await message.reply(progress_text(job))
 
-    # --- Send to all ---
-    for uid in users + groups:
-        try:
-            if media:
-                if media[0] == "photo":
-                    await app.send_photo(uid, media[1], caption=media[2])
-                elif media[0] == "video":
-                    await app.send_video(uid, media[1], caption=media[2])
-            else:
-                await app.send_message(uid, text)
-            sent += 1
-        except Exception:
-            failed += 1
-        await asyncio.sleep(0.3)  # avoid flood limit
 
-    await status.edit_text(
-        f"📢 Announcement complete!\n\n"
-        f"✅ Sent: {sent}\n❌ Failed: {failed}\n📊 Total: {total}"
-    )
+@app.on_message(filters.command(["bpause", "bresume", "bcancel"]) & filters.user(OWNER_ID))
+async def broadcast_control_cmd(client, message):
+    action = message.command[0].lower()
+    status = {"bpause": "paused", "bresume": "running", "bcancel": "cancelled"}[action]
+    job_id = await _job_id_arg(message)
+    if not job_id or not await broadcaster.set_status(job_id, status):
+        await message.reply("❌ Announcement not found or not in a state that allows that.")
+        return
+    labels = {"paused": "⏸️ paused", "running": "▶️ resumed", "cancelled": "🛑 cancelled"}
+    await message.reply(f"📢 Announcement #{job_id} {labels[status]}.")
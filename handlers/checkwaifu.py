@@ -2,9 +2,17 @@
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app
-from database import Database
+from database import get_db, hot_query
+from catalogue import get_catalogue
+from media import send_card
 
-db = Database()
+db = get_db()
+catalogue = get_catalogue()
+
+GLOBAL_COLLECTED_SQL = hot_query(
+    "checkwaifu.global_collected",
+    "SELECT COUNT(*) FROM user_waifus WHERE waifu_id=?", (1,)
+)
 
 # ---------------- /checkwaifu Command ----------------
 @app.on_message(filters.command("checkwaifu"))
@@ -18,54 +26,25 @@ async def check_waifu(client, message: Message):
         await message.reply_text("❌ Usage: /checkwaifu <waifu_id>")
         return
 
-    # Ensure waifu_cards table exists
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waifu_cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            anime TEXT,
-            rarity TEXT,
-            event TEXT,
-            media_type TEXT,
-            media_file TEXT
-        )
-    """)
-    db.conn.commit()
-
     # Fetch waifu details
-    db.cursor.execute("SELECT * FROM waifu_cards WHERE id=?", (waifu_id,))
-    waifu = db.cursor.fetchone()
+    waifu = catalogue.get(waifu_id)
 
     if not waifu:
         await message.reply_text("❌ Waifu not found!")
         return
 
     # Count how many times collected globally
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_waifus (
-            user_id INTEGER,
-            waifu_id INTEGER,
-            PRIMARY KEY(user_id, waifu_id)
-        )
-    """)
-    db.conn.commit()
-    db.cursor.execute("SELECT COUNT(*) FROM user_waifus WHERE waifu_id=?", (waifu_id,))
-    collected_count = db.cursor.fetchone()[0]
+    collected_count = (await db.fetchone(GLOBAL_COLLECTED_SQL, (waifu_id,)))[0]
 
     # Build caption
     caption = (
-        f"👤 Name: {waifu[1]}\n"
-        f"🎥 Anime: {waifu[2]}\n"
-        f"🫧 Rarity: {waifu[3]}\n"
-        f"🎀 Event/Theme: {waifu[4]}\n"
-        f"🆔 Waifu ID: {waifu[0]}\n"
+        f"👤 Name: {waifu.name}\n"
+        f"🎥 Anime: {waifu.anime}\n"
+        f"🫧 Rarity: {waifu.rarity}\n"
+        f"🎀 Event/Theme: {waifu.event}\n"
+        f"🆔 Waifu ID: {waifu.id}\n"
         f"☘️ Globally Collected: {collected_count}"
     )
 
     # Send media with caption
-    if waifu[5] == "photo":
-        await message.reply_photo(waifu[6], caption=caption)
-    elif waifu[5] == "video":
-        await message.reply_video(waifu[6], caption=caption)
-    else:
-        await message.reply_text(caption)
+    await send_card(message, waifu.media_type, waifu.media_file, caption)
@@ -1,24 +1,16 @@
 # handlers/claim.py
 
-import sqlite3
-import random
 import time
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app
+from database import get_db
+from card_sampler import get_sampler
+from media import send_card
 
-# ---------------- Connect to your main DB ----------------
-db = sqlite3.connect("waifu_bot.db", check_same_thread=False)
-cursor = db.cursor()
-
-# ---------------- Ensure user claims table exists ----------------
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_claims (
-    user_id INTEGER PRIMARY KEY,
-    last_claim INTEGER DEFAULT 0
-)
-""")
-db.commit()
+# ---------------- Shared DB layer ----------------
+db = get_db()
+sampler = get_sampler()
 
 # ---------------- /claim Command ----------------
 @app.on_message(filters.command("claim"))
@@ -27,8 +19,7 @@ async def claim_waifu(client, message: Message):
     username = message.from_user.first_name
 
     # Check cooldown
-    cursor.execute("SELECT last_claim FROM user_claims WHERE user_id=?", (user_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT last_claim FROM user_claims WHERE user_id=?", (user_id,))
     current_time = int(time.time())
     if row:
         last_claim = row[0]
@@ -39,20 +30,17 @@ async def claim_waifu(client, message: Message):
             await message.reply_text(f"⏳ You already claimed a waifu! Come back in {hours}h {minutes}m.")
             return
 
-    # Fetch all waifu cards from DB
-    cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file FROM waifu_cards")
-    waifus = cursor.fetchall()
-    if not waifus:
+    # Pick a random waifu (ignore rarity)
+    waifu = sampler.fetch_random("id, name, anime, rarity, event, media_type, media_file")
+    if not waifu:
         await message.reply_text("❌ No waifus available yet.")
         return
 
-    # Pick a random waifu (ignore rarity)
-    waifu = random.choice(waifus)
     waifu_id, name, anime, rarity, event, media_type, media_file = waifu
 
-    # Update last claim time
-    cursor.execute("INSERT OR REPLACE INTO user_claims (user_id, last_claim) VALUES (?, ?)", (user_id, current_time))
-    db.commit()
+    # Update last claim time and save the card to the user's collection
+    await db.execute("INSERT OR REPLACE INTO user_claims (user_id, last_claim) VALUES (?, ?)", (user_id, current_time))
+    await db.collect_waifu(user_id, waifu_id, reason="claim", chat_id=message.chat.id)
 
     # ---------------- Prepare message ----------------
     profile_text = (
@@ -69,7 +57,4 @@ async def claim_waifu(client, message: Message):
     )
 
     # Send waifu card
-    if media_type == "photo":
-        await message.reply_photo(media_file, caption=profile_text)
-    else:
-        await message.reply_video(media_file, caption=profile_text)
+    await send_card(message, media_type, media_file, profile_text)
@@ -1,10 +1,14 @@
 # craft.py
-import sqlite3, time, random
+import time
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import app, Config
+from config import app
+from database import get_db, ensure_user
+from card_sampler import get_sampler
+from media import send_card
 
-DB_PATH = Config.DB_PATH
+db = get_db()
+sampler = get_sampler()
 COOLDOWN = 24 * 60 * 60  # 24 hours
 BONUS_CRYSTALS = 10000
 
@@ -20,94 +24,34 @@ ALLOWED_RARITIES = [
 ]
 
 # ---------- DB helpers ----------
-def db():
-    return sqlite3.connect(DB_PATH)
-
-def ensure_user_rows(user_id: int, username: str, first_name: str):
-    conn = db()
-    cur = conn.cursor()
-    # Minimal users row (other columns have defaults)
-    cur.execute("""
-        INSERT OR IGNORE INTO users (user_id, username, first_name)
-        VALUES (?, ?, ?)
-    """, (user_id, username or "", first_name or ""))
-
-    # Profile row for balance
-    cur.execute("""
-        INSERT OR IGNORE INTO user_profiles (user_id)
-        VALUES (?)
-    """, (user_id,))
-
-    # Cooldown table for craft
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_craft (
-            user_id INTEGER PRIMARY KEY,
-            last_claim INTEGER
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def add_waifu_to_inventory(user_id: int, waifu_id: int):
+async def ensure_user_rows(user_id: int, username: str, first_name: str):
+    def _ensure(conn):
+        # Minimal users row (other columns have defaults)
+        ensure_user(conn, user_id, username or "", first_name or "")
+    await db.write(_ensure)
+
+async def add_waifu_to_inventory(user_id: int, waifu_id: int):
     """Same inventory pattern as your reward.py (user_waifus)"""
-    conn = db()
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-        """, (user_id, waifu_id))
-        if cur.rowcount == 0:
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-            """, (user_id, waifu_id))
-        conn.commit()
-    finally:
-        conn.close()
-
-def add_crystals(user_id: int, amount: int):
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("UPDATE user_profiles SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
-    conn.commit()
-    conn.close()
-
-def get_cooldown_remaining(user_id: int) -> int:
+    await db.collect_waifu(user_id, waifu_id, reason="craft")
+
+async def add_crystals(user_id: int, amount: int):
+    """Bonus crystals go to the shared wallet (user_totals.crystals)."""
+    await db.credit_crystals(user_id, amount, reason="craft")
+
+async def get_cooldown_remaining(user_id: int) -> int:
     """Return seconds remaining; 0 if ready."""
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("SELECT last_claim FROM user_craft WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = await db.fetchone("SELECT last_claim FROM user_craft WHERE user_id = ?", (user_id,))
     now = int(time.time())
     if not row or not row[0]:
         return 0
     elapsed = now - int(row[0])
     return max(0, COOLDOWN - elapsed)
 
-def set_cooldown_now(user_id: int):
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("INSERT OR REPLACE INTO user_craft (user_id, last_claim) VALUES (?, ?)", (user_id, int(time.time())))
-    conn.commit()
-    conn.close()
+async def set_cooldown_now(user_id: int):
+    await db.execute("INSERT OR REPLACE INTO user_craft (user_id, last_claim) VALUES (?, ?)", (user_id, int(time.time())))
 
 def pick_random_allowed_waifu():
-    conn = db()
-    cur = conn.cursor()
-    placeholders = ",".join("?" * len(ALLOWED_RARITIES))
-    cur.execute(f"""
-        SELECT id, name, anime, rarity, media_type, media_file
-          FROM waifu_cards
-         WHERE rarity IN ({placeholders})
-         ORDER BY RANDOM() LIMIT 1
-    """, ALLOWED_RARITIES)
-    row = cur.fetchone()
-    conn.close()
-    return row
+    return sampler.fetch_random("id, name, anime, rarity, media_type, media_file", rarities=ALLOWED_RARITIES)
 
 # ---------- UI texts ----------
 def craft_announcement_text(display_name: str):
@@ -152,7 +96,7 @@ async def craft_command(client, message):
     display_name = (first_name + (" " + last_name if last_name else "")).strip() or username or "Traveler"
 
     # Ensure rows and tables exist
-    ensure_user_rows(user_id, username, first_name)
+    await ensure_user_rows(user_id, username, first_name)
 
     text = craft_announcement_text(display_name)
     kb = InlineKeyboardMarkup([
@@ -181,10 +125,10 @@ async def claim_craft_cb(client, callback_query):
         return
 
     # Ensure DB rows exist
-    ensure_user_rows(user_id, username, first_name)
+    await ensure_user_rows(user_id, username, first_name)
 
     # Cooldown check
-    remaining = get_cooldown_remaining(user_id)
+    remaining = await get_cooldown_remaining(user_id)
     if remaining > 0:
         hrs = remaining // 3600
         mins = (remaining % 3600) // 60
@@ -202,20 +146,13 @@ async def claim_craft_cb(client, callback_query):
     waifu_id, name, anime, rarity, media_type, media_file = row
 
     # Award: inventory + crystals, then set cooldown
-    add_waifu_to_inventory(user_id, waifu_id)
-    add_crystals(user_id, BONUS_CRYSTALS)
-    set_cooldown_now(user_id)
+    await add_waifu_to_inventory(user_id, waifu_id)
+    await add_crystals(user_id, BONUS_CRYSTALS)
+    await set_cooldown_now(user_id)
 
     caption = success_caption(name, anime, rarity, full_name)
 
-    # Send media preview with caption
-    try:
-        if (media_type or "").lower() == "video":
-            await callback_query.message.reply_video(media_file, caption=caption)
-        else:
-            await callback_query.message.reply_photo(media_file, caption=caption)
-    except Exception:
-        # If media fails, at least send the text
-        await callback_query.message.reply(caption)
+    # Send media preview with caption (falls back to text if the media is broken)
+    await send_card(callback_query.message, media_type, media_file, caption)
 
     await callback_query.answer("Reward claimed! 🎁")
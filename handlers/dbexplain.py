@@ -0,0 +1,39 @@
+# handlers/dbexplain.py
+
+from pyrogram import filters
+from config import app, Config
+from database import get_db, HOT_QUERIES, is_full_scan
+
+db = get_db()
+
+# ---------------- /dbexplain Command (Owner only) ----------------
+@app.on_message(filters.command("dbexplain") & filters.user(Config.OWNER_ID))
+async def db_explain_cmd(client, message):
+    """
+    Runs EXPLAIN QUERY PLAN over every query registered with hot_query()
+    and flags the ones that fall back to a full table scan.
+    """
+    if not HOT_QUERIES:
+        await message.reply_text("❌ No hot queries registered.")
+        return
+
+    lines = ["🗄️ Hot query plans\n"]
+    failures = 0
+    for name, (sql, params) in sorted(HOT_QUERIES.items()):
+        try:
+            plan = await db.explain(sql, params)
+        except Exception as e:
+            failures += 1
+            lines.append(f"❌ {name}: {e}")
+            continue
+
+        scans = [step for step in plan if is_full_scan(step)]
+        if scans:
+            failures += 1
+            lines.append(f"❌ {name}: " + "; ".join(scans))
+        else:
+            lines.append(f"✅ {name}")
+
+    lines.append("")
+    lines.append("✅ All hot queries use an index." if not failures else f"⚠️ {failures} quer{'y' if failures == 1 else 'ies'} need attention.")
+    await message.reply_text("\n".join(lines))
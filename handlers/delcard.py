@@ -1,13 +1,12 @@
 # handlers/delcard.py
-import sqlite3
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app, OWNER_ID, ADMINS
+from database import get_db, move_card_rarity, purge_card
+from catalogue import get_catalogue
+from media import send_card
 
-DB_PATH = "waifu_bot.db"
-
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+db = get_db()
 
 
 # /deletecard <id>
@@ -19,11 +18,7 @@ async def delete_card_request(client, message):
         return
 
     wid = args[1].strip()
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
-    row = cur.fetchone()
-    conn.close()
+    row = await db.fetchone("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
 
     if not row:
         await message.reply_text("❌ Waifu card not found.")
@@ -45,12 +40,7 @@ async def delete_card_request(client, message):
         ]]
     )
 
-    if media_type in ("photo", "image"):
-        await message.reply_photo(media_file, caption=caption, reply_markup=keyboard)
-    elif media_type in ("video", "animation"):
-        await message.reply_video(media_file, caption=caption, reply_markup=keyboard)
-    else:
-        await message.reply_text(caption, reply_markup=keyboard)
+    await send_card(message, media_type, media_file, caption, reply_markup=keyboard)
 
 
 # Confirm or Cancel
@@ -68,10 +58,14 @@ async def delete_card_confirm(client, cq: CallbackQuery):
         return
 
     # Confirm delete
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM waifu_cards WHERE id=?", (wid,))
-    conn.commit()
-    conn.close()
+    def _apply(conn):
+        old = conn.execute("SELECT rarity FROM waifu_cards WHERE id=?", (wid,)).fetchone()
+        if old:
+            move_card_rarity(conn, wid, old[0])
+        # Owners lose their copies too, so card totals keep adding up per rarity
+        purge_card(conn, wid, reason="delcard", counterparty=cq.from_user.id)
+        conn.execute("DELETE FROM waifu_cards WHERE id=?", (wid,))
+    await db.write(_apply)
+    await get_catalogue().refresh(wid)
 
     await cq.message.edit_caption(f"✅ Waifu card ID {wid} deleted permanently.")
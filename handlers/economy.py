@@ -0,0 +1,73 @@
+# handlers/economy.py
+
+from datetime import datetime
+
+from pyrogram import filters
+from config import app, Config
+from database import get_db
+from ledger import get_ledger, verify, USER_ENTRIES_SQL
+
+db = get_db()
+ledger = get_ledger()
+
+SAMPLE_SIZE = 5
+
+
+def format_entry(row):
+    entry_id, at, user_id, counterparty, waifu_id, cards, crystals, reason, chat_id = row
+    parts = [f"#{entry_id} {datetime.utcfromtimestamp(at):%d/%m %H:%M} {reason}"]
+    if crystals:
+        parts.append(f"{crystals:+} 💎")
+    if cards:
+        parts.append(f"{cards:+} 🎴 {waifu_id}")
+    if counterparty:
+        parts.append(f"↔ {counterparty}")
+    return " · ".join(parts)
+
+
+# ---------------- /ledger Command (Owner only) ----------------
+@app.on_message(filters.command("ledger") & filters.user(Config.OWNER_ID))
+async def ledger_cmd(client, message):
+    """
+    /ledger – queue and flush stats
+    /ledger verify – replay the whole ledger and compare with balances and inventories
+    /ledger <user_id> – a user's latest entries
+    """
+    args = message.command[1:]
+
+    if args and args[0] == "verify":
+        status = await message.reply_text("⏳ Replaying the economy ledger...")
+        await ledger.flush()
+        try:
+            # On the writer, so no other write lands while the tables are read
+            balances, inventories = await db.write(lambda conn: verify(conn, ledger.pending()))
+        except Exception as e:
+            await status.edit_text(f"❌ Verify failed: {e}")
+            return
+        if not balances and not inventories:
+            await status.edit_text("✅ Ledger replay matches every balance and inventory.")
+            return
+        lines = [f"⚠️ Ledger drift: {len(balances)} balances, {len(inventories)} inventory rows\n"]
+        for user_id, expected, stored in balances[:SAMPLE_SIZE]:
+            lines.append(f"💎 {user_id}: ledger {expected} · stored {stored}")
+        for (user_id, waifu_id), expected, stored in inventories[:SAMPLE_SIZE]:
+            lines.append(f"🎴 {user_id} / card {waifu_id}: ledger {expected} · stored {stored}")
+        await status.edit_text("\n".join(lines))
+        return
+
+    if args and args[0].isdigit():
+        user_id = int(args[0])
+        rows = await db.fetchall(USER_ENTRIES_SQL, (user_id, 10))
+        if not rows:
+            await message.reply_text(f"📒 No ledger entries for {user_id}.")
+            return
+        await message.reply_text(f"📒 Latest entries for {user_id}\n\n" + "\n".join(map(format_entry, rows)))
+        return
+
+    await message.reply_text(
+        "📒 Economy ledger\n\n"
+        f"📥 Queued: {len(ledger)}\n"
+        f"✍️ Written: {ledger.written} in {ledger.batches} batches\n"
+        f"⏱ Last flush: {ledger.last_flush_ms:.1f} ms\n\n"
+        "Use /ledger verify or /ledger <user_id>"
+    )
@@ -1,14 +1,17 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import sqlite3
 import random
 import string
 from config import app, OWNER_ID, ADMINS
+from database import get_db, move_card_rarity
+from catalogue import get_catalogue
+from media import send_card
+from state import state
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
 
-# in-memory storage for long callback data
-pending_edits = {}  # {short_id: (card_id, media_type, file_id)}
+# storage for long callback data
+pending_edits = state.namespace("edits", ttl=15 * 60)  # {short_id: (card_id, media_type, file_id)}
 
 # helper to generate short IDs
 def gen_short_id(length=6):
@@ -19,10 +22,8 @@ def is_admin(user_id):
     return user_id == OWNER_ID or user_id in ADMINS
 
 # helper to check if a column exists
-def column_exists(conn, table, column):
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table})")
-    columns = [info[1] for info in cur.fetchall()]
+async def column_exists(table, column):
+    columns = [info[1] for info in await db.fetchall(f"PRAGMA table_info({table})")]
     return column in columns
 
 @app.on_message(filters.command("editcard") & filters.user([OWNER_ID] + ADMINS))
@@ -34,25 +35,19 @@ async def edit_card_request(client, message):
 
     wid = args[1]
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    has_theme = column_exists(conn, "waifu_cards", "theme")
+    has_theme = await column_exists("waifu_cards", "theme")
 
     try:
         if has_theme:
-            cur.execute("SELECT id, name, anime, rarity, theme, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
+            row = await db.fetchone("SELECT id, name, anime, rarity, theme, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
         else:
-            cur.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
-        row = cur.fetchone()
+            row = await db.fetchone("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
     except Exception as e:
         await message.reply(f"❌ Database error: {e}")
-        conn.close()
         return
 
     if not row:
         await message.reply("❌ No card found with this ID.")
-        conn.close()
         return
 
     if has_theme:
@@ -72,11 +67,7 @@ async def edit_card_request(client, message):
         )
         kb = InlineKeyboardMarkup([[InlineKeyboardButton("✅ Confirm Edit", callback_data=f"edit_confirm:{card_id}"),
                                     InlineKeyboardButton("❌ Cancel", callback_data="edit_cancel")]])
-        if media_type == "video":
-            await message.reply_video(media_file, caption=preview, reply_markup=kb)
-        else:
-            await message.reply_photo(media_file, caption=preview, reply_markup=kb)
-        conn.close()
+        await send_card(message, media_type, media_file, preview, reply_markup=kb)
         return
 
     # editing field
@@ -100,16 +91,11 @@ async def edit_card_request(client, message):
         )
         kb = InlineKeyboardMarkup([[InlineKeyboardButton("✅ Confirm", callback_data=f"edit_media:{short_id}"),
                                     InlineKeyboardButton("❌ Cancel", callback_data="edit_cancel")]])
-        if media_type == "video":
-            await message.reply_video(media_file, caption=preview, reply_markup=kb)
-        else:
-            await message.reply_photo(media_file, caption=preview, reply_markup=kb)
-        conn.close()
+        await send_card(message, media_type, media_file, preview, reply_markup=kb)
         return
 
     if len(args) < 4:
         await message.reply("❌ Missing new value. Example:\n/editcard 1 name NewName")
-        conn.close()
         return
 
     new_value = args[3]
@@ -120,7 +106,6 @@ async def edit_card_request(client, message):
 
     if field not in allowed_fields:
         await message.reply(f"❌ Invalid field. Use one of: {', '.join(allowed_fields)}")
-        conn.close()
         return
 
     preview = (
@@ -132,35 +117,34 @@ async def edit_card_request(client, message):
     )
     kb = InlineKeyboardMarkup([[InlineKeyboardButton("✅ Confirm", callback_data=f"edit_apply:{card_id}:{field}:{new_value}"),
                                 InlineKeyboardButton("❌ Cancel", callback_data="edit_cancel")]])
-    if media_type == "video":
-        await message.reply_video(media_file, caption=preview, reply_markup=kb)
-    else:
-        await message.reply_photo(media_file, caption=preview, reply_markup=kb)
-
-    conn.close()
+    await send_card(message, media_type, media_file, preview, reply_markup=kb)
 
 
 # normal field edits
 @app.on_callback_query(filters.regex(r"^edit_apply:(\d+):(\w+):(.+)"))
 async def apply_edit(client, callback_query):
-    wid, field, value = callback_query.data.split(":", 2)
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    _, wid, field, value = callback_query.data.split(":", 3)
 
-    has_theme = column_exists(conn, "waifu_cards", "theme")
+    has_theme = await column_exists("waifu_cards", "theme")
 
     try:
         if field == "theme" and not has_theme:
             await callback_query.message.reply("❌ Cannot update theme: column does not exist in database.")
             return
-        cur.execute(f"UPDATE waifu_cards SET {field}=? WHERE id=?", (value, wid))
-        conn.commit()
+        if field == "rarity":
+            # Owners' rarity rollups move with the card, in the same transaction
+            def _apply(conn):
+                old = conn.execute("SELECT rarity FROM waifu_cards WHERE id=?", (wid,)).fetchone()
+                conn.execute("UPDATE waifu_cards SET rarity=? WHERE id=?", (value, wid))
+                if old and old[0] != value:
+                    move_card_rarity(conn, wid, old[0], value)
+            await db.write(_apply)
+        else:
+            await db.execute(f"UPDATE waifu_cards SET {field}=? WHERE id=?", (value, wid))
+        await get_catalogue().refresh(wid)
         await callback_query.message.edit_caption(f"✅ Card {wid} updated successfully!")
     except Exception as e:
         await callback_query.message.reply(f"❌ Update failed: {e}")
-    finally:
-        conn.close()
 
 
 # photo/video edits using short_id
@@ -173,11 +157,8 @@ async def apply_media_edit(client, callback_query):
 
     card_id, media_type, media_file = pending_edits.pop(short_id)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE waifu_cards SET media_type=?, media_file=? WHERE id=?", (media_type, media_file, card_id))
-    conn.commit()
-    conn.close()
+    await db.execute("UPDATE waifu_cards SET media_type=?, media_file=? WHERE id=?", (media_type, media_file, card_id))
+    await get_catalogue().refresh(card_id)
 
     await callback_query.message.edit_caption(f"✅ Card {card_id} updated successfully!")
 
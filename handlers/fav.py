@@ -3,9 +3,13 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
 from config import app
-from database import Database
+from database import get_db
+from catalogue import get_catalogue
+from media import send_card
+from inventory_cache import inventory_cache
 
-db = Database()
+db = get_db()
+catalogue = get_catalogue()
 
 # ---------------- /fav Command ----------------
 @app.on_message(filters.command("fav"))
@@ -22,42 +26,15 @@ async def set_favorite(client, message: Message):
         await message.reply_text("❌ Usage: /fav <waifu_id>")
         return
 
-    # Ensure tables exist
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waifu_cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            anime TEXT,
-            rarity TEXT,
-            event TEXT,
-            media_type TEXT,
-            media_file TEXT
-        )
-    """)
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_fav (
-            user_id INTEGER PRIMARY KEY,
-            waifu_id INTEGER
-        )
-    """)
-    db.conn.commit()
-
     # Fetch waifu card
-    db.cursor.execute("SELECT * FROM waifu_cards WHERE id = ?", (waifu_id,))
-    waifu = db.cursor.fetchone()
+    waifu = catalogue.get(waifu_id)
     if not waifu:
         await message.reply_text("❌ Waifu card not found!")
         return
 
-    # Map columns safely
-    waifu_data = dict(zip([desc[0] for desc in db.cursor.description], waifu))
-    waifu_id = waifu_data["id"]
-    name = waifu_data["name"]
-    anime = waifu_data["anime"]
-    rarity = waifu_data["rarity"]
-    event = waifu_data["event"]
-    media_type = waifu_data["media_type"]
-    media_file = waifu_data["media_file"]
+    waifu_id, name, anime, rarity, event, media_type, media_file = waifu.values(
+        "id", "name", "anime", "rarity", "event", "media_type", "media_file"
+    )
 
     # Prepare preview caption
     caption = (
@@ -82,10 +59,7 @@ async def set_favorite(client, message: Message):
     ])
 
     # Send media preview
-    if media_type == "photo":
-        await message.reply_photo(media_file, caption=caption, reply_markup=buttons)
-    else:
-        await message.reply_video(media_file, caption=caption, reply_markup=buttons)
+    await send_card(message, media_type, media_file, caption, reply_markup=buttons)
 
 
 # ---------------- Callback Handler ----------------
@@ -98,8 +72,8 @@ async def fav_callback(client, callback):
         user_id = int(data[1])
         waifu_id = int(data[2])
         # Save favorite in user_fav table (insert or replace)
-        db.cursor.execute("REPLACE INTO user_fav (user_id, waifu_id) VALUES (?, ?)", (user_id, waifu_id))
-        db.conn.commit()
+        await db.execute("REPLACE INTO user_fav (user_id, waifu_id) VALUES (?, ?)", (user_id, waifu_id))
+        inventory_cache.invalidate(user_id)
         await callback.answer("💞 Favorite waifu set successfully!", show_alert=True)
         await callback.message.delete()
 
@@ -1,132 +1,53 @@
 # handlers/gift.py
-import sqlite3
 import time
 import random
 import traceback
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, Message
 from config import app
+from database import get_db, grant_waifu, take_waifu
+from catalogue import get_catalogue
+from media import send_card
+from state import state
 
-DB_PATH = "waifu_bot.db"
-pending_gifts = {}  # nonce -> {"giver": int, "receiver": int, "wid": int, "chat_id": int, "created": float}
+db = get_db()
+catalogue = get_catalogue()
+# nonce -> {"giver": int, "receiver": int, "wid": int, "chat_id": int, "created": float}; kept across restarts
+pending_gifts = state.namespace("gifts", ttl=24 * 60 * 60, persist=True)
 
 print("[gift.py] handler loaded")
 
 
 # ---------- DB helpers ----------
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+async def user_card_amount(user_id: int, wid: int) -> int:
+    """Return how many of a card the user has."""
+    r = await db.fetchone("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, wid))
+    return r[0] if r else 0
 
 
-def _table_columns(table_name: str):
-    """Return list of column names for a table (empty list if table missing)."""
-    try:
-        conn = _conn()
-        cur = conn.cursor()
-        cur.execute(f"PRAGMA table_info({table_name})")
-        rows = cur.fetchall()
-        conn.close()
-        return [r[1] for r in rows]
-    except Exception:
-        return []
+class _GiftAborted(Exception):
+    pass
 
 
-def get_card(wid: int):
-    """
-    Return a dict with available card fields from waifu_cards or None.
-    Will adapt to missing columns.
-    """
-    cols = _table_columns("waifu_cards")
-    # preferred fields in order
-    desired = ["id", "name", "anime", "rarity", "event", "theme", "media_type", "media_file"]
-    use = [c for c in desired if c in cols]
-    if not use:
-        return None
-    sql = f"SELECT {', '.join(use)} FROM waifu_cards WHERE id = ?"
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(sql, (wid,))
-        row = cur.fetchone()
-    finally:
-        conn.close()
-    if not row:
-        return None
-    return {use[i]: row[i] for i in range(len(use))}
+def _transfer_one_card(conn, giver: int, receiver: int, wid: int):
+    if not take_waifu(conn, giver, wid, reason="gift", counterparty=receiver):
+        raise _GiftAborted()
+    grant_waifu(conn, receiver, wid, reason="gift", counterparty=giver)
 
 
-def user_card_amount(user_id: int, wid: int) -> int:
-    """
-    Return how many of a card the user has.
-    If user_waifus has 'amount' column, uses it; otherwise returns 1 if a row exists.
-    """
-    cols = _table_columns("user_waifus")
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        if "amount" in cols:
-            cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, wid))
-            r = cur.fetchone()
-            return r[0] if r else 0
-        else:
-            cur.execute("SELECT 1 FROM user_waifus WHERE user_id=? AND waifu_id=? LIMIT 1", (user_id, wid))
-            r = cur.fetchone()
-            return 1 if r else 0
-    finally:
-        conn.close()
-
-
-def transfer_one_card_atomic(giver: int, receiver: int, wid: int) -> bool:
+async def transfer_one_card_atomic(giver: int, receiver: int, wid: int) -> bool:
     """
     Atomically remove 1 from giver and add 1 to receiver.
-    Supports user_waifus with 'amount' column, otherwise uses rowid delete/insert fallback.
     Returns True on success, False on failure.
     """
-    cols = _table_columns("user_waifus")
-    conn = _conn()
-    cur = conn.cursor()
     try:
-        cur.execute("BEGIN")
-        if "amount" in cols:
-            # check giver amount
-            cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (giver, wid))
-            r = cur.fetchone()
-            if not r or r[0] <= 0:
-                conn.rollback()
-                return False
-            g_amt = r[0]
-            # decrement giver
-            if g_amt > 1:
-                cur.execute("UPDATE user_waifus SET amount=amount-1 WHERE user_id=? AND waifu_id=?", (giver, wid))
-            else:
-                cur.execute("DELETE FROM user_waifus WHERE user_id=? AND waifu_id=?", (giver, wid))
-            # increment receiver
-            cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (receiver, wid))
-            r2 = cur.fetchone()
-            if r2:
-                cur.execute("UPDATE user_waifus SET amount=amount+1 WHERE user_id=? AND waifu_id=?", (receiver, wid))
-            else:
-                cur.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (receiver, wid))
-        else:
-            # fallback: delete one row by rowid from giver, insert new for receiver
-            # select a rowid to delete
-            cur.execute("SELECT rowid FROM user_waifus WHERE user_id=? AND waifu_id=? LIMIT 1", (giver, wid))
-            r = cur.fetchone()
-            if not r:
-                conn.rollback()
-                return False
-            rowid = r[0]
-            cur.execute("DELETE FROM user_waifus WHERE rowid=?", (rowid,))
-            # insert into receiver
-            cur.execute("INSERT INTO user_waifus (user_id, waifu_id) VALUES (?, ?)", (receiver, wid))
-        conn.commit()
+        await db.write(_transfer_one_card, giver, receiver, wid)
         return True
+    except _GiftAborted:
+        return False
     except Exception:
-        conn.rollback()
         traceback.print_exc()
         return False
-    finally:
-        conn.close()
 
 
 # ---------- /gift command ----------
@@ -158,13 +79,13 @@ async def cmd_gift(client, message: Message):
             return
 
         # check giver owns card
-        amt = user_card_amount(giver, wid)
+        amt = await user_card_amount(giver, wid)
         if amt <= 0:
             await message.reply_text("❌ You don't own that waifu card.", parse_mode=None)
             return
 
         # fetch card
-        card = get_card(wid)
+        card = catalogue.get(wid)
         if not card:
             await message.reply_text("❌ Waifu card not found in database.", parse_mode=None)
             return
@@ -173,14 +94,11 @@ async def cmd_gift(client, message: Message):
         lines = []
         lines.append("🎁 Gift Offer 🎁")
         lines.append("")
-        lines.append("ID: " + str(card.get("id", wid)))
-        lines.append("Name: " + str(card.get("name", "—")))
-        lines.append("Anime: " + str(card.get("anime", "—")))
-        lines.append("Rarity: " + str(card.get("rarity", "—")))
-        if "event" in card:
-            lines.append("Event: " + str(card.get("event") or "—"))
-        if "theme" in card:
-            lines.append("Theme: " + str(card.get("theme") or "—"))
+        lines.append("ID: " + str(card.id))
+        lines.append("Name: " + str(card.name or "—"))
+        lines.append("Anime: " + str(card.anime or "—"))
+        lines.append("Rarity: " + str(card.rarity or "—"))
+        lines.append("Event: " + str(card.event or "—"))
         lines.append("")
         lines.append("From: " + (message.from_user.first_name or str(giver)) + f" (id:{giver})")
         lines.append("To: " + (receiver_user.first_name or str(receiver)) + f" (id:{receiver})")
@@ -199,25 +117,11 @@ async def cmd_gift(client, message: Message):
             ]
         ])
 
-        media_type = card.get("media_type")
-        media_file = card.get("media_file")
+        media_type = card.media_type
+        media_file = card.media_file
 
-        # Try to preview under recipient's message (so they notice it)
-        try:
-            if media_type and media_file:
-                if media_type.lower() in ("photo", "image", "photo_file"):
-                    await message.reply_to_message.reply_photo(photo=media_file, caption=caption, reply_markup=kb, parse_mode=None)
-                elif media_type.lower() in ("video", "animation", "mp4"):
-                    await message.reply_to_message.reply_video(video=media_file, caption=caption, reply_markup=kb, parse_mode=None)
-                else:
-                    # unknown media type - send text preview
-                    await message.reply_text(caption, reply_markup=kb, parse_mode=None)
-            else:
-                await message.reply_text(caption, reply_markup=kb, parse_mode=None)
-        except Exception as e:
-            print("[gift] preview send failed:", e)
-            # fallback
-            await message.reply_text(caption, reply_markup=kb, parse_mode=None)
+        # Preview under recipient's message (so they notice it); text if the media is broken
+        await send_card(message.reply_to_message, media_type, media_file, caption, reply_markup=kb, parse_mode=None)
 
         print(f"[gift] pending {nonce} -> giver={giver}, receiver={receiver}, wid={wid}")
 
@@ -264,8 +168,13 @@ async def cb_gift(client, callback: CallbackQuery):
             return
 
         # action == gift_confirm
+        # claim the offer first so a double tap can't move two copies
+        if pending_gifts.pop(nonce, None) is None:
+            await callback.answer("⚠️ This gift was already handled.", show_alert=True)
+            return
+
         # verify giver still has the card
-        cur_amt = user_card_amount(giver, wid)
+        cur_amt = await user_card_amount(giver, wid)
         if cur_amt <= 0:
             try:
                 await callback.message.edit_caption("❌ Gift failed: giver no longer owns the card.", reply_markup=None)
@@ -278,7 +187,7 @@ async def cb_gift(client, callback: CallbackQuery):
             await callback.answer("Gift failed.", show_alert=True)
             return
 
-        ok = transfer_one_card_atomic(giver, receiver, wid)
+        ok = await transfer_one_card_atomic(giver, receiver, wid)
         if not ok:
             try:
                 await callback.message.edit_caption("❌ Gift failed during DB update.", reply_markup=None)
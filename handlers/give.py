@@ -3,9 +3,12 @@
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import Config, app
-from database import Database
+from database import get_db
+from catalogue import get_catalogue
+from media import send_card
 
-db = Database()
+db = get_db()
+catalogue = get_catalogue()
 
 # ---------------- /give command ----------------
 @app.on_message(filters.command("give") & filters.user(Config.OWNER_ID))
@@ -27,27 +30,11 @@ async def give_card_cmd(client, message: Message):
     target_user = message.reply_to_message.from_user
     target_user_id = target_user.id
 
-    # Fetch card from DB
-    db.cursor.execute("""
-        SELECT id, name, anime, rarity, event, media_type, media_file
-        FROM waifu_cards WHERE id=?
-    """, (waifu_id,))
-    card = db.cursor.fetchone()
-
+    card = catalogue.get(waifu_id)
     if not card:
         await message.reply_text("❌ Card not found in database.")
         return
 
-    card_info = {
-        "id": card[0],
-        "name": card[1],
-        "anime": card[2],
-        "rarity": card[3],
-        "event": card[4],
-        "media_type": card[5],
-        "media_file": card[6]
-    }
-
     # Buttons
     buttons = InlineKeyboardMarkup([
         [
@@ -59,18 +46,15 @@ async def give_card_cmd(client, message: Message):
     # Caption
     caption = (
         f"🎁 Owner wants to give a card to {target_user.first_name} ({target_user_id})\n\n"
-        f"🆔 Waifu ID: {card_info['id']}\n"
-        f"👤 Name: {card_info['name']}\n"
-        f"⛩️ Anime: {card_info['anime']}\n"
-        f"❄️ Rarity: {card_info['rarity']}\n"
-        f"🎀 Event/Theme: {card_info['event']}"
+        f"🆔 Waifu ID: {card.id}\n"
+        f"👤 Name: {card.name}\n"
+        f"⛩️ Anime: {card.anime}\n"
+        f"❄️ Rarity: {card.rarity}\n"
+        f"🎀 Event/Theme: {card.event}"
     )
 
     # Send preview
-    if card_info["media_type"] == "photo":
-        await message.reply_photo(card_info["media_file"], caption=caption, reply_markup=buttons)
-    else:
-        await message.reply_video(card_info["media_file"], caption=caption, reply_markup=buttons)
+    await send_card(message, card.media_type, card.media_file, caption, reply_markup=buttons)
 
 
 # ---------------- Callback handler ----------------
@@ -90,59 +74,27 @@ async def give_callback(client, callback_query: CallbackQuery):
         await callback_query.answer("❌ Only owner can confirm/cancel.", show_alert=True)
         return
 
-    # Fetch card
-    db.cursor.execute("""
-        SELECT id, name, anime, rarity, event, media_type, media_file
-        FROM waifu_cards WHERE id=?
-    """, (waifu_id,))
-    card = db.cursor.fetchone()
+    card = catalogue.get(waifu_id)
     if not card:
         await callback_query.answer("❌ Card not found.", show_alert=True)
         return
 
-    card_info = {
-        "id": card[0],
-        "name": card[1],
-        "anime": card[2],
-        "rarity": card[3],
-        "event": card[4],
-        "media_type": card[5],
-        "media_file": card[6]
-    }
-
     if action == "confirm":
         # Add to user collection
-        db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_waifus (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                waifu_id INTEGER,
-                amount INTEGER DEFAULT 1
-            )
-        """)
-        db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (target_user_id, waifu_id))
-        row = db.cursor.fetchone()
-        if row:
-            db.cursor.execute("UPDATE user_waifus SET amount=amount+1 WHERE user_id=? AND waifu_id=?", (target_user_id, waifu_id))
-        else:
-            db.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (target_user_id, waifu_id))
-        db.conn.commit()
+        await db.add_waifu_to_inventory(target_user_id, waifu_id, reason="give", counterparty=callback_query.from_user.id)
 
         # Send card to user privately
         caption = (
             f"🔮✨ C A R D G I V E N ! ✨🔮\n\n"
-            f"🆔 Waifu ID: {card_info['id']}\n"
-            f"👤 Name: {card_info['name']}\n"
-            f"⛩️ Anime: {card_info['anime']}\n"
-            f"❄️ Rarity: {card_info['rarity']}\n"
-            f"🎀 Event/Theme: {card_info['event']}"
+            f"🆔 Waifu ID: {card.id}\n"
+            f"👤 Name: {card.name}\n"
+            f"⛩️ Anime: {card.anime}\n"
+            f"❄️ Rarity: {card.rarity}\n"
+            f"🎀 Event/Theme: {card.event}"
         )
 
         try:
-            if card_info["media_type"] == "photo":
-                await client.send_photo(target_user_id, card_info["media_file"], caption=caption)
-            else:
-                await client.send_video(target_user_id, card_info["media_file"], caption=caption)
+            await send_card(client, card.media_type, card.media_file, caption, chat_id=target_user_id)
         except:
             await callback_query.message.edit_text("❌ Failed to send media to user.")
 
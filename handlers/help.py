@@ -14,7 +14,7 @@ def get_role(user_id: int):
 
 
 HELP_TEXT = {
-    "user": """
+    "user": f"""
 🌸 **Available Commands** 🌸
 
 🎀 **General Commands**:
@@ -30,9 +30,10 @@ HELP_TEXT = {
 /search [name] – Search waifus by name 🔎
 /wishlist – Manage your waifu wishlist 📝
 /fav [waifu_id] – Set your favorite waifu 💞
+@{Config.BOT_USERNAME} collection – Show off your collection inline 🖼️
 
 🛍️ **Market Commands**:
-/buy [waifu_id] – Buy a waifu 💖
+/buy [waifu_id] – Buy a waifu from your store 💖
 /mymarket – Browse your waifus for sale 🛒
 /sell [waifu_id] [price] – Put a waifu up for sale 💎
 /gift [waifu_id] – Gift a waifu to another user 🎁
@@ -41,6 +42,8 @@ HELP_TEXT = {
 📊 **Stats Commands**:
 /top – Global top collectors 👑
 /tdtop – Today’s top collectors 🌙
+/wtop – This week’s top collectors 📅
+/mtop – This month’s top collectors 🗓️
 /ctop – Top collecting chats 🏮
 /dropcount – Check messages until next drop ⏳
 /rarity – View waifu rarity tiers 🧚
@@ -57,6 +60,8 @@ HELP_TEXT = {
 /gunban – Global unban user 🔓
 /reset – Reset user’s collection ♻️
 /announce [text] – Send announcement 📢
+/bstatus [id] – Announcement progress 📊
+/bpause, /bresume, /bcancel [id] – Control an announcement ⏯️
 /event [name] – Start event 🎉
 """,
 
@@ -69,6 +74,11 @@ HELP_TEXT = {
 /deleteallwaifu – Delete all waifus 💀
 /backupdb – Backup database 💾
 /showdb – Show bot usage statistics 📊
+/dbexplain – Check hot queries use an index 🗄️
+/rebuildrarities – Recount profile rarity totals 🔁
+/mediahealth [scan] – Cards whose media needs re-uploading 🩺
+/inlinestats – Inline gallery cache hit rate and latency 🔎
+/ledger [verify|user_id] – Economy audit trail and replay check 📒
 """
 }
 
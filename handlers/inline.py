@@ -1,98 +1,65 @@
-# inline.py
-import sqlite3
-from aiogram import types, Dispatcher
-from aiogram.types import (
-    InlineQueryResultArticle,
-    InlineQueryResultPhoto,
-    InlineQueryResultVideo,
-    InputTextMessageContent
-)
-from uuid import uuid4
+# handlers/inline.py
+from pyrogram import filters
+from pyrogram.types import InlineQuery
+from config import app
+from catalogue import get_catalogue
+from inventory_cache import inventory_cache
+from media import inline_result
 
-DB_PATH = "waifu_bot.db"
+catalogue = get_catalogue()
 
-def search_waifus(query: str, limit: int = 10):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+PAGE_SIZE = 50
+CACHE_TIME = 10  # collections change; our snapshot cache does the heavy lifting
+
+# "collection" shows your own cards, "collection.<user_id>" someone else's
+COLLECTION_QUERY = r"^\s*collection(?:\.(\d+))?\s*$"
+
+
+def parse_offset(offset):
+    """'amount.waifu_id' keyset cursor -> tuple, or None for the first page."""
     try:
-        c.execute(
-            "SELECT id, name, anime, rarity, file_id FROM waifus "
-            "WHERE name LIKE ? OR anime LIKE ? LIMIT ?",
-            (f"%{query}%", f"%{query}%", limit)
-        )
-        results = c.fetchall()
-        print(f"[DEBUG] Found {len(results)} results for query '{query}'")  # DEBUG
-    except Exception as e:
-        print("[DB ERROR]", e)
-        results = []
-    conn.close()
-    return results
+        amount, wid = map(int, offset.split("."))
+    except ValueError:
+        return None
+    return amount, wid
 
 
-async def inline_search(inline_query: types.InlineQuery):
-    query = inline_query.query.strip()
-    print(f"[DEBUG] Inline query received: '{query}'")  # DEBUG
+# Runs before the global gallery (group 0) and stops it from answering too
+@app.on_inline_query(filters.regex(COLLECTION_QUERY), group=-1)
+async def inline_collection(client, iq: InlineQuery):
+    owner_id = int(iq.matches[0].group(1) or iq.from_user.id)
+    own = owner_id == iq.from_user.id
 
-    if not query:
-        await inline_query.answer([], cache_time=1)
-        return
+    snapshot = await inventory_cache.get(owner_id)
+    rows, _, more = snapshot.page(parse_offset(iq.offset or ""), PAGE_SIZE)
 
-    waifus = search_waifus(query)
     results = []
-
-    for wid, name, anime, rarity, file_id in waifus:
+    for wid, amount in rows:
+        card = catalogue.get(wid)
+        if card is None:
+            continue  # deleted card still sitting in an inventory
         caption = (
-            f"🔮✨ CARD COLLECTED! ✨🔮\n\n"
-            f"🆔 ID: {wid}\n"
-            f"👤 Name: {name}\n"
-            f"🤝 Anime: {anime}\n"
-            f"❄️ Rarity: {rarity}\n\n"
-            f"Type /inventory to view your collection! 📚"
+            f"🆔 ID: {wid}\n👤 Name: {card.name}\n🤝 Anime: {card.anime}\n"
+            f"❄️ Rarity: {card.rarity}\n📦 Owned: ×{amount}"
         )
+        result = inline_result(str(wid), card.media_file, caption, f"{card.name} ×{amount}")
+        if result is not None:
+            results.append(result)
 
-        # If no file_id saved → fallback to text card
-        if not file_id:
-            results.append(
-                InlineQueryResultArticle(
-                    id=str(uuid4()),
-                    title=f"{name} ({anime})",
-                    description=f"Rarity: {rarity}",
-                    input_message_content=InputTextMessageContent(caption)
-                )
-            )
-        elif file_id.startswith("AgAC") or file_id.startswith("BAAC"):  # photo
-            results.append(
-                InlineQueryResultPhoto(
-                    id=str(uuid4()),
-                    photo_file_id=file_id,
-                    caption=caption
-                )
-            )
-        else:  # fallback as video
-            results.append(
-                InlineQueryResultVideo(
-                    id=str(uuid4()),
-                    video_file_id=file_id,
-                    title=name,
-                    caption=caption,
-                    mime_type="video/mp4"
-                )
-            )
-
-    if not results:
-        # fallback "no result" card
-        results.append(
-            InlineQueryResultArticle(
-                id=str(uuid4()),
-                title="No results",
-                input_message_content=InputTextMessageContent(
-                    "❌ No waifu found for your search."
-                )
-            )
+    next_offset = f"{rows[-1][1]}.{rows[-1][0]}" if more and rows else ""
+    if not rows and not iq.offset:
+        await iq.answer(
+            [],
+            switch_pm_text="Your collection is empty 😢" if own else "This collection is empty 😢",
+            switch_pm_parameter="start",
+            cache_time=CACHE_TIME,
+            is_personal=own
         )
-
-    await inline_query.answer(results, cache_time=1)
-
-
-def register_inline(dp: Dispatcher):
-    dp.register_inline_handler(inline_search)
+    else:
+        await iq.answer(
+            results,
+            cache_time=CACHE_TIME,
+            is_personal=own,  # collection.<id> looks the same to everyone
+            next_offset=next_offset
+        )
+    iq.stop_propagation()
@@ -1,84 +1,92 @@
 # handlers/inline_gallery_scroll.py
-import sqlite3
+import time
+from collections import deque
+
 from pyrogram import filters
-from pyrogram.types import (
-    InlineQuery,
-    InlineQueryResultCachedPhoto,
-    InlineQueryResultCachedVideo,
-    InputTextMessageContent
-)
-from config import app
-
-DB_PATH = "waifu_bot.db"
-
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def fetch_waifu_cards(search: str = "", limit: int = 50, offset: int = 0):
-    conn = _conn()
-    cur = conn.cursor()
-    if search:
-        q = f"%{search.lower()}%"
-        cur.execute(
-            "SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards "
-            "WHERE LOWER(name) LIKE ? OR LOWER(anime) LIKE ? ORDER BY id ASC LIMIT ? OFFSET ?",
-            (q, q, limit, offset)
-        )
-    else:
-        cur.execute(
-            "SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards ORDER BY id ASC LIMIT ? OFFSET ?",
-            (limit, offset)
-        )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+from pyrogram.types import InlineQuery
+from cache import TTLCache
+from config import Config, app
+from catalogue import get_catalogue
+from media import inline_result
+from search_index import get_search_index, normalize
+
+catalogue = get_catalogue()
+search_index = get_search_index()
+
+PAGE_SIZE = 50
+
+# (normalized query, cursor, catalogue version) -> (results, next_offset).
+# The gallery is the same for every user, so a page is built once and reused
+# until a card changes (which bumps the catalogue version) or it falls out of
+# the LRU.
+page_cache = TTLCache(Config.INLINE_CACHE_SIZE, ttl=Config.INLINE_CACHE_TIME)
+
+# Recent answer latencies in ms, for /inlinestats
+latencies = deque(maxlen=1000)
+
+
+async def fetch_waifu_cards(search: str = "", limit: int = PAGE_SIZE, cursor: str = ""):
+    """Ranked name/anime matches (all cards by id when empty) and the next page cursor."""
+    ids, next_cursor = search_index.search(search, limit=limit, cursor=cursor)
+    cards = [
+        catalogue.get(wid).values("id", "name", "anime", "rarity", "media_type", "media_file")
+        for wid in ids
+    ]
+    return cards, next_cursor
+
+
+async def build_page(query: str, cursor: str):
+    cards, next_offset = await fetch_waifu_cards(query, limit=PAGE_SIZE, cursor=cursor)
+    results = []
+    for wid, name, anime, rarity, media_type, media_file in cards:
+        caption = f"🆔 ID: {wid}\n👤 Name: {name}\n🤝 Anime: {anime}\n❄️ Rarity: {rarity}"
+        result = inline_result(str(wid), media_file, caption, f"{name} [{rarity}]")
+        if result is not None:
+            results.append(result)
+    return results, next_offset
+
 
 @app.on_inline_query()
 async def inline_waifu_gallery(client, iq: InlineQuery):
-    query = (iq.query or "").strip()
-    offset = int(iq.offset or 0)
-    limit = 50
-    cards = fetch_waifu_cards(query, limit=limit, offset=offset)
+    started = time.perf_counter()
+    query = normalize(iq.query)
+    cursor = iq.offset or ""
 
-    if not cards:
+    key = (query, cursor, catalogue.version)
+    results, next_offset = await page_cache.fetch(key, lambda: build_page(query, cursor))
+
+    if not results and not cursor:
         await iq.answer(
             [],
             switch_pm_text="No waifus found 😢",
             switch_pm_parameter="start",
-            cache_time=30
+            cache_time=Config.INLINE_CACHE_TIME,
+            is_personal=False
+        )
+    else:
+        await iq.answer(
+            results,
+            cache_time=Config.INLINE_CACHE_TIME,
+            is_personal=False,
+            next_offset=next_offset
         )
-        return
+    latencies.append((time.perf_counter() - started) * 1000)
+
+
+# ---------------- /inlinestats Command (Owner only) ----------------
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0
 
-    results = []
-    for wid, name, anime, rarity, media_type, media_file in cards:
-        caption = f"🆔 ID: {wid}\n👤 Name: {name}\n🤝 Anime: {anime}\n❄️ Rarity: {rarity}"
 
-        try:
-            if media_type in ("photo", "image"):
-                results.append(
-                    InlineQueryResultCachedPhoto(
-                        id=str(wid),
-                        photo_file_id=media_file,
-                        caption=caption    # ✅ send photo with caption
-                    )
-                )
-            elif media_type in ("video", "animation"):
-                results.append(
-                    InlineQueryResultCachedVideo(
-                        id=str(wid),
-                        video_file_id=media_file,
-                        title=f"{name} [{rarity}]",
-                        caption=caption    # ✅ send video with caption
-                    )
-                )
-        except Exception as e:
-            print(f"[inline_gallery_scroll] error creating result for {name}: {e}")
-
-    next_offset = str(offset + limit) if len(cards) == limit else ""
-
-    await iq.answer(
-        results,
-        cache_time=30,
-        is_personal=True,
-        next_offset=next_offset
+@app.on_message(filters.command("inlinestats") & filters.user(Config.OWNER_ID))
+async def inline_stats_cmd(client, message):
+    lookups = page_cache.hits + page_cache.misses + page_cache.stale
+    hit_rate = (page_cache.hits + page_cache.stale) / lookups * 100 if lookups else 0
+    await message.reply_text(
+        "🔎 Inline gallery\n\n"
+        f"📦 Cached pages: {len(page_cache)}/{page_cache.maxsize}\n"
+        f"🎯 Hit rate: {hit_rate:.1f}% ({page_cache.hits + page_cache.stale}/{lookups})\n"
+        f"⏱ Answer time (last {len(latencies)}): "
+        f"p50 {percentile(latencies, 50):.0f} ms · p95 {percentile(latencies, 95):.0f} ms"
     )
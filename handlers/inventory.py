@@ -1,92 +1,131 @@
 # handlers/inventory.py
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.errors import MessageNotModified
 from config import app
-from database import Database
+from catalogue import get_catalogue
+from inventory_cache import inventory_cache
+from media import send_card
 
-db = Database()
+catalogue = get_catalogue()
 
 ITEMS_PER_PAGE = 10
 
-# ---------------- /inventory Command ----------------
-@app.on_message(filters.command("inventory"))
-async def inventory(client, message):
-    user_id = message.from_user.id
-    page = 0  # default page
-    await send_inventory_page(client, message.chat.id, user_id, page)
-
-
-async def send_inventory_page(client, chat_id, user_id, page):
-    offset = page * ITEMS_PER_PAGE
-
-    # ---------------- Get user's favorite card ----------------
-    db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-    fav_row = db.cursor.fetchone()
-    fav_card = None
-    if fav_row:
-        fav_id = fav_row[0]
-        db.cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file FROM waifu_cards WHERE id = ?", (fav_id,))
-        fav_card = db.cursor.fetchone()
-
-    # ---------------- Get user's owned waifus ----------------
-    db.cursor.execute("""
-        SELECT uw.waifu_id, wc.name, wc.rarity, uw.amount
-        FROM user_waifus uw
-        JOIN waifu_cards wc ON uw.waifu_id = wc.id
-        WHERE uw.user_id = ?
-        ORDER BY uw.amount DESC
-        LIMIT ? OFFSET ?
-    """, (user_id, ITEMS_PER_PAGE, offset))
-    rows = db.cursor.fetchall()
-
-    total_cards = db.cursor.execute("SELECT SUM(amount) FROM user_waifus WHERE user_id = ?", (user_id,)).fetchone()[0] or 0
+
+# Keyset pages ordered by (amount DESC, waifu_id) over the cached snapshot.
+# Callback data is "inventory_page:<owner_id>:<cursor>" where the cursor is
+# '>amount:waifu_id' (next page) or '<amount:waifu_id' (previous page).
+# Older buttons still carry "inventory_page:<cursor>" or, from before keyset
+# pages, "inventory_page:<page>" with a 0-based page number.
+def parse_cursor(data):
+    """'>amount:waifu_id' / '<amount:waifu_id' -> (direction, amount, waifu_id); anything else is page 1."""
+    try:
+        amount, wid = data[1:].split(":")
+        if data[0] in "<>":
+            return data[0], int(amount), int(wid)
+    except (IndexError, ValueError):
+        pass
+    return None
+
+
+def parse_callback(data, clicker_id):
+    """
+    callback data -> (owner_id, cursor). Buttons from before owner ids were
+    added belong to whoever taps them; a legacy page number becomes the cursor
+    ('#', page).
+    """
+    rest = data.split(":", 1)[1]
+    owner, sep, cursor = rest.partition(":")
+    if owner.isdigit() and sep:
+        return int(owner), parse_cursor(cursor)
+    if owner.isdigit():
+        return clicker_id, ("#", int(owner))
+    return clicker_id, parse_cursor(rest)
+
+
+async def build_inventory_page(user_id, cursor=None):
+    """(text, markup, favourite Card or None), or None for an empty inventory."""
+    snapshot = await inventory_cache.get(user_id)
+    if cursor and cursor[0] == "#":
+        rows, has_prev, has_next = snapshot.page_number(cursor[1], ITEMS_PER_PAGE)
+    else:
+        page_cursor = cursor[1:] if cursor else None
+        rows, has_prev, has_next = snapshot.page(page_cursor, ITEMS_PER_PAGE, before=bool(cursor) and cursor[0] == "<")
+    fav_card = catalogue.get(snapshot.fav_id) if snapshot.fav_id else None
 
     # ---------------- Handle empty inventory ----------------
     if not rows and not fav_card:
-        await client.send_message(chat_id, "❌ You have no waifus yet!")
-        return
+        return None
 
     text_lines = ["━━━ 🎀 Your Waifu Collection 🎀 ━━━"]
     text_lines.append(f"Showing {ITEMS_PER_PAGE} Waifus ~\n")
 
     # ---------------- Include favorite card at top ----------------
     if fav_card:
-        fav_text = f"❤️ Favorite Waifu\n📷 {fav_card[1]} | ID: {fav_card[0]} | {fav_card[3]} | Owned: 1×"
-        text_lines.append(fav_text)
-        fav_media = fav_card[5], fav_card[6]  # media_type, media_file
-    else:
-        fav_media = None
+        text_lines.append(f"❤️ Favorite Waifu\n📷 {fav_card.name} | ID: {fav_card.id} | {fav_card.rarity} | Owned: 1×")
 
     # ---------------- Add normal collection ----------------
-    for idx, row in enumerate(rows, start=1):
-        text_lines.append(f"{idx}️⃣ {row[1]} | {row[0]} | {row[2]} | Owned: {row[3]}×")
+    for idx, (wid, amount) in enumerate(rows, start=1):
+        card = catalogue.get(wid)
+        if card is None:
+            continue  # deleted card still sitting in the inventory
+        text_lines.append(f"{idx}️⃣ {card.name} | {wid} | {card.rarity} | Owned: {amount}×")
 
     text_lines.append("\n━━━━━━━━━━━━━━━")
-    text_lines.append(f"💖 Total Collected: {total_cards}")
+    text_lines.append(f"💖 Total Collected: {snapshot.total}")
 
     # ---------------- Pagination buttons ----------------
     buttons = []
-    if page > 0:
-        buttons.append(InlineKeyboardButton("⬅️ Back", callback_data=f"inventory_page:{page-1}"))
-    if len(rows) == ITEMS_PER_PAGE:
-        buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"inventory_page:{page+1}"))
+    if has_prev and rows:
+        buttons.append(InlineKeyboardButton("⬅️ Back", callback_data=f"inventory_page:{user_id}:<{rows[0][1]}:{rows[0][0]}"))
+    if has_next and rows:
+        buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"inventory_page:{user_id}:>{rows[-1][1]}:{rows[-1][0]}"))
     markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    return "\n".join(text_lines), markup, fav_card
+
+
+# ---------------- /inventory Command ----------------
+@app.on_message(filters.command("inventory"))
+async def inventory(client, message):
+    user_id = message.from_user.id
+    await send_inventory_page(client, message.chat.id, user_id)
+
+
+async def send_inventory_page(client, chat_id, user_id, cursor=None):
+    page = await build_inventory_page(user_id, cursor)
+    if page is None:
+        await client.send_message(chat_id, "❌ You have no waifus yet!")
+        return
+    text, markup, fav_card = page
 
     # ---------------- Send favorite media first ----------------
-    if fav_media:
-        media_type, media_file = fav_media
-        if media_type == "photo":
-            await client.send_photo(chat_id, media_file, caption="\n".join(text_lines), reply_markup=markup)
-        elif media_type == "video":
-            await client.send_video(chat_id, media_file, caption="\n".join(text_lines), reply_markup=markup)
+    if fav_card:
+        await send_card(client, fav_card.media_type, fav_card.media_file, text, chat_id=chat_id, reply_markup=markup)
     else:
-        await client.send_message(chat_id, "\n".join(text_lines), reply_markup=markup)
+        await client.send_message(chat_id, text, reply_markup=markup)
 
 
 # ---------------- Callback for pagination ----------------
 @app.on_callback_query(filters.regex(r"^inventory_page:"))
 async def inventory_page_callback(client, callback):
-    page = int(callback.data.split(":")[1])
-    user_id = callback.from_user.id
-    await send_inventory_page(client, callback.message.chat.id, user_id, page)
+    owner_id, cursor = parse_callback(callback.data, callback.from_user.id)
+    if callback.from_user.id != owner_id:
+        await callback.answer("🚫 This isn't your inventory. Use /inventory to see yours!", show_alert=True)
+        return
+
+    page = await build_inventory_page(owner_id, cursor)
+    if page is None:
+        await callback.answer("❌ You have no waifus yet!", show_alert=True)
+        return
+    text, markup, _ = page
+
+    # Turn the page in place: same message, same media, new caption and buttons
+    message = callback.message
+    try:
+        if message.photo or message.video or message.animation:
+            await message.edit_caption(text, reply_markup=markup)
+        else:
+            await message.edit_text(text, reply_markup=markup)
+    except MessageNotModified:
+        pass
     await callback.answer()
@@ -1,46 +1,18 @@
 from pyrogram import filters
-from config import app, Config
-import sqlite3, random, time
-
-DB_PATH = Config.DB_PATH
+from config import app
+from database import get_db
+from card_sampler import get_sampler, NO_CINEMATIC_VIDEO
+from media import send_card
+import random, time
+
+db = get_db()
+sampler = get_sampler()
 COOLDOWN = 120  # 2 minutes in seconds
 
-def add_waifu_to_inventory(user_id, waifu_id):
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-        """, (user_id, waifu_id))
-
-        if cur.rowcount == 0:
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-            """, (user_id, waifu_id))
-
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def can_marry(user_id: int):
-    """Check marry cooldown. Returns (True/False, wait_time_remaining)."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_marry (
-            user_id INTEGER PRIMARY KEY,
-            last_marry INTEGER
-        )
-    """)
-    conn.commit()
 
-    cur.execute("SELECT last_marry FROM user_marry WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
+async def can_marry(user_id: int):
+    """Check marry cooldown. Returns (True/False, wait_time_remaining)."""
+    row = await db.fetchone("SELECT last_marry FROM user_marry WHERE user_id = ?", (user_id,))
 
     now = int(time.time())
 
@@ -50,9 +22,7 @@ def can_marry(user_id: int):
             return False, COOLDOWN - (now - last_time)
 
     # Update with new marry time
-    cur.execute("INSERT OR REPLACE INTO user_marry (user_id, last_marry) VALUES (?, ?)", (user_id, now))
-    conn.commit()
-    conn.close()
+    await db.execute("INSERT OR REPLACE INTO user_marry (user_id, last_marry) VALUES (?, ?)", (user_id, now))
     return True, 0
 
 
@@ -62,24 +32,14 @@ async def marry_command(client, message):
     username = message.from_user.mention
 
     # Cooldown check
-    allowed, wait_time = can_marry(user_id)
+    allowed, wait_time = await can_marry(user_id)
     if not allowed:
         minutes = wait_time // 60
         seconds = wait_time % 60
         return await message.reply(f"⏳ You need to wait {minutes}m {seconds}s before trying to marry again!")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
     # Pick random waifu excluding Cinematic Legend videos
-    cur.execute("""
-        SELECT id, name, anime, rarity, media_type, media_file
-          FROM waifu_cards
-         WHERE NOT (rarity='Cinematic Legend' AND LOWER(media_type)='video')
-         ORDER BY RANDOM() LIMIT 1
-    """)
-    row = cur.fetchone()
-    conn.close()
+    row = sampler.fetch_random("id, name, anime, rarity, media_type, media_file", exclude=NO_CINEMATIC_VIDEO)
 
     if not row:
         return await message.reply("❌ No eligible waifus found for marriage.")
@@ -90,28 +50,18 @@ async def marry_command(client, message):
     success = random.choices([True, False], weights=[70, 30], k=1)[0]
 
     if success:
-        add_waifu_to_inventory(user_id, waifu_id)
+        await db.collect_waifu(user_id, waifu_id, reason="marry", chat_id=message.chat.id)
 
         caption = (
             f"💍 {username} got a **YES** from **{name}** "
             f"from *{anime}*! 🌸\n"
             "What a beautiful couple! ❤️"
         )
-        if media_type.lower() == "photo":
-            await message.reply_photo(media_file, caption=caption)
-        elif media_type.lower() == "video":
-            await message.reply_video(media_file, caption=caption)
-        else:
-            await message.reply(caption)
+        await send_card(message, media_type, media_file, caption)
 
     else:
         caption = (
             f"💔 {username}, it seems **{name}** "
             f"from *{anime}* sees you more as a friend than a partner..."
         )
-        if media_type.lower() == "photo":
-            await message.reply_photo(media_file, caption=caption)
-        elif media_type.lower() == "video":
-            await message.reply_video(media_file, caption=caption)
-        else:
-            await message.reply(caption)
+        await send_card(message, media_type, media_file, caption)
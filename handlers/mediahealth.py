@@ -0,0 +1,74 @@
+# handlers/mediahealth.py
+
+import time
+from pyrogram import filters
+from config import app, Config
+from catalogue import get_catalogue
+from media import health
+
+MAX_LISTED = 30
+
+
+def cards_using(media_files):
+    """{media_file: [card ids]} for cards whose media_file or media_file_id is in `media_files`."""
+    out = {}
+    for card in get_catalogue().by_id.values():
+        for media in {card.media_file, card.media_file_id}:
+            if media in media_files:
+                out.setdefault(media, []).append(card.id)
+    return out
+
+
+# ---------------- /mediahealth Command (Owner only) ----------------
+@app.on_message(filters.command("mediahealth") & filters.user(Config.OWNER_ID))
+async def media_health_cmd(client, message):
+    """
+    /mediahealth           – cards whose media needs re-uploading
+    /mediahealth scan      – run the offline check over every card now
+    /mediahealth retry ID  – forget what we know about a card's media so it is tried again
+    """
+    args = message.command[1:]
+
+    if args and args[0] == "scan":
+        if health.scan_task and not health.scan_task.done():
+            await message.reply_text("⏳ A media check is already running.")
+            return
+        status = await message.reply_text("🩺 Checking every card's media...")
+        checked, flagged = await health.start_scan()
+        await status.edit_text(f"✅ Checked {checked} cards, {flagged} newly broken files.\nUse /mediahealth for the list.")
+        return
+
+    if args and args[0] == "retry":
+        card = get_catalogue().get(args[1]) if len(args) > 1 else None
+        if card is None:
+            await message.reply_text("⚠️ Usage: /mediahealth retry <card_id>")
+            return
+        for media in {card.media_file, card.media_file_id} - {None, ""}:
+            await health.forget(media)
+        await message.reply_text(f"🔁 Card {card.id} media will be tried again on the next send.")
+        return
+
+    broken = health.broken()
+    retyped = health.retyped()
+    by_media = cards_using(set(broken))
+
+    lines = ["🩺 Card media health\n"]
+    if health.last_scan:
+        finished_at, checked, _ = health.last_scan
+        lines.append(f"🕒 Last check: {int((time.time() - finished_at) // 60)} min ago ({checked} cards)")
+    lines.append(f"🔀 Sent as a different type than stored: {len(retyped)}")
+    lines.append(f"❌ Broken files: {len(broken)}\n")
+
+    listed = 0
+    for media, record in broken.items():
+        for card_id in by_media.get(media, []):
+            if listed < MAX_LISTED:
+                lines.append(f"• Card {card_id}: {record.last_error}")
+            listed += 1
+    if listed > MAX_LISTED:
+        lines.append(f"... and {listed - MAX_LISTED} more")
+    if listed:
+        lines.append("\n📤 Re-upload these with /editcard <id> photo")
+    else:
+        lines.append("✅ No cards need re-uploading.")
+    await message.reply_text("\n".join(lines))
@@ -1,19 +1,26 @@
 # mymarket.py
 import random
-import sqlite3
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from database import Database
+from database import get_db
+from cache import TTLCache
+from catalogue import get_catalogue
+from assets import get_assets
+from media import send_card
+from state import state
 from config import app  # your pyrogram client instance
 
 # ---------------- CONFIG ----------------
-db = Database()
+db = get_db()
+catalogue = get_catalogue()
+assets = get_assets()
 
-DEFAULT_PHOTO = "photo_2025-08-29_13-53-48.jpg"  # fallback image (keep this file in your bot folder)
+DEFAULT_PHOTO = "photo_2025-08-29_13-53-48.jpg"  # fallback image, uploaded once through the asset registry
 STORE_SIZE = 10
 STORE_REFRESH_COOLDOWN = timedelta(hours=24)
 CURRENCY_SYMBOL = "💎"
@@ -53,8 +60,8 @@ PRICE_MULTIPLIER = {
     "Cinematic Legend": 7.5,
 }
 
-# in-memory pending buy map: user_id -> True (next numeric message is treated as ID)
-pending_buy = {}
+# pending buy map: user_id -> True (next numeric message is treated as ID)
+pending_buy = state.namespace("market_buy", ttl=5 * 60)
 
 
 # ---------- Helpers ----------
@@ -66,53 +73,74 @@ def rarity_emoji(rarity: str) -> str:
     return RARITY_EMOJIS.get(rarity, "❓")
 
 
-def get_user_balance(user_id: int) -> int:
-    """
-    Try to get balance via db.get_crystals (if present),
-    otherwise fallback to reading user_profiles.balance.
-    Returns integer (0 if not found).
-    """
-    # Prefer db.get_crystals if available
-    try:
-        maybe = db.get_crystals(user_id)
-        if maybe:
-            # many existing bots return a tuple like (daily, weekly, monthly, total, last_claim, given)
-            # but if format differs, try best-effort.
-            if isinstance(maybe, (list, tuple)) and len(maybe) >= 4:
-                return int(maybe[3] or 0)
-    except Exception:
-        pass
+async def get_user_balance(user_id: int) -> int:
+    """The user's crystal wallet balance (0 if they have none yet)."""
+    return await db.get_balance(user_id)
 
-    # Fallback raw SQL to user_profiles.balance
-    try:
-        cur = db.cursor
-        cur.execute("SELECT balance FROM user_profiles WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        if row:
-            return int(row[0] or 0)
-    except Exception:
-        pass
 
-    return 0
+# ---------- Deterministic daily store ----------
+# A user's store is a pure function of (user_id, UTC day, refreshed today?)
+# over the card ids, so nothing is stored per user, every view of the day
+# shows the same cards, and a purchase is checked against the store by
+# recomputing it. The sorted ids are snapshotted on the first store of each
+# UTC day, so catalogue edits during the day don't reshuffle anyone's store;
+# deleted cards just drop out of it.
+_store_ids = {"day": None, "ids": ()}
+
+# user_id -> naive UTC datetime of their last store refresh (None if never)
+last_refreshes = TTLCache(10_000, ttl=60 * 60)
+
+
+def utc_day(now=None) -> int:
+    return int(time.time() if now is None else now) // 86400
+
 
+def store_card_ids(day: int):
+    """Card ids the stores of `day` choose from, snapshotted on the first call of the day."""
+    if _store_ids["day"] != day:
+        _store_ids["ids"] = tuple(sorted(catalogue.by_id))
+        _store_ids["day"] = day
+    return _store_ids["ids"]
 
-def pick_store_items(limit: int = STORE_SIZE):
+
+async def last_store_refresh(user_id: int) -> Optional[datetime]:
+    async def _load():
+        last = await db.get_last_claim(user_id, "store_refresh")
+        try:
+            return datetime.fromisoformat(last) if last else None
+        except ValueError:
+            return None  # unparsable: treat as never refreshed
+    return await last_refreshes.fetch(user_id, _load)
+
+
+def refresh_locked(last: Optional[datetime]) -> bool:
+    return last is not None and datetime.utcnow() - last < STORE_REFRESH_COOLDOWN
+
+
+def store_for(user_id: int, day: int, refresh: int, limit: int = STORE_SIZE):
+    """The card ids in a user's store for one day and refresh count."""
+    ids = store_card_ids(day)
+    picks = random.Random(f"{user_id}:{day}:{refresh}").sample(ids, min(STORE_SIZE, len(ids)))
+    return [wid for wid in picks[:limit] if wid in catalogue.by_id]
+
+
+async def todays_store(user_id: int):
+    day = utc_day()
+    last = await last_store_refresh(user_id)
+    refreshed_today = last is not None and (last - datetime(1970, 1, 1)).days == day
+    return store_for(user_id, day, 1 if refreshed_today else 0)
+
+
+async def pick_store_items(user_id: int, limit: int = STORE_SIZE):
     """
-    Pull random rows from waifu_cards and return list of:
+    Today's store for the user as a list of:
     (id, name, rarity, price, media_type, media_file_id, media_file)
     """
-    cur = db.cursor
-    all_rows = cur.execute(
-        "SELECT id, name, rarity, media_type, media_file_id, media_file FROM waifu_cards"
-    ).fetchall()
-    if not all_rows:
-        return []
-    sample = random.sample(all_rows, min(len(all_rows), limit))
     items = []
-    for row in sample:
-        wid, name, rarity, media_type, media_file_id, media_file = row
-        price = price_for_rarity(rarity)
-        items.append((wid, name, rarity, price, (media_type or "").lower(), media_file_id, media_file))
+    for wid in (await todays_store(user_id))[:limit]:
+        card = catalogue.get(wid)
+        price = price_for_rarity(card.rarity)
+        items.append((card.id, card.name, card.rarity, price, (card.media_type or "").lower(), card.media_file_id, card.media_file))
     return items
 
 
@@ -132,21 +160,15 @@ def build_store_caption(items) -> str:
 # ---------- /mymarket command ----------
 @app.on_message(filters.command("mymarket"))
 async def cmd_mymarket(client, message):
-    user_id = message.from_user.id
+    await show_store(message, message.from_user.id)
 
+
+async def show_store(message, user_id: int):
+    """Reply to `message` with the user's store for today."""
     # cooldown check (per-user store refresh)
-    can_refresh = True
-    try:
-        last_refresh = db.get_last_claim(user_id, "store_refresh")
-        if last_refresh:
-            last_time = datetime.fromisoformat(last_refresh)
-            if datetime.utcnow() - last_time < STORE_REFRESH_COOLDOWN:
-                can_refresh = False
-    except Exception:
-        # if any parsing error, allow refresh
-        can_refresh = True
+    can_refresh = not refresh_locked(await last_store_refresh(user_id))
 
-    items = pick_store_items(STORE_SIZE)
+    items = await pick_store_items(user_id, STORE_SIZE)
     if not items:
         await message.reply_text("🛒 The store is currently empty.")
         return
@@ -162,7 +184,7 @@ async def cmd_mymarket(client, message):
 
     # send as photo with caption (no parse_mode), fallback if photo sending raises
     try:
-        await message.reply_photo(photo=DEFAULT_PHOTO, caption=caption, reply_markup=InlineKeyboardMarkup(kb))
+        await assets.send(message.reply_photo, DEFAULT_PHOTO, caption=caption, reply_markup=InlineKeyboardMarkup(kb))
     except Exception:
         # fallback to simple text reply
         await message.reply_text(caption, reply_markup=InlineKeyboardMarkup(kb))
@@ -172,27 +194,21 @@ async def cmd_mymarket(client, message):
 @app.on_callback_query(filters.regex(r"^market_refresh$"))
 async def cb_refresh_store(client, callback_query):
     user_id = callback_query.from_user.id
-    try:
-        last_refresh = db.get_last_claim(user_id, "store_refresh")
-        if last_refresh:
-            last_time = datetime.fromisoformat(last_refresh)
-            if datetime.utcnow() - last_time < STORE_REFRESH_COOLDOWN:
-                await callback_query.answer("❌ You can refresh the store only once every 24 hours.", show_alert=True)
-                return
-    except Exception:
-        pass
+    if refresh_locked(await last_store_refresh(user_id)):
+        await callback_query.answer("❌ You can refresh the store only once every 24 hours.", show_alert=True)
+        return
 
-    # update last refresh
-    db.update_last_claim(user_id, "store_refresh", datetime.utcnow().isoformat())
+    # update last refresh; today's store is re-seeded from it
+    now = datetime.utcnow()
+    await db.update_last_claim(user_id, "store_refresh", now.isoformat())
+    last_refreshes.set(user_id, now)
 
-    # remove old message and send new store
+    # send the new store (for the clicker, not the bot that owns the message), then drop the old one
+    await show_store(callback_query.message, user_id)
     try:
         await callback_query.message.delete()
     except Exception:
         pass
-
-    # Re-run command to display new list
-    await cmd_mymarket(client, callback_query.message)
     await callback_query.answer("✅ Store refreshed!")
 
 
@@ -250,22 +266,22 @@ async def show_preview_for_id(message, waifu_id: int):
     user_id = user.id
 
     # get user balance
-    balance = get_user_balance(user_id)
+    balance = await get_user_balance(user_id)
 
     # fetch waifu
-    cur = db.cursor
-    waifu = cur.execute(
-        "SELECT id, name, anime, rarity, media_type, media_file_id, media_file FROM waifu_cards WHERE id=?",
-        (waifu_id,)
-    ).fetchone()
+    waifu = catalogue.get(waifu_id)
     if not waifu:
         await message.reply_text("❌ Waifu not found. Check the ID and try again.")
         return
+    if waifu_id not in await todays_store(user_id):
+        await message.reply_text("❌ This waifu isn't in your store today. Check /mymarket for today's cards.")
+        return
 
-    _id, name, anime, rarity, media_type, media_file_id, media_file = waifu
+    _id, name, anime, rarity, media_type, media_file_id, media_file = waifu.values(
+        "id", "name", "anime", "rarity", "media_type", "media_file_id", "media_file"
+    )
     price = price_for_rarity(rarity)
     emoji = rarity_emoji(rarity)
-    is_video = (media_type or "").lower() == "video"
 
     if balance < price:
         await message.reply_text(f"❌ You don't have enough balance to buy this waifu.\nPrice: {price}{CURRENCY_SYMBOL} | Your balance: {balance}{CURRENCY_SYMBOL}")
@@ -286,20 +302,8 @@ async def show_preview_for_id(message, waifu_id: int):
          InlineKeyboardButton("❌ Decline", callback_data=f"market_decline_{_id}")],
     ])
 
-    send_id = media_file_id or media_file or DEFAULT_PHOTO
-
-    try:
-        if is_video:
-            # video path/file_id or fallback to image if sending fails
-            await message.reply_video(video=send_id, caption=caption, reply_markup=kb)
-        else:
-            await message.reply_photo(photo=send_id, caption=caption, reply_markup=kb)
-    except Exception:
-        # fallback to default photo caption
-        try:
-            await message.reply_photo(photo=DEFAULT_PHOTO, caption=caption, reply_markup=kb)
-        except Exception:
-            await message.reply_text(caption, reply_markup=kb)
+    # Broken media falls back to the default photo, then to text, without retrying known failures
+    await send_card(message, media_type, media_file_id or media_file, caption, fallback=DEFAULT_PHOTO, reply_markup=kb)
 
 
 # ---------- Confirm / Decline callbacks ----------
@@ -308,40 +312,25 @@ async def cb_market_confirm(client, callback_query):
     user_id = callback_query.from_user.id
     parts = callback_query.data.split("_")
     waifu_id = int(parts[2])
-    price = int(parts[3])
 
-    balance = get_user_balance(user_id)
-    if balance < price:
+    # Price comes from the card, not the button, and the debit is conditional,
+    # so a stale or double-tapped confirm can't overspend
+    waifu = catalogue.get(waifu_id)
+    if not waifu:
+        await callback_query.answer("❌ Waifu not found.", show_alert=True)
+        return
+    if waifu_id not in await todays_store(user_id):
+        await callback_query.answer("❌ This waifu is no longer in your store.", show_alert=True)
+        return
+    price = price_for_rarity(waifu.rarity)
+
+    success = await db.purchase_waifu(user_id, waifu_id, price)
+    if not success:
         await callback_query.answer("❌ Not enough balance.", show_alert=True)
         return
 
-    # Prefer existing DB purchase function if it exists
-    try:
-        success = db.purchase_waifu(user_id, waifu_id, price)
-    except Exception:
-        # fallback manual: deduct from user_profiles.balance and insert into user_waifus
-        success = False
-        try:
-            cur = db.cursor
-            # deduct balance (if table user_profiles.balance exists)
-            cur.execute("UPDATE user_profiles SET balance = balance - ? WHERE user_id = ?", (price, user_id))
-            # add to user_waifus (same pattern used elsewhere in your code)
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-                ON CONFLICT(user_id, waifu_id) DO UPDATE SET amount = amount + 1, last_collected = strftime('%s','now')
-            """, (user_id, waifu_id))
-            db.conn.commit()
-            success = True
-        except Exception:
-            success = False
-
-    if success:
-        await callback_query.message.reply_text(f"✅ Purchase successful! You bought waifu ID {waifu_id} for {price}{CURRENCY_SYMBOL}")
-        await callback_query.answer("✅ Purchased!", show_alert=True)
-    else:
-        await callback_query.message.reply_text("❌ Purchase failed. Please try again or contact the owner.")
-        await callback_query.answer("❌ Purchase failed.", show_alert=True)
+    await callback_query.message.reply_text(f"✅ Purchase successful! You bought waifu ID {waifu_id} for {price}{CURRENCY_SYMBOL}")
+    await callback_query.answer("✅ Purchased!", show_alert=True)
 
 
 @app.on_callback_query(filters.regex(r"^market_decline_(\d+)$"))
@@ -1,8 +1,8 @@
 from pyrogram import filters
 from config import app, OWNER_ID
-from database import Database
+from database import get_db
 
-db = Database()
+db = get_db()
 
 @app.on_message(filters.command("paycrystal") & filters.user(OWNER_ID))
 async def pay_crystal(client, message):
@@ -17,5 +17,6 @@ async def pay_crystal(client, message):
         await message.reply_text("Reply to a user's message to give crystals.")
         return
 
-    db.add_crystals(target.id, given=amount)
+    await db.credit_crystals(target.id, amount, reason="paycrystal", counterparty=message.from_user.id,
+                             chat_id=message.chat.id)
     await message.reply_text(f"💎 Gave {amount} crystals to {target.first_name}.")
@@ -1,13 +1,31 @@
 # handlers/profile.py
 
-import os
 from pyrogram import filters
 from pyrogram.types import Message
 from pyrogram.errors import RPCError
+from cache import TTLCache, MISSING
 from config import Config, app
-from database import Database
+from database import get_db, hot_query
 
-db = Database("waifu_bot.db")  # <- make sure it reads the correct DB
+db = get_db()
+
+# user_id -> (file_id, file_unique_id), or None for users without a photo.
+# The photo is re-sent by file_id, so /profile never downloads or uploads it.
+avatar_cache = TTLCache(Config.AVATAR_CACHE_SIZE, Config.AVATAR_CACHE_TTL)
+
+# user_rarities / user_totals are maintained inside every inventory write, so a
+# profile is a few primary-key lookups plus an index range count for the rank
+TOTAL_CARDS_SQL = hot_query("profile.total_cards", """
+    SELECT cards, crystals FROM user_totals WHERE user_id = ?
+""", (1,))
+
+GLOBAL_RANK_SQL = hot_query("profile.global_rank", """
+    SELECT COUNT(*) + 1 FROM user_totals WHERE cards > ?
+""", (10,))
+
+RARITY_OWNED_SQL = hot_query("profile.rarity_owned", """
+    SELECT rarity, count FROM user_rarities WHERE user_id = ?
+""", (1,))
 
 # ---------------- Updated Rarities ----------------
 RARITIES = [
@@ -23,16 +41,22 @@ RARITY_EMOJIS = [
     "🌪️","🕊️","👑","🔮","💋","📽️"
 ]
 
-# ---------------- Helper: Download profile photo ----------------
+# ---------------- Helper: Cached profile photo ----------------
 async def get_user_profile_photo(client, user_id: int):
-    """Return a downloaded photo file path or None if no photo"""
-    try:
-        async for photo in client.get_chat_photos(user_id, limit=1):
-            file_path = await client.download_media(photo.file_id)
-            return file_path
-    except RPCError:
+    """Return the file_id of the user's current profile photo, or None if they have none"""
+    async def load():
+        try:
+            async for photo in client.get_chat_photos(user_id, limit=1):
+                cached, _ = avatar_cache.lookup(user_id)
+                if cached not in (MISSING, None) and cached[1] == photo.file_unique_id:
+                    return cached  # same picture, keep the id we already sent with
+                return photo.file_id, photo.file_unique_id
+        except RPCError:
+            pass
         return None
-    return None
+
+    avatar = await avatar_cache.fetch(user_id, load)
+    return avatar[0] if avatar else None
 
 # ---------------- /profile Command ----------------
 @app.on_message(filters.command("profile"))
@@ -42,29 +66,23 @@ async def profile_cmd(client, message: Message):
     first_name = user.first_name or "Unknown"
 
     # ---------------- Fetch user profile ----------------
-    profile_data = db.cursor.execute(
-        "SELECT level, rank, badge, total_collected, progress, balance FROM user_profiles WHERE user_id = ?",
+    profile_data = await db.fetchone(
+        "SELECT level, rank, badge, progress FROM user_profiles WHERE user_id = ?",
         (user_id,)
-    ).fetchone()
+    )
 
     if profile_data:
-        level, rank, badge, total_collected, progress, balance = profile_data
+        level, rank, badge, progress = profile_data
     else:
-        level, rank, badge, total_collected, progress, balance = 1, "Newbie", "None", 0, 0, 0
-
-    # ---------------- Calculate rarity breakdown ----------------
-    rarities_count = {}
-    for rarity in RARITIES:
-        count = db.cursor.execute(
-            """
-            SELECT SUM(uw.amount)
-            FROM user_waifus uw
-            JOIN waifu_cards wc ON uw.waifu_id = wc.id
-            WHERE uw.user_id = ? AND wc.rarity = ?
-            """,
-            (user_id, rarity)
-        ).fetchone()[0]
-        rarities_count[rarity] = count or 0
+        level, rank, badge, progress = 1, "Newbie", "None", 0
+
+    # Card count and crystal wallet balance
+    total_collected, balance = await db.fetchone(TOTAL_CARDS_SQL, (user_id,)) or (0, 0)
+    global_rank = (await db.fetchone(GLOBAL_RANK_SQL, (total_collected,)))[0]
+
+    # ---------------- Rarity breakdown ----------------
+    rarities_count = dict.fromkeys(RARITIES, 0)
+    rarities_count.update(await db.fetchall(RARITY_OWNED_SQL, (user_id,)))
 
     # ---------------- Progress bar ----------------
     progress_bar_length = 10
@@ -97,11 +115,7 @@ async def profile_cmd(client, message: Message):
     for rar, emoji in zip(RARITIES, RARITY_EMOJIS):
         profile_text += f"{emoji} {rar} → {rarities_count[rar]}\n"
 
-    # ---------------- Global Rank (optional) ----------------
-    global_rank = db.cursor.execute(
-        "SELECT COUNT(*)+1 FROM user_profiles WHERE total_collected > ?",
-        (total_collected,)
-    ).fetchone()[0]
+    # ---------------- Global Rank ----------------
     profile_text += f"""
 ╔═══❀•°❀°•❀═══╗
 🌍 Global Position → {global_rank}
@@ -112,14 +126,13 @@ Alisa is watching you grow~ 💕”
 """
 
     # ---------------- Get Telegram profile photo ----------------
-    photo_path = await get_user_profile_photo(client, user_id)
+    photo_id = await get_user_profile_photo(client, user_id)
 
     # ---------------- Send profile ----------------
-    if photo_path:
-        await message.reply_photo(photo=photo_path, caption=profile_text)
+    if photo_id:
         try:
-            os.remove(photo_path)
-        except Exception:
-            pass
-    else:
-        await message.reply_text(profile_text)
+            await message.reply_photo(photo=photo_id, caption=profile_text)
+            return
+        except RPCError:
+            avatar_cache.pop(user_id)  # id no longer valid, look it up again next time
+    await message.reply_text(profile_text)
@@ -1,17 +1,22 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from pyrogram.errors import MessageNotModified
-import sqlite3, random, time
-from config import app, Config
+import random, time
+from config import app
+from database import get_db
+from card_sampler import get_sampler
+from media import send_card
+from state import state
 
-DB_PATH = Config.DB_PATH
+db = get_db()
+sampler = get_sampler()
 
-# cooldown tracking: {user_id: timestamp}
-propose_cooldowns = {}
+# cooldown tracking: {user_id: timestamp}, forgotten once the cooldown is over
+propose_cooldowns = state.namespace("propose_cooldowns", ttl=300)
 
-# in-memory store for proposal actions
+# proposal actions, kept across restarts
 # {short_id: (user_id, card_id, waifu_name, media_type, media_file)}
-pending_proposals = {}
+pending_proposals = state.namespace("proposals", ttl=60 * 60, persist=True)
 
 def gen_short_id(length=6):
     import string
@@ -50,11 +55,7 @@ async def propose_waifu(client, message):
     propose_cooldowns[user_id] = now
 
     # pick a random waifu
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, media_type, media_file FROM waifu_cards ORDER BY RANDOM() LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
+    row = sampler.fetch_random("id, name, media_type, media_file")
 
     if not row:
         await message.reply("❌ No waifu cards available in the database.")
@@ -78,10 +79,7 @@ async def propose_waifu(client, message):
         "Will you confess your deepest feelings?"
     )
 
-    if media_type == "video":
-        await message.reply_video(media_file, caption=caption, reply_markup=kb)
-    else:
-        await message.reply_photo(media_file, caption=caption, reply_markup=kb)
+    await send_card(message, media_type, media_file, caption, reply_markup=kb)
 
 @app.on_callback_query(filters.regex(r"^propose_accept:(\w+)$"))
 async def handle_accept(client, callback_query):
@@ -106,35 +104,8 @@ async def handle_accept(client, callback_query):
         await finalize_proposal(callback_query, text, media_type, media_file)
         return
 
-    # Accepted: add to user_waifus WITHOUT schema changes (manual upsert)
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-
-        # Try to increment existing
-        cur.execute(
-            """
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-            """,
-            (user_id, card_id),
-        )
-
-        if cur.rowcount == 0:
-            # No existing row: insert new
-            cur.execute(
-                """
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-                """,
-                (user_id, card_id),
-            )
-
-        conn.commit()
-    finally:
-        conn.close()
+    # Accepted: add to user_waifus
+    await db.collect_waifu(user_id, card_id, reason="propose")
 
     text = (
         f"💖 The world seemed to pause when {waifu_name} embraced you... *\"I'm yours\"* 💕\n\n"
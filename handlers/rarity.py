@@ -2,10 +2,13 @@
 
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from bisect import bisect_left, bisect_right
 from config import Config, app
-from database import Database
+from catalogue import get_catalogue
+from catalogue_stats import get_catalogue_stats
 
-db = Database()
+catalogue = get_catalogue()
+stats = get_catalogue_stats()
 
 RARITIES = [
     "Common Blossom", "Charming Glow", "Elegant Rose", "Rare Sparkle", "Enchanted Flame",
@@ -19,21 +22,25 @@ RARITY_EMOJIS = [
     "⚡","🪞","🌪️","🕊️","👑","🔮","💋","📽️"
 ]
 
-# ---------------- /rarity Command ----------------
-@app.on_message(filters.command("rarity"))
-async def rarity_cmd(client, message: Message):
+def rarity_menu():
+    """Rarity buttons, four per row, each with its live card count."""
     buttons = []
     row = []
     for i, (r, e) in enumerate(zip(RARITIES, RARITY_EMOJIS), start=1):
-        row.append(InlineKeyboardButton(f"{e} {r}", callback_data=f"rarity:{r}"))
+        row.append(InlineKeyboardButton(f"{e} {r} ({stats.rarity_count(r)})", callback_data=f"rarity:{r}"))
         if i % 4 == 0:
             buttons.append(row)
             row = []
     if row:
         buttons.append(row)
+    return InlineKeyboardMarkup(buttons)
+
+# ---------------- /rarity Command ----------------
+@app.on_message(filters.command("rarity"))
+async def rarity_cmd(client, message: Message):
     await message.reply_text(
         "🌸 Select a rarity to see the cards:",
-        reply_markup=InlineKeyboardMarkup(buttons)
+        reply_markup=rarity_menu()
     )
 
 # ---------------- Callback Query ----------------
@@ -43,57 +50,53 @@ PAGE_SIZE = 5
 async def rarity_callback(client, callback_query: CallbackQuery):
     data = callback_query.data.split(":", 1)[1]  # rarity name or main
     chat_id = callback_query.message.chat.id
-    page = 0
+    cursor = ""  # ">id" = page after that card, "<id" = page before it
     if "::" in data:
-        data, page = data.split("::")
-        page = int(page)
+        data, cursor = data.split("::", 1)
 
     if data == "main":
         # Show main rarities menu
-        buttons = []
-        row = []
-        for i, (r, e) in enumerate(zip(RARITIES, RARITY_EMOJIS), start=1):
-            row.append(InlineKeyboardButton(f"{e} {r}", callback_data=f"rarity:{r}"))
-            if i % 4 == 0:
-                buttons.append(row)
-                row = []
-        if row:
-            buttons.append(row)
         await callback_query.message.edit_text(
             "🌸 Select a rarity to see the cards:",
-            reply_markup=InlineKeyboardMarkup(buttons)
+            reply_markup=rarity_menu()
         )
         await callback_query.answer()
         return
 
     rarity_name = data
 
-    # Fetch cards from DB
-    db.cursor.execute("SELECT id, name FROM waifu_cards WHERE rarity=?", (rarity_name,))
-    cards = db.cursor.fetchall()
+    # Sorted card ids for this rarity, straight from the catalogue
+    ids = catalogue.ids_by_rarity(rarity_name)
 
-    if not cards:
+    if not ids:
         await callback_query.message.edit_text(
             f"❌ No cards exist for rarity '{rarity_name}'.\nPlease ask admin to add cards for this rarity."
         )
         await callback_query.answer()
         return
 
-    # Pagination
-    start = page * PAGE_SIZE
+    # Keyset pagination: seek to the cursor card with bisect
+    start = 0
+    try:
+        if cursor.startswith(">"):
+            start = bisect_right(ids, int(cursor[1:]))
+        elif cursor.startswith("<"):
+            start = max(0, bisect_left(ids, int(cursor[1:])) - PAGE_SIZE)
+    except ValueError:
+        start = 0
     end = start + PAGE_SIZE
-    page_cards = cards[start:end]
+    page_ids = ids[start:end]
 
     text = f"🌸 Cards for rarity: {rarity_name}\n\n"
-    for i, card in enumerate(page_cards, start=1 + start):
-        text += f"{i}. {card[1]} | ID: {card[0]}\n"
+    for i, wid in enumerate(page_ids, start=1 + start):
+        text += f"{i}. {catalogue.get(wid).name} | ID: {wid}\n"
 
     # Navigation buttons
     nav_buttons = []
-    if start > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Back", callback_data=f"rarity:{rarity_name}::{page-1}"))
-    if end < len(cards):
-        nav_buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"rarity:{rarity_name}::{page+1}"))
+    if start > 0 and page_ids:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Back", callback_data=f"rarity:{rarity_name}::<{page_ids[0]}"))
+    if end < len(ids) and page_ids:
+        nav_buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"rarity:{rarity_name}::>{page_ids[-1]}"))
     nav_buttons.append(InlineKeyboardButton("🔙 Back to rarities", callback_data="rarity:main"))
 
     await callback_query.message.edit_text(text, reply_markup=InlineKeyboardMarkup([nav_buttons]))
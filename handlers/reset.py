@@ -3,7 +3,6 @@ import sqlite3
 import time
 import random
 import traceback
-from typing import Dict, Any, List
 
 from pyrogram import filters
 from pyrogram.types import (
@@ -13,13 +12,11 @@ from pyrogram.types import (
     InlineKeyboardButton,
 )
 from config import app, Config
+from database import get_db, bump_totals, touch_inventory, record_entry
+from state import state
 
-DB_PATH = "waifu_bot.db"
-pending_resets: Dict[str, Dict[str, Any]] = {}  # nonce -> info
-
-
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+db = get_db()
+pending_resets = state.namespace("resets", ttl=300)  # nonce -> info; confirmations expire after 5 minutes
 
 
 def table_exists(conn: sqlite3.Connection, table: str) -> bool:
@@ -70,11 +67,11 @@ def get_user_collection_count(conn: sqlite3.Connection, user_id: int) -> int:
         return total
 
 
-def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
+def delete_user_collections(conn: sqlite3.Connection, user_id: int, issuer_id: int = None) -> int:
     """
     Delete user's collection rows from known tables.
     Returns total units deleted (sum of amounts if present; otherwise number of rows deleted).
-    This function commits the changes.
+    Must run inside a write transaction (see `db.write`).
     """
     cur = conn.cursor()
     total_removed_units = 0
@@ -93,7 +90,17 @@ def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
             removed_units = int(r[0]) if r else 0
             total_removed_units += removed_units
 
+        # One ledger entry per card so the ledger replays to an empty inventory
+        if column_exists(conn, "user_waifus", "amount"):
+            for waifu_id, amount in cur.execute(
+                "SELECT waifu_id, amount FROM user_waifus WHERE user_id=? AND amount != 0", (user_id,)
+            ).fetchall():
+                record_entry(user_id, "reset", cards=-amount, waifu_id=waifu_id, counterparty=issuer_id)
+
         cur.execute("DELETE FROM user_waifus WHERE user_id=?", (user_id,))
+        bump_totals(conn, user_id, cards=-removed_units)
+        cur.execute("DELETE FROM user_rarities WHERE user_id=?", (user_id,))
+        touch_inventory(user_id)
 
     # Try a few likely alternative tables (safe, check existence first)
     alt_tables = ["collections", "user_cards", "user_collection", "inventory", "user_inventory"]
@@ -112,10 +119,14 @@ def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
 
             cur.execute(f"DELETE FROM {t} WHERE user_id=?", (user_id,))
 
-    conn.commit()
     return total_removed_units
 
 
+def _reset_user(conn: sqlite3.Connection, user_id: int, issuer_id: int = None):
+    """Return (units before, units removed) for a full collection wipe."""
+    return get_user_collection_count(conn, user_id), delete_user_collections(conn, user_id, issuer_id)
+
+
 # ----------------- /reset command -----------------
 @app.on_message(filters.command("reset"))
 async def cmd_reset(client, message: Message):
@@ -258,47 +269,39 @@ async def cb_reset(client, callback: CallbackQuery):
             return
 
         # action == confirm -> perform deletion
-        conn = _conn()
-        try:
-            before_count = get_user_collection_count(conn, target_id)
-            removed_units = delete_user_collections(conn, target_id)
-            # if delete_user_collections couldn't compute units but returns 0, fallback to before_count
-            if removed_units == 0 and before_count:
-                removed_units = before_count
+        before_count, removed_units = await db.write(_reset_user, target_id, user_id)
+        # if delete_user_collections couldn't compute units but returns 0, fallback to before_count
+        if removed_units == 0 and before_count:
+            removed_units = before_count
 
-            # remove pending entry
-            pending_resets.pop(nonce, None)
+        # remove pending entry
+        pending_resets.pop(nonce, None)
 
-            # edit callback message to show result
-            try:
-                await callback.message.edit_text(
-                    f"✅ Reset completed!\n\nTarget ID: {target_id}\nRemoved units: {removed_units}"
-                )
-            except:
-                pass
+        # edit callback message to show result
+        try:
+            await callback.message.edit_text(
+                f"✅ Reset completed!\n\nTarget ID: {target_id}\nRemoved units: {removed_units}"
+            )
+        except:
+            pass
 
-            # notify issuer in chat (already edited), also attempt to DM target
-            try:
-                await client.send_message(
-                    callback.message.chat.id,
-                    f"✅ Collection reset by {callback.from_user.mention} for user ID {target_id} — removed {removed_units} units."
-                )
-            except:
-                pass
+        # notify issuer in chat (already edited), also attempt to DM target
+        try:
+            await client.send_message(
+                callback.message.chat.id,
+                f"✅ Collection reset by {callback.from_user.mention} for user ID {target_id} — removed {removed_units} units."
+            )
+        except:
+            pass
 
-            # DM target if possible (best-effort)
-            try:
-                await client.send_message(target_id, f"⚠️ Your collection was reset by an admin. If you think this is a mistake contact support.")
-            except:
-                # ignore if blocked or cannot message
-                pass
+        # DM target if possible (best-effort)
+        try:
+            await client.send_message(target_id, f"⚠️ Your collection was reset by an admin. If you think this is a mistake contact support.")
+        except:
+            # ignore if blocked or cannot message
+            pass
 
-            await callback.answer("Reset completed.", show_alert=False)
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
+        await callback.answer("Reset completed.", show_alert=False)
 
     except Exception:
         traceback.print_exc()
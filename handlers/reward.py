@@ -1,87 +1,41 @@
 from pyrogram import filters
-from config import app, Config
-import sqlite3, random, time
+from config import app
+from database import get_db
+from card_sampler import get_sampler
+from media import send_card
+import time
 
-DB_PATH = Config.DB_PATH
+db = get_db()
+sampler = get_sampler()
+REWARD_COLUMNS = "id, name, anime, event, media_file"
 
-def add_waifu_to_inventory(user_id, waifu_id):
-    """Insert or update user_waifus with given waifu_id"""
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-
-        # Try to increment existing row
-        cur.execute("""
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-        """, (user_id, waifu_id))
-
-        if cur.rowcount == 0:
-            # No row yet, insert
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-            """, (user_id, waifu_id))
-
-        conn.commit()
-    finally:
-        conn.close()
-
-def has_claimed_reward(user_id):
+async def has_claimed_reward(user_id):
     """Check if user already claimed the one-time reward"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM user_claims WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = await db.fetchone("SELECT 1 FROM user_claims WHERE user_id = ?", (user_id,))
     return row is not None
 
-def mark_reward_claimed(user_id):
+async def mark_reward_claimed(user_id):
     """Mark user as having claimed reward"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
+    await db.execute(
         "INSERT OR REPLACE INTO user_claims (user_id, last_claim) VALUES (?, ?)",
         (user_id, int(time.time()))
     )
-    conn.commit()
-    conn.close()
 
 @app.on_message(filters.command("reward"))
 async def reward_command(client, message):
     user_id = message.from_user.id
 
     # Check if already claimed
-    if has_claimed_reward(user_id):
+    if await has_claimed_reward(user_id):
         await message.reply("❌ You have already claimed your special reward!")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
     # First try Cinematic Legend video cards
-    cur.execute("""
-        SELECT id, name, anime, event, media_file
-          FROM waifu_cards
-         WHERE rarity = 'Cinematic Legend'
-           AND LOWER(media_type) = 'video'
-         ORDER BY RANDOM() LIMIT 1
-    """)
-    row = cur.fetchone()
+    row = sampler.fetch_random(REWARD_COLUMNS, rarities=["Cinematic Legend"], video=True)
 
     # Fallback: if none, give any video card
     if not row:
-        cur.execute("""
-            SELECT id, name, anime, event, media_file
-              FROM waifu_cards
-             WHERE LOWER(media_type) = 'video'
-             ORDER BY RANDOM() LIMIT 1
-        """)
-        row = cur.fetchone()
-
-    conn.close()
+        row = sampler.fetch_random(REWARD_COLUMNS, video=True)
 
     if not row:
         await message.reply("❌ No video cards available in the database.")
@@ -90,8 +44,8 @@ async def reward_command(client, message):
     waifu_id, name, anime, theme, media_file = row
 
     # Save reward in inventory
-    add_waifu_to_inventory(user_id, waifu_id)
-    mark_reward_claimed(user_id)
+    await db.collect_waifu(user_id, waifu_id, reason="reward")
+    await mark_reward_claimed(user_id)
 
     # Send video preview
     caption = (
@@ -103,4 +57,4 @@ async def reward_command(client, message):
         "✨ Added to your inventory!"
     )
 
-    await message.reply_video(media_file, caption=caption)
+    await send_card(message, "video", media_file, caption)
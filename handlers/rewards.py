@@ -2,27 +2,25 @@
 
 from pyrogram import filters, types
 from config import Config, app
-from database import Database
+from database import get_db
 from datetime import datetime, timedelta
+from membership import MembershipCache
+import lifecycle
 
-db = Database()
+db = get_db()
 
 SUPPORT_GROUP = "@Alisabotsupport"
 SUPPORT_CHANNEL = "@AlisaMikhailovnaKujoui"
 
+membership = MembershipCache(app, (SUPPORT_GROUP, SUPPORT_CHANNEL))
+lifecycle.on_startup(membership.start)
+lifecycle.on_shutdown(membership.stop)
+
 # ---------------- Helper Functions ----------------
 
 async def is_member(user_id):
-    """Check if user is member of both group and channel."""
-    try:
-        group_status = await app.get_chat_member(SUPPORT_GROUP, user_id)
-        channel_status = await app.get_chat_member(SUPPORT_CHANNEL, user_id)
-        # If not banned or left
-        if group_status.status not in ["left", "kicked"] and channel_status.status not in ["left", "kicked"]:
-            return True
-        return False
-    except:
-        return False
+    """Check if user is member of both group and channel (cached, see membership.py)."""
+    return await membership.is_member(user_id)
 
 async def send_claim_prompt(message, reward_type, reward_amount, user_id):
     """Send join buttons or claim button based on membership."""
@@ -50,10 +48,10 @@ async def send_claim_prompt(message, reward_type, reward_amount, user_id):
 
 async def give_reward(user_id, reward_type, reward_amount, cooldown, message=None):
     """Grant reward with cooldown check."""
-    db.add_user(user_id, message.from_user.username if message else None,
+    await db.add_user(user_id, message.from_user.username if message else None,
                 message.from_user.first_name if message else None)
 
-    last_claim = db.get_last_claim(user_id, reward_type)
+    last_claim = await db.get_last_claim(user_id, reward_type)
     if last_claim:
         last_claim_dt = datetime.fromisoformat(last_claim)
         if datetime.utcnow() - last_claim_dt < cooldown:
@@ -61,8 +59,8 @@ async def give_reward(user_id, reward_type, reward_amount, cooldown, message=Non
                 await message.reply_text(f"⏳ You already claimed your **{reward_type} reward**! Try again later.")
             return False
 
-    db.add_crystals(user_id, **{reward_type: reward_amount})
-    db.update_last_claim(user_id, reward_type, datetime.utcnow().isoformat())
+    await db.credit_crystals(user_id, reward_amount, reason=f"{reward_type}_reward")
+    await db.update_last_claim(user_id, reward_type, datetime.utcnow().isoformat())
 
     if message:
         await message.reply_text(f"✅ You received {reward_amount} 💎 {reward_type} crystals!")
@@ -107,3 +105,20 @@ async def claim_callback(client, callback_query):
         await callback_query.message.edit_text(f"✅ You claimed your {reward_type} reward of {reward_amount} 💎!")
     else:
         await callback_query.answer("⏳ You already claimed this reward.", show_alert=True)
+
+# ---------------- Membership cache upkeep ----------------
+
+# group 0 already has start.py's bot-added logger; this one only watches the support chats
+@app.on_chat_member_updated(group=1)
+async def support_member_updated(client, update):
+    membership.on_member_update(update)
+
+# Remember who was active recently so their membership is re-checked before they claim
+@app.on_message(filters.private | filters.group, group=3)
+async def track_activity(client, message):
+    if message.from_user:
+        membership.seen(message.from_user.id)
+
+@app.on_callback_query(group=3)
+async def track_button_activity(client, callback_query):
+    membership.seen(callback_query.from_user.id)
@@ -0,0 +1,51 @@
+# handlers/rollups.py
+
+from pyrogram import filters
+from config import app, Config
+from database import get_db
+from migrations import rebuild_user_rarities
+
+db = get_db()
+
+# (user_id, rarity) pairs whose stored count disagrees with user_waifus
+RARITY_DRIFT_SQL = """
+    WITH actual AS (
+        SELECT uw.user_id, wc.rarity, SUM(uw.amount) AS count
+          FROM user_waifus uw
+          JOIN waifu_cards wc ON wc.id = uw.waifu_id
+         GROUP BY uw.user_id, wc.rarity
+    ), stored AS (
+        SELECT user_id, rarity, count FROM user_rarities WHERE count != 0
+    )
+    SELECT COUNT(*) FROM (
+        SELECT user_id, rarity FROM (SELECT * FROM actual EXCEPT SELECT * FROM stored)
+        UNION
+        SELECT user_id, rarity FROM (SELECT * FROM stored EXCEPT SELECT * FROM actual)
+    )
+"""
+
+
+# ---------------- /rebuildrarities Command (Owner only) ----------------
+@app.on_message(filters.command("rebuildrarities") & filters.user(Config.OWNER_ID))
+async def rebuild_rarities_cmd(client, message):
+    """
+    Recomputes the per-user rarity rollup behind /profile from user_waifus in
+    one GROUP BY pass and reports how many entries had drifted.
+    """
+    status = await message.reply_text("⏳ Rebuilding rarity rollup...")
+
+    def _rebuild(conn):
+        drift = conn.execute(RARITY_DRIFT_SQL).fetchone()[0]
+        rows = rebuild_user_rarities(conn)
+        return drift, rows
+
+    try:
+        drift, rows = await db.write(_rebuild)
+    except Exception as e:
+        await status.edit_text(f"❌ Rebuild failed: {e}")
+        return
+
+    await status.edit_text(
+        f"✅ Rarity rollup rebuilt: {rows} rows.\n"
+        + ("👌 No drift found." if not drift else f"🔧 Fixed {drift} drifted entr{'y' if drift == 1 else 'ies'}.")
+    )
@@ -1,33 +1,19 @@
 # handlers/sanime.py
 
-import sqlite3
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
 from pyrogram.enums import ParseMode
+from catalogue_stats import get_catalogue_stats
+
+stats = get_catalogue_stats()
 
-DB_PATH = "waifu_bot.db"
 OWNER_ID = 7606646849   # replace with your ID
 ADMIN_IDS = [OWNER_ID]  # add more admin IDs if needed
 
 
-def get_anime_distribution(filter_anime: str = None):
-    """Fetch anime distribution (optionally filter by one anime)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    if filter_anime:
-        cursor.execute(
-            "SELECT anime, COUNT(*) FROM waifu_cards WHERE anime LIKE ? GROUP BY anime ORDER BY COUNT(*) DESC;",
-            (f"%{filter_anime}%",),
-        )
-    else:
-        cursor.execute(
-            "SELECT anime, COUNT(*) FROM waifu_cards GROUP BY anime ORDER BY COUNT(*) DESC;"
-        )
-
-    results = cursor.fetchall()
-    conn.close()
-    return results
+async def get_anime_distribution(filter_anime: str = None):
+    """Anime distribution from the in-memory catalogue stats (optionally filter by one anime)."""
+    return stats.anime_distribution(filter_anime)
 
 
 def format_page(anime_list, page, per_page=10, filter_anime=None):
@@ -88,7 +74,7 @@ async def sanime_handler(client: Client, message: Message):
     args = message.text.split(maxsplit=1)
     filter_anime = args[1].strip() if len(args) > 1 else None
 
-    anime_list = get_anime_distribution(filter_anime)
+    anime_list = await get_anime_distribution(filter_anime)
     if not anime_list:
         await message.reply_text("❌ No anime found in database yet.")
         return
@@ -112,7 +98,7 @@ async def sanime_callback(client: Client, query: CallbackQuery):
     page = int(page_str)
     filter_anime = None if filter_anime == "ALL" else filter_anime
 
-    anime_list = get_anime_distribution(filter_anime)
+    anime_list = await get_anime_distribution(filter_anime)
 
     text = format_page(anime_list, page, filter_anime=filter_anime)
     keyboard = build_keyboard(page, len(anime_list), filter_anime)
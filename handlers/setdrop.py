@@ -1,26 +1,15 @@
 # handlers/setdrop.py
 
-import sqlite3
 from pyrogram import filters
 from pyrogram.types import Message
 from config import Config, app
+from database import get_db
+from card_sampler import get_sampler
+from drop_counter import drop_counters
+from media import send_card
 
-DB_PATH = "waifu_bot.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-
-# Ensure current_drops table exists
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS current_drops (
-    chat_id INTEGER PRIMARY KEY,
-    waifu_id INTEGER,
-    collected_by INTEGER DEFAULT NULL
-)
-""")
-conn.commit()
-
-# In-memory drop counter
-drop_settings = {}  # {chat_id: {"target": int, "count": int}}
+db = get_db()
+sampler = get_sampler()
 
 # ---------------- /setdrop Command ----------------
 @app.on_message(filters.command("setdrop") & filters.group, group=1)
@@ -50,7 +39,7 @@ async def set_drop(client, message: Message):
             return
 
     # Set drop
-    drop_settings[chat_id] = {"target": target_msg, "count": 0}
+    await drop_counters.set_target(chat_id, target_msg)
     await message.reply_text(f"✅ Card drop set! A random card will drop after {target_msg} messages in this group.")
 
 # ---------------- Message Tracker ----------------
@@ -66,24 +55,13 @@ async def drop_tracker(client, message: Message):
     if message.text and message.text.startswith("/"):
         return
 
-    if chat_id not in drop_settings:
+    # Count the message; resets the counter when the drop is due
+    if not drop_counters.hit(chat_id):
         return
 
-    drop_settings[chat_id]["count"] += 1
-    if drop_settings[chat_id]["count"] < drop_settings[chat_id]["target"]:
-        return
-
-    # Reset counter
-    drop_settings[chat_id]["count"] = 0
-
     # Select random card
     try:
-        cursor.execute("""
-            SELECT id, name, anime, rarity, event, media_type, media_file
-            FROM waifu_cards
-            ORDER BY RANDOM() LIMIT 1
-        """)
-        card = cursor.fetchone()
+        card = sampler.fetch_random("id, name, anime, rarity, event, media_type, media_file")
         if not card:
             return
     except Exception as e:
@@ -91,18 +69,14 @@ async def drop_tracker(client, message: Message):
         return
 
     # Save drop
-    cursor.execute(
+    await db.execute(
         "INSERT OR REPLACE INTO current_drops (chat_id, waifu_id, collected_by) VALUES (?, ?, NULL)",
         (chat_id, card[0])
     )
-    conn.commit()
 
     # Send drop message
     drop_text = "🎉 A new waifu card has appeared! 🎴\nType /collect <name> to claim it before someone else!"
     try:
-        if card[5] == "photo":
-            await message.reply_photo(card[6], caption=drop_text)
-        else:
-            await message.reply_video(card[6], caption=drop_text)
+        await send_card(message, card[5], card[6], drop_text)
     except Exception as e:
         print(f"❌ Failed to send drop: {e}")
@@ -3,13 +3,15 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import Config, app
-from database import Database
+from database import get_db
+from assets import get_assets
 from datetime import datetime
-import os
+from functools import partial
 
-db = Database()
+db = get_db()
+assets = get_assets()
 
-# Paths for images
+# Bundled images, uploaded once and then re-sent by file_id
 LOG_IMAGE_PATH = "log.jpg"          # For user log
 WELCOME_IMAGE_PATH = "welcome.jpg"  # For welcome message
 GROUP_LOG_IMAGE = "photo_2025-08-22_11-52-42.jpg"   # For group log
@@ -23,10 +25,10 @@ async def start_cmd(client, message):
     first_name = user.first_name if user.first_name else "Unknown"
 
     # Save user in DB
-    db.add_user(user_id, username, first_name)
+    await db.add_user(user_id, username, first_name)
 
     # --------- One-time User Log (only in DM) ---------
-    if message.chat.type == "private" and not db.is_first_logged(user_id):
+    if message.chat.type == "private" and not await db.is_first_logged(user_id):
         now = datetime.now()
         date_str = now.strftime("%d/%m/%Y")
         time_str = now.strftime("%H:%M:%S")
@@ -43,10 +45,10 @@ async def start_cmd(client, message):
 """
 
         try:
-            if os.path.exists(LOG_IMAGE_PATH):
-                await client.send_photo(
-                    chat_id=Config.SUPPORT_CHAT_ID,
-                    photo=LOG_IMAGE_PATH,
+            if assets.exists(LOG_IMAGE_PATH):
+                await assets.send(
+                    partial(client.send_photo, Config.SUPPORT_CHAT_ID),
+                    LOG_IMAGE_PATH,
                     caption=caption
                 )
             else:
@@ -54,7 +56,7 @@ async def start_cmd(client, message):
                     chat_id=Config.SUPPORT_CHAT_ID,
                     text=caption
                 )
-            db.set_first_logged(user_id)
+            await db.set_first_logged(user_id)
         except Exception as e:
             print(f"❌ Failed to send user log: {e}")
 
@@ -84,9 +86,10 @@ Type /help to explore 🎀
         [InlineKeyboardButton("👑 Owner", url=f"https://t.me/{Config.OWNER_USERNAME.strip('@')}")]
     ])
 
-    if os.path.exists(WELCOME_IMAGE_PATH):
-        await message.reply_photo(
-            photo=WELCOME_IMAGE_PATH,
+    if assets.exists(WELCOME_IMAGE_PATH):
+        await assets.send(
+            message.reply_photo,
+            WELCOME_IMAGE_PATH,
             caption=welcome_text,
             reply_markup=buttons
         )
@@ -107,7 +110,7 @@ async def bot_added_to_group(client, event):
         if event.new_chat_member and event.new_chat_member.user.id == client.me.id:
             # Bot was added to a group
             chat = event.chat
-            db.add_group(chat.id, chat.title)
+            await db.add_group(chat.id, chat.title)
 
             now = datetime.now()
             date_str = now.strftime("%d/%m/%Y")
@@ -123,10 +126,10 @@ async def bot_added_to_group(client, event):
 ⏰ Time: {time_str}
 """
 
-            if os.path.exists(GROUP_LOG_IMAGE):
-                await client.send_photo(
-                    chat_id=Config.SUPPORT_CHAT_ID,
-                    photo=GROUP_LOG_IMAGE,
+            if assets.exists(GROUP_LOG_IMAGE):
+                await assets.send(
+                    partial(client.send_photo, Config.SUPPORT_CHAT_ID),
+                    GROUP_LOG_IMAGE,
                     caption=caption
                 )
             else:
@@ -2,9 +2,13 @@
 
 from pyrogram import filters
 from config import app, Config
-from database import Database
+from database import get_db
+from catalogue_stats import get_catalogue_stats
 
-db = Database()
+db = get_db()
+catalogue_stats = get_catalogue_stats()
+
+KIND_EMOJIS = {"photo": "🖼", "video": "🎬", "animation": "🎞"}
 
 @app.on_message(filters.command("stats"))
 async def stats_cmd(client, message):
@@ -15,13 +19,20 @@ async def stats_cmd(client, message):
         await message.reply_text("❌ This command is **Owner only**.")
         return
 
-    # ----------------- Fetch Stats -----------------
+    # ----------------- Fetch Stats (all kept in memory) -----------------
     # Total users
-    db.cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = db.cursor.fetchone()[0]
+    total_users = db.total_users()
 
     # Total groups
-    total_groups = db.get_total_groups()
+    total_groups = await db.get_total_groups()
+
+    # Catalogue breakdown
+    kinds = " · ".join(
+        f"{KIND_EMOJIS.get(kind, '📄')} {count}" for kind, count in catalogue_stats.top("kind")
+    )
+    events = "\n".join(
+        f"  🎀 {event or 'None'}: {count}" for event, count in catalogue_stats.top("event", 5)
+    )
 
     # ----------------- Prepare & Send Message -----------------
     stats_text = f"""
@@ -29,5 +40,10 @@ async def stats_cmd(client, message):
 
 👥 Total Users: {total_users}
 👑 Total Groups Bot Added: {total_groups}
+
+🎴 Total Cards: {catalogue_stats.total} ({kinds or '—'})
+🎬 Anime: {len(catalogue_stats.counts['anime'])}
+🎀 Top Events:
+{events or '  —'}
 """
     await message.reply_text(stats_text)
@@ -1,96 +1,54 @@
 # handlers/trade.py
-import sqlite3
 import time
 import traceback
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, Message
 from config import app
+from database import get_db, grant_waifu, take_waifu
+from catalogue import get_catalogue
+from media import send_card
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
+catalogue = get_catalogue()
 
 print("[trade.py] module loaded")
 
 # ----------------- DB helpers -----------------
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+async def card_info(wid: int):
+    """Return card info (id, name, anime, rarity, media_type, media_file) from the catalogue or None."""
+    card = catalogue.get(wid)
+    return card.values("id", "name", "anime", "rarity", "media_type", "media_file") if card else None
 
-def card_info(wid: int):
-    """Return card info from waifu_cards table (id, name, anime, rarity, media_type, media_file) or None."""
-    try:
-        conn = _conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id = ?", (wid,))
-        row = cur.fetchone()
-    finally:
-        conn.close()
-    return row
-
-def user_card_amount(user_id: int, wid: int) -> int:
+async def user_card_amount(user_id: int, wid: int) -> int:
     """Return how many of a card the user has (0 if none)."""
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, wid))
-    r = cur.fetchone()
-    conn.close()
+    r = await db.fetchone("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, wid))
     return r[0] if r else 0
 
-def _swap_cards_atomic(user_a: int, wid_a: int, user_b: int, wid_b: int) -> bool:
+class _TradeAborted(Exception):
+    pass
+
+def _swap_cards(conn, user_a: int, wid_a: int, user_b: int, wid_b: int):
+    """Swap one unit of wid_a from user_a with one unit of wid_b from user_b (inside a write transaction)."""
+    # re-check ownership/amounts while taking the cards
+    if not take_waifu(conn, user_a, wid_a, reason="trade", counterparty=user_b) \
+            or not take_waifu(conn, user_b, wid_b, reason="trade", counterparty=user_a):
+        raise _TradeAborted()
+    grant_waifu(conn, user_b, wid_a, reason="trade", counterparty=user_a)
+    grant_waifu(conn, user_a, wid_b, reason="trade", counterparty=user_b)
+
+async def _swap_cards_atomic(user_a: int, wid_a: int, user_b: int, wid_b: int) -> bool:
     """
     Swap one unit of wid_a from user_a with one unit of wid_b from user_b.
     Returns True on success, False on failure (e.g., insufficient amounts).
     """
-    conn = _conn()
-    cur = conn.cursor()
     try:
-        cur.execute("BEGIN")
-        # re-check ownership/amounts
-        cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_a, wid_a))
-        r1 = cur.fetchone()
-        cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_b, wid_b))
-        r2 = cur.fetchone()
-        if not r1 or not r2:
-            conn.rollback()
-            return False
-        a_amt = r1[0]
-        b_amt = r2[0]
-        if a_amt <= 0 or b_amt <= 0:
-            conn.rollback()
-            return False
-
-        # decrement user_a's wid_a
-        if a_amt > 1:
-            cur.execute("UPDATE user_waifus SET amount=amount-1 WHERE user_id=? AND waifu_id=?", (user_a, wid_a))
-        else:
-            cur.execute("DELETE FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_a, wid_a))
-
-        # increment user_b with wid_a
-        cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_b, wid_a))
-        if cur.fetchone():
-            cur.execute("UPDATE user_waifus SET amount=amount+1 WHERE user_id=? AND waifu_id=?", (user_b, wid_a))
-        else:
-            cur.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_b, wid_a))
-
-        # decrement user_b's wid_b
-        if b_amt > 1:
-            cur.execute("UPDATE user_waifus SET amount=amount-1 WHERE user_id=? AND waifu_id=?", (user_b, wid_b))
-        else:
-            cur.execute("DELETE FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_b, wid_b))
-
-        # increment user_a with wid_b
-        cur.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_a, wid_b))
-        if cur.fetchone():
-            cur.execute("UPDATE user_waifus SET amount=amount+1 WHERE user_id=? AND waifu_id=?", (user_a, wid_b))
-        else:
-            cur.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_a, wid_b))
-
-        conn.commit()
+        await db.write(_swap_cards, user_a, wid_a, user_b, wid_b)
         return True
+    except _TradeAborted:
+        return False
     except Exception:
-        conn.rollback()
         traceback.print_exc()
         return False
-    finally:
-        conn.close()
 
 # ----------------- Command handler -----------------
 @app.on_message(filters.command("trade"))
@@ -119,8 +77,8 @@ async def cmd_trade(client, message: Message):
             return
 
         # Check both have the cards
-        a_amt = user_card_amount(user_a, my_wid)
-        b_amt = user_card_amount(user_b, their_wid)
+        a_amt = await user_card_amount(user_a, my_wid)
+        b_amt = await user_card_amount(user_b, their_wid)
         if a_amt <= 0:
             await message.reply_text("❌ You don't own the card you're offering.", parse_mode=None)
             return
@@ -129,8 +87,8 @@ async def cmd_trade(client, message: Message):
             return
 
         # Fetch card details
-        my_card = card_info(my_wid)
-        their_card = card_info(their_wid)
+        my_card = await card_info(my_wid)
+        their_card = await card_info(their_wid)
 
         if not my_card or not their_card:
             await message.reply_text("❌ One of the cards does not exist in the database.")
@@ -157,16 +115,8 @@ async def cmd_trade(client, message: Message):
             f"{message.reply_to_message.from_user.mention}, do you accept this trade?"
         )
 
-        # send card preview (photo/video for offered card)
-        try:
-            if my_media_type == "photo":
-                await message.reply_photo(my_media_file, caption=caption, reply_markup=keyboard, parse_mode=None)
-            elif my_media_type == "video":
-                await message.reply_video(my_media_file, caption=caption, reply_markup=keyboard, parse_mode=None)
-            else:
-                await message.reply_text(caption, reply_markup=keyboard, parse_mode=None)
-        except:
-            await message.reply_text(caption, reply_markup=keyboard, parse_mode=None)
+        # send card preview (photo/video for offered card, text if the media is broken)
+        await send_card(message, my_media_type, my_media_file, caption, reply_markup=keyboard, parse_mode=None)
 
     except Exception as e:
         print("[trade] exception:", e)
@@ -201,7 +151,7 @@ async def cb_trade(client, callback: CallbackQuery):
             return
 
         # accept: perform atomic swap
-        success = _swap_cards_atomic(user_a, my_wid, user_b, their_wid)
+        success = await _swap_cards_atomic(user_a, my_wid, user_b, their_wid)
         if not success:
             try:
                 await callback.message.edit_text("❌ Trade failed: one of the users no longer owns the required card(s).")
@@ -0,0 +1,136 @@
+# inventory_cache.py
+
+"""
+Per-user inventory snapshots.
+
+A snapshot is the user's (waifu_id, amount) rows in /inventory order (amount
+DESC, waifu_id), read with one index range scan together with their total and
+favourite card, and kept in memory, so paging through a collection is a
+bisect instead of a join per page. Card metadata is looked up in the
+catalogue when a page is rendered.
+
+Snapshots are dropped as soon as a write transaction touches the user's
+user_waifus rows (database.on_inventory_change) or their favourite changes
+(invalidate), and the cache is bounded both in users and in total rows (least
+recently used goes first).
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from config import Config
+from database import get_db, hot_query
+
+INVENTORY_ROWS_SQL = hot_query("inventory.snapshot", """
+    SELECT waifu_id, amount FROM user_waifus
+     WHERE user_id = ?
+     ORDER BY amount DESC, waifu_id
+""", (1,))
+
+
+def _load_snapshot(conn, user_id):
+    rows = conn.execute(INVENTORY_ROWS_SQL, (user_id,)).fetchall()
+    fav = conn.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,)).fetchone()
+    return Snapshot(rows, fav[0] if fav else None)
+
+
+class Snapshot:
+    __slots__ = ("rows", "keys", "total", "fav_id")
+
+    def __init__(self, rows, fav_id=None):
+        self.rows = rows                                      # [(waifu_id, amount)]
+        self.keys = [(-amount, wid) for wid, amount in rows]  # sort keys, for bisect
+        self.total = sum(amount for _, amount in rows)
+        self.fav_id = fav_id
+
+    def __len__(self):
+        return len(self.rows)
+
+    def page(self, cursor, limit, before=False):
+        """
+        (rows, has_prev, has_next) for the `limit` rows after the keyset cursor
+        (amount, waifu_id), or before it when `before` is set. No cursor means
+        the first page.
+        """
+        if cursor is None:
+            start = 0
+        elif before:
+            start = max(0, bisect_left(self.keys, (-cursor[0], cursor[1])) - limit)
+        else:
+            start = bisect_right(self.keys, (-cursor[0], cursor[1]))
+        end = start + limit
+        return self.rows[start:end], start > 0, end < len(self.rows)
+
+    def page_number(self, number, limit):
+        """(rows, has_prev, has_next) for the 0-based page `number` (buttons from before keyset cursors)."""
+        start = min(number * limit, max(0, len(self.rows) - 1) // limit * limit)
+        end = start + limit
+        return self.rows[start:end], start > 0, end < len(self.rows)
+
+
+class InventoryCache:
+    def __init__(self, db, max_users=Config.INVENTORY_CACHE_USERS, max_rows=Config.INVENTORY_CACHE_ROWS):
+        self.db = db
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self._snapshots = OrderedDict()  # user_id -> Snapshot, least recently used first
+        self._rows = 0
+        self._loading = {}   # user_id -> loads in flight
+        self._raced = set()  # users whose inventory changed while a load was in flight
+        self.hits = self.misses = 0
+        db.on_inventory_change(self._invalidate)
+
+    def invalidate(self, user_id):
+        """Drop a user's snapshot after a change the inventory hook doesn't see (e.g. the favourite)."""
+        self._invalidate((user_id,))
+
+    def _invalidate(self, user_ids):
+        for user_id in user_ids:
+            snapshot = self._snapshots.pop(user_id, None)
+            if snapshot is not None:
+                self._rows -= len(snapshot)
+            if user_id in self._loading:
+                self._raced.add(user_id)
+
+    async def get(self, user_id):
+        """The user's Snapshot, loading it on a miss."""
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is not None:
+            self._snapshots.move_to_end(user_id)
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        try:
+            snapshot = await self.db.read(_load_snapshot, user_id)
+        finally:
+            self._loading[user_id] -= 1
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+        if user_id in self._raced:
+            # A write landed mid-read: serve this result once but don't keep it
+            if user_id not in self._loading:
+                self._raced.discard(user_id)
+            return snapshot
+        self._store(user_id, snapshot)
+        return snapshot
+
+    def _store(self, user_id, snapshot):
+        old = self._snapshots.pop(user_id, None)
+        if old is not None:
+            self._rows -= len(old)
+        if len(snapshot) > self.max_rows:
+            return  # one huge collection shouldn't flush everybody else
+        self._snapshots[user_id] = snapshot
+        self._rows += len(snapshot)
+        while len(self._snapshots) > self.max_users or self._rows > self.max_rows:
+            _, evicted = self._snapshots.popitem(last=False)
+            self._rows -= len(evicted)
+
+    def __len__(self):
+        return len(self._snapshots)
+
+
+# ---------------- Shared instance ----------------
+inventory_cache = InventoryCache(get_db())
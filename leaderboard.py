@@ -0,0 +1,142 @@
+# leaderboard.py
+
+"""
+Cached top-N leaderboards over the user_totals counters.
+
+user_totals is kept current inside the same transactions that change
+user_waifus / crystals (see database.bump_totals), so a leaderboard is an
+index walk over N rows. The result is cached here and only dropped when a
+committed change touches a listed user or reaches the current cut-off.
+
+Today/week/month tops come from collection_buckets (one row per user per UTC
+day, see database.record_collection): a window is a range of a few days on
+the primary key, and buckets older than BUCKET_RETENTION_DAYS are pruned.
+"""
+
+import asyncio
+import time
+
+from database import get_db, hot_query
+import lifecycle
+
+TOP_SIZE = 10
+BUCKET_RETENTION_DAYS = 35      # longest window is 30 days
+PRUNE_INTERVAL = 60 * 60        # seconds between retention passes
+
+
+class Leaderboard:
+    def __init__(self, db, column, size=TOP_SIZE):
+        assert column in ("cards", "crystals")
+        self.db = db
+        self.column = column
+        self.size = size
+        self._field = 0 if column == "cards" else 1  # position in the commit payload
+        self._rows = None     # [(user_id, username, value)], None when stale
+        self._members = set()
+        self._cutoff = None
+        self._version = 0
+        self._sql = hot_query(f"leaderboard.{column}", f"""
+            SELECT t.user_id, u.username, t.{column}
+              FROM user_totals t
+              LEFT JOIN users u ON u.user_id = t.user_id
+             ORDER BY t.{column} DESC, t.user_id
+             LIMIT ?
+        """, (size,))
+        db.on_commit(self._on_commit)
+
+    def _on_commit(self, touched):
+        if self._rows is None:
+            return
+        for user_id, totals in touched.items():
+            if user_id in self._members or len(self._rows) < self.size or totals[self._field] >= self._cutoff:
+                self._invalidate()
+                return
+
+    def _invalidate(self):
+        self._rows = None
+        self._version += 1
+
+    async def top(self):
+        """[(user_id, username, value)] for the top `size` users."""
+        if self._rows is not None:
+            return self._rows
+        version = self._version
+        rows = await self.db.fetchall(self._sql, (self.size,))
+        # Don't cache a result that a commit may have overtaken while we read
+        if version == self._version:
+            self._rows = rows
+            self._members = {row[0] for row in rows}
+            self._cutoff = rows[-1][2] if rows else None
+        return rows
+
+
+# ---------------- Windowed tops ----------------
+TODAY_TOP_SQL = hot_query("leaderboard.today", """
+    SELECT b.user_id, u.username, b.cards
+      FROM collection_buckets b
+      LEFT JOIN users u ON u.user_id = b.user_id
+     WHERE b.day = ?
+     ORDER BY b.cards DESC, b.user_id
+     LIMIT ?
+""", (20000, TOP_SIZE))
+
+WINDOW_TOP_SQL = hot_query("leaderboard.window", """
+    SELECT b.user_id, u.username, SUM(b.cards) AS total
+      FROM collection_buckets b
+      LEFT JOIN users u ON u.user_id = b.user_id
+     WHERE b.day BETWEEN ? AND ?
+     GROUP BY b.user_id
+     ORDER BY total DESC, b.user_id
+     LIMIT ?
+""", (19994, 20000, TOP_SIZE))
+
+
+def utc_day(ts=None):
+    """Bucket key: whole UTC days since the epoch."""
+    return int(time.time() if ts is None else ts) // 86400
+
+
+async def window_top(days, size=TOP_SIZE):
+    """[(user_id, username, cards)] collected over the last `days` UTC days, today included."""
+    today = utc_day()
+    if days == 1:
+        return await get_db().fetchall(TODAY_TOP_SQL, (today, size))
+    return await get_db().fetchall(WINDOW_TOP_SQL, (today - days + 1, today, size))
+
+
+# ---------------- Bucket retention ----------------
+_prune_task = None
+
+
+async def prune_buckets():
+    cur = await get_db().execute(
+        "DELETE FROM collection_buckets WHERE day < ?", (utc_day() - BUCKET_RETENTION_DAYS,)
+    )
+    if cur.rowcount:
+        print(f"🧹 Pruned {cur.rowcount} old collection buckets")
+
+
+async def _prune_loop():
+    while True:
+        try:
+            await prune_buckets()
+        except Exception as e:
+            print(f"❌ Bucket retention failed: {e}")
+        await asyncio.sleep(PRUNE_INTERVAL)
+
+
+@lifecycle.on_startup
+async def _start_retention():
+    global _prune_task
+    _prune_task = asyncio.create_task(_prune_loop())
+
+
+@lifecycle.on_shutdown
+async def _stop_retention():
+    if _prune_task:
+        _prune_task.cancel()
+
+
+# ---------------- Shared instances ----------------
+card_board = Leaderboard(get_db(), "cards")
+crystal_board = Leaderboard(get_db(), "crystals")
@@ -0,0 +1,169 @@
+# ledger.py
+
+"""
+Append-only economy ledger.
+
+Every crystal credit/debit and card grant/removal made through the database
+helpers (credit, debit, grant_waifu, take_waifu) produces an entry inside its
+transaction: who, counterparty, card, card and crystal deltas, reason, chat.
+Committed entries are queued here in memory and written to economy_ledger in
+one batched transaction every Config.LEDGER_FLUSH_MS, or as soon as
+Config.LEDGER_FLUSH_EVENTS are waiting, and once more on shutdown, so the
+audit trail costs one commit per batch instead of one per event.
+
+replay() rebuilds every balance and inventory from the ledger alone and
+verify() compares the result with user_totals / user_waifus (/ledger verify).
+"""
+
+import asyncio
+import time
+
+from config import Config
+from database import get_db
+import lifecycle
+
+ENTRY_FIELDS = ("at", "user_id", "counterparty", "waifu_id", "cards", "crystals", "reason", "chat_id")
+INSERT_SQL = f"INSERT INTO economy_ledger ({', '.join(ENTRY_FIELDS)}) VALUES ({', '.join('?' * len(ENTRY_FIELDS))})"
+
+USER_ENTRIES_SQL = f"""
+    SELECT id, {', '.join(ENTRY_FIELDS)} FROM economy_ledger
+     WHERE user_id = ? ORDER BY id DESC LIMIT ?
+"""
+
+
+# ---------------- Replay ----------------
+def replay(conn, pending=()):
+    """
+    Balances and inventories as the ledger tells them: ({user_id: crystals},
+    {(user_id, waifu_id): amount}), zero rows left out. `pending` entries
+    (queued, not yet written) are applied on top.
+    """
+    balances = dict(conn.execute(
+        "SELECT user_id, SUM(crystals) FROM economy_ledger WHERE crystals != 0 GROUP BY user_id"
+    ).fetchall())
+    inventories = {
+        (user_id, waifu_id): amount for user_id, waifu_id, amount in conn.execute("""
+            SELECT user_id, waifu_id, SUM(cards) FROM economy_ledger
+             WHERE waifu_id IS NOT NULL AND cards != 0
+             GROUP BY user_id, waifu_id
+        """)
+    }
+    for _, user_id, _, waifu_id, cards, crystals, _, _ in pending:
+        if crystals:
+            balances[user_id] = balances.get(user_id, 0) + crystals
+        if cards and waifu_id is not None:
+            inventories[(user_id, waifu_id)] = inventories.get((user_id, waifu_id), 0) + cards
+    return (
+        {k: v for k, v in balances.items() if v},
+        {k: v for k, v in inventories.items() if v},
+    )
+
+
+def _diff(expected, actual):
+    """[(key, ledger value, stored value)] for every key the two dicts disagree on."""
+    return [
+        (key, expected.get(key, 0), actual.get(key, 0))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key, 0) != actual.get(key, 0)
+    ]
+
+
+def verify(conn, pending=()):
+    """(balance mismatches, inventory mismatches), each [(key, ledger, stored)]."""
+    balances, inventories = replay(conn, pending)
+    stored_balances = dict(conn.execute("SELECT user_id, crystals FROM user_totals WHERE crystals != 0"))
+    stored_inventories = {
+        (user_id, waifu_id): amount for user_id, waifu_id, amount in conn.execute(
+            "SELECT user_id, waifu_id, amount FROM user_waifus WHERE amount != 0"
+        )
+    }
+    return _diff(balances, stored_balances), _diff(inventories, stored_inventories)
+
+
+# ---------------- Batched writer ----------------
+class EconomyLedger:
+    def __init__(self, db, flush_ms=Config.LEDGER_FLUSH_MS, flush_events=Config.LEDGER_FLUSH_EVENTS):
+        self.db = db
+        self.flush_seconds = flush_ms / 1000
+        self.flush_events = flush_events
+        self._queue = []
+        self._pending = asyncio.Event()  # something is queued
+        self._full = asyncio.Event()     # flush_events are queued: don't wait for the timer
+        self._lock = asyncio.Lock()      # one batch at a time, so entries keep their order
+        self._loop_task = None
+        self.written = self.batches = 0
+        self.last_flush_ms = 0.0
+        db.on_ledger(self._enqueue)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def pending(self):
+        return list(self._queue)
+
+    def _enqueue(self, entries):
+        self._queue.extend(entries)
+        self._pending.set()
+        if len(self._queue) >= self.flush_events:
+            self._full.set()
+
+    async def flush(self):
+        """Write everything queued in one transaction. Returns the number of entries written."""
+        async with self._lock:
+            if not self._queue:
+                return 0
+            batch, self._queue = self._queue, []
+            self._full.clear()
+            started = time.perf_counter()
+            try:
+                await self.db.executemany(INSERT_SQL, batch)
+            except Exception as e:
+                # Put them back in front so the next flush retries in order
+                self._queue[:0] = batch
+                print(f"❌ Failed to flush {len(batch)} ledger entries: {e}")
+                return 0
+            if not self._queue:
+                self._pending.clear()
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await self._pending.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if self._queue:
+                await asyncio.sleep(self.flush_seconds)  # a failed flush shouldn't spin
+
+    # ---------------- Lifecycle ----------------
+    async def start(self):
+        self._loop_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+        await self.flush()
+
+
+# ---------------- Shared instance ----------------
+_ledger = None
+
+
+def install(db):
+    """Create the process-wide EconomyLedger on `db` and tie it to the bot's lifecycle; idempotent."""
+    global _ledger
+    if _ledger is None:
+        _ledger = EconomyLedger(db)
+        lifecycle.on_startup(_ledger.start)
+        lifecycle.on_shutdown(_ledger.stop)
+    return _ledger
+
+
+def get_ledger():
+    """Return the process-wide EconomyLedger, installing it on the shared database if needed."""
+    return install(get_db())
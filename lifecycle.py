@@ -0,0 +1,38 @@
+# lifecycle.py
+
+"""
+Startup / shutdown hooks.
+
+Modules register async callables with `on_startup` / `on_shutdown` at import
+time; main.py runs them after the client has started and before it stops, so
+background services get a running event loop and a chance to flush their state.
+"""
+
+_startup = []
+_shutdown = []
+
+
+def on_startup(fn):
+    """Register an async callable to run once the bot has started."""
+    _startup.append(fn)
+    return fn
+
+
+def on_shutdown(fn):
+    """Register an async callable to run before the bot stops (reverse order)."""
+    _shutdown.append(fn)
+    return fn
+
+
+async def run_startup():
+    for fn in _startup:
+        await fn()
+
+
+async def run_shutdown():
+    # Keep going if one hook fails so the others still get to flush
+    for fn in reversed(_shutdown):
+        try:
+            await fn()
+        except Exception as e:
+            print(f"❌ Shutdown hook {getattr(fn, '__qualname__', fn)} failed: {e}")
@@ -2,7 +2,12 @@
 
 import importlib
 import os
+from pyrogram import idle
 from config import app  # import app here
+from database import get_db
+from catalogue import get_catalogue
+import lifecycle
+import ledger
 
 def load_handlers():
     handlers_dir = "handlers"
@@ -15,8 +20,19 @@ def load_handlers():
             except Exception as e:
                 print(f"❌ Failed to load {filename}: {e}")
 
+async def main():
+    await app.start()
+    await lifecycle.run_startup()
+    print("🚀 Bot is running...")
+    await idle()
+    print("🛑 Stopping...")
+    await lifecycle.run_shutdown()
+    await app.stop()
+
 if __name__ == "__main__":
+    db = get_db()  # open the shared connection pool before handlers start using it
+    ledger.install(db)  # records economy entries from the first write on
+    get_catalogue()  # load every card into memory once
     load_handlers()
     print("📦 Handlers loaded successfully!")
-    print("🚀 Bot is running...")
-    app.run()
+    app.run(main())
@@ -0,0 +1,303 @@
+# media.py
+
+"""
+One place that sends a card's picture or clip.
+
+Cards store a media_type and a media_file (a Telegram file_id, or the name of
+a bundled image such as the default card picture). send_card() maps the type
+to the right send method and lets the asset registry swap bundled files for
+their cached file_ids, so no handler re-uploads local images.
+
+Every outcome is remembered per media_file in MediaHealth: the kind that
+actually worked (a "photo" card whose file_id is really a video is sent as a
+video straight away next time) and the kinds that failed. A file Telegram
+rejects outright is skipped without any request until its card is fixed, so a
+broken card costs one failed round trip ever instead of one per command. An
+expired file reference is usually transient: the send is retried once and a
+second failure only falls back for that message, without flagging the file. A
+background pass checks every card's file_id offline and flags the broken ones
+for /mediahealth.
+"""
+
+import asyncio
+import time
+from functools import partial
+
+from pyrogram.errors import (
+    MediaEmpty, MediaInvalid, FileIdInvalid, FileReferenceExpired, FileReferenceInvalid,
+    PhotoInvalid, PhotoInvalidDimensions, PhotoExtInvalid, ImageProcessFailed,
+    VideoContentTypeInvalid, VideoFileInvalid, DocumentInvalid,
+    WebpageMediaEmpty, WebpageCurlFailed, ExternalUrlInvalid,
+)
+from pyrogram.file_id import FileId, FileType
+from pyrogram.types import (
+    InlineQueryResultCachedPhoto, InlineQueryResultCachedVideo, InlineQueryResultCachedAnimation,
+)
+
+from assets import get_assets
+from catalogue import get_catalogue
+from config import Config
+from database import get_db
+import lifecycle
+
+PHOTO_TYPES = ("photo", "image", "photo_file")
+VIDEO_TYPES = ("video", "mp4")
+ANIMATION_TYPES = ("animation", "gif")
+KINDS = ("photo", "video", "animation")
+
+# Telegram refused the file itself: no send method will work for it
+DEAD_MEDIA_ERRORS = (
+    MediaEmpty, MediaInvalid, FileIdInvalid, FileReferenceInvalid,
+    PhotoInvalid, PhotoInvalidDimensions, PhotoExtInvalid, ImageProcessFailed,
+    VideoContentTypeInvalid, VideoFileInvalid, DocumentInvalid,
+    WebpageMediaEmpty, WebpageCurlFailed, ExternalUrlInvalid,
+)
+
+# Usually gone on the next try: never marks the file broken
+SOFT_MEDIA_ERRORS = (FileReferenceExpired,)
+
+# FileId.decode() type -> send kind
+FILE_TYPE_KINDS = {FileType.PHOTO: "photo", FileType.VIDEO: "video", FileType.ANIMATION: "animation"}
+
+
+def media_kind(media_type):
+    """'photo', 'video', 'animation', or None for a type we don't recognise."""
+    media_type = (media_type or "").lower()
+    if media_type in PHOTO_TYPES:
+        return "photo"
+    if media_type in VIDEO_TYPES:
+        return "video"
+    if media_type in ANIMATION_TYPES:
+        return "animation"
+    return None
+
+
+def file_id_kind(media):
+    """Send kind encoded in a Telegram file_id, or None if it isn't a photo/video/animation id."""
+    try:
+        return FILE_TYPE_KINDS.get(FileId.decode(media).file_type)
+    except Exception:
+        return None
+
+
+# ---------------- Health records ----------------
+class MediaRecord:
+    __slots__ = ("working", "bad", "failures", "last_error")
+
+    def __init__(self, working=None, bad=(), failures=0, last_error=None):
+        self.working = working
+        self.bad = set(bad)
+        self.failures = failures
+        self.last_error = last_error
+
+    @property
+    def dead(self):
+        return self.working is None and self.bad.issuperset(KINDS)
+
+
+class MediaHealth:
+    def __init__(self, db):
+        self.db = db
+        self._records = {}  # media_file -> MediaRecord
+        self.scan_task = None
+        self._loop_task = None
+        self.last_scan = None  # (finished_at, checked, flagged)
+        rows = db.read_blocking(lambda conn: conn.execute(
+            "SELECT media_file, working_kind, bad_kinds, failures, last_error FROM media_health"
+        ).fetchall())
+        for media, working, bad, failures, last_error in rows:
+            self._records[media] = MediaRecord(working, filter(None, (bad or "").split(",")), failures, last_error)
+
+    # ---------------- Lookups ----------------
+    def plan(self, media, kind):
+        """Send kinds to try for `media`, best first; empty when it is known to be broken."""
+        record = self._records.get(media)
+        if record is None:
+            return [kind] + [k for k in KINDS if k != kind]
+        if record.working:
+            return [record.working]
+        return [k for k in [kind] + [k for k in KINDS if k != kind] if k not in record.bad]
+
+    def is_dead(self, media):
+        record = self._records.get(media)
+        return record is not None and record.dead
+
+    def broken(self):
+        """{media_file: MediaRecord} for files no send method works for."""
+        return {media: r for media, r in self._records.items() if r.dead}
+
+    def retyped(self):
+        """{media_file: working kind} for files that only work as another kind."""
+        return {media: r.working for media, r in self._records.items() if r.working}
+
+    # ---------------- Recording ----------------
+    async def record_ok(self, media, kind, requested):
+        record = self._records.get(media)
+        if record is None and kind == requested:
+            return  # the common case: nothing new to remember
+        if record is not None and record.working == kind:
+            return
+        record = self._records.setdefault(media, MediaRecord())
+        record.working = kind
+        await self._save(media, record)
+
+    async def record_failure(self, media, kinds, error):
+        record = self._records.setdefault(media, MediaRecord())
+        record.bad.update(kinds)
+        if record.working in kinds:
+            record.working = None
+        record.failures += 1
+        record.last_error = str(error)[:200]
+        print(f"⚠️ Media {media[:40]} failed as {'/'.join(sorted(kinds))}: {record.last_error}")
+        await self._save(media, record)
+
+    async def record_soft_failure(self, media, error):
+        """Count a transient failure without marking any kind bad."""
+        record = self._records.setdefault(media, MediaRecord())
+        record.failures += 1
+        record.last_error = str(error)[:200]
+        print(f"⚠️ Media {media[:40]} failed for now: {record.last_error}")
+        await self._save(media, record)
+
+    async def forget(self, media):
+        if self._records.pop(media, None) is not None:
+            await self.db.execute("DELETE FROM media_health WHERE media_file=?", (media,))
+
+    async def _save(self, media, record):
+        await self.db.execute("""
+            INSERT OR REPLACE INTO media_health (media_file, working_kind, bad_kinds, failures, last_error, updated_at)
+            VALUES (?, ?, ?, ?, ?, strftime('%s','now'))
+        """, (media, record.working, ",".join(sorted(record.bad)), record.failures, record.last_error))
+
+    # ---------------- Validation pass ----------------
+    async def check(self, media, kind):
+        """Offline check of one media_file; records what it finds. Returns False if it is broken."""
+        if get_assets().locate(media) or media.startswith(("http://", "https://")):
+            return True
+        if "." in media:
+            await self.record_failure(media, KINDS, "bundled file not found")
+            return False
+        actual = file_id_kind(media)
+        if actual is None:
+            await self.record_failure(media, KINDS, "not a photo, video or animation file_id")
+            return False
+        if actual != kind:
+            await self.record_ok(media, actual, kind)
+        return True
+
+    async def scan(self, rate=Config.MEDIA_VALIDATE_RATE):
+        """Check every card's media, `rate` cards per second. Returns (checked, newly flagged)."""
+        checked = flagged = 0
+        for card in list(get_catalogue().by_id.values()):
+            kind = media_kind(card.media_type) or "photo"
+            for media in {card.media_file, card.media_file_id} - {None, ""}:
+                if self.is_dead(media):
+                    continue
+                if not await self.check(media, kind):
+                    flagged += 1
+            checked += 1
+            if checked % rate == 0:
+                await asyncio.sleep(1)
+        self.last_scan = (time.time(), checked, flagged)
+        print(f"🩺 Media check: {checked} cards, {flagged} newly broken files")
+        return checked, flagged
+
+    def start_scan(self):
+        """Start a pass unless one is already running; returns its task."""
+        if self.scan_task is None or self.scan_task.done():
+            self.scan_task = asyncio.create_task(self.scan())
+        return self.scan_task
+
+    async def _scan_loop(self):
+        while True:
+            try:
+                await self.start_scan()
+            except Exception as e:
+                print(f"❌ Media check failed: {e}")
+            await asyncio.sleep(Config.MEDIA_VALIDATE_INTERVAL)
+
+    async def start(self):
+        # Files flagged for an expired file reference before it counted as transient
+        expired = [media for media, r in self._records.items() if r.dead and FileReferenceExpired.ID in (r.last_error or "")]
+        for media in expired:
+            await self.forget(media)
+        self._loop_task = asyncio.create_task(self._scan_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self.scan_task):
+            if task:
+                task.cancel()
+
+
+# ---------------- Sending ----------------
+async def _send_retrying(send, media, caption, **kwargs):
+    """One send, tried a second time if Telegram reports an expired file reference."""
+    try:
+        return await get_assets().send(send, media, caption=caption, **kwargs)
+    except SOFT_MEDIA_ERRORS:
+        return await get_assets().send(send, media, caption=caption, **kwargs)
+
+
+async def send_card(target, media_type, media, caption, chat_id=None, fallback=None, **kwargs):
+    """
+    Send `media` with `caption`, as a reply to the Message `target`, or with
+    `chat_id` through the client `target`. Known-broken files are skipped;
+    `fallback` (a photo) is tried next, then a plain text message. Extra
+    kwargs go to the send call.
+    """
+    if chat_id is None:
+        senders = {"photo": target.reply_photo, "video": target.reply_video, "animation": target.reply_animation}
+        send_text = target.reply_text
+    else:
+        senders = {
+            "photo": partial(target.send_photo, chat_id),
+            "video": partial(target.send_video, chat_id),
+            "animation": partial(target.send_animation, chat_id),
+        }
+        send_text = partial(target.send_message, chat_id)
+
+    attempts = []
+    if media:
+        attempts.append((media, media_kind(media_type) or "photo"))
+    if fallback:
+        attempts.append((fallback, "photo"))
+
+    for item, requested in attempts:
+        for kind in health.plan(item, requested):
+            try:
+                message = await _send_retrying(senders[kind], item, caption, **kwargs)
+            except SOFT_MEDIA_ERRORS as e:
+                await health.record_soft_failure(item, e)
+                break
+            except DEAD_MEDIA_ERRORS as e:
+                await health.record_failure(item, KINDS, e)
+                break
+            except ValueError as e:
+                # Raised locally by pyrogram: wrong kind for this file_id, or not a file_id at all
+                await health.record_failure(item, (kind,), e)
+                continue
+            await health.record_ok(item, kind, requested)
+            return message
+    return await send_text(caption, **kwargs)
+
+
+def inline_result(result_id, media_file, caption, title):
+    """Cached inline result for a card's media, or None if it can't be sent inline."""
+    # Bundled default images are only usable once they have a cached file_id
+    media_file = get_assets().file_id(media_file) or media_file
+    if not media_file or health.is_dead(media_file):
+        return None
+    kind = file_id_kind(media_file)  # an undecodable id would make Telegram reject the whole answer
+    if kind == "photo":
+        return InlineQueryResultCachedPhoto(id=result_id, photo_file_id=media_file, caption=caption)
+    if kind == "video":
+        return InlineQueryResultCachedVideo(id=result_id, video_file_id=media_file, title=title, caption=caption)
+    if kind == "animation":
+        return InlineQueryResultCachedAnimation(id=result_id, animation_file_id=media_file, title=title, caption=caption)
+    return None
+
+
+# ---------------- Shared instance ----------------
+health = MediaHealth(get_db())
+lifecycle.on_startup(health.start)
+lifecycle.on_shutdown(health.stop)
@@ -0,0 +1,172 @@
+# membership.py
+
+"""
+Cached "is this user in our support chats?" checks.
+
+Reward claims used to ask Telegram with get_chat_member for every chat on
+every /daily, /weekly, /monthly and again on the claim button. Answers are now
+kept per (chat, user): a membership for MEMBERSHIP_TTL, a "not a member" only
+for MEMBERSHIP_NEGATIVE_TTL so someone who just joined isn't turned away for
+long. chat_member updates for the watched chats (the bot must be an admin
+there to receive them) overwrite the cached answer as soon as someone joins,
+leaves or is banned, and users seen in the last hour are re-checked in the
+background before their entries expire, so a claim almost never waits on
+Telegram.
+"""
+
+import asyncio
+import time
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import RPCError, UserNotParticipant, FloodWait
+
+from cache import TTLCache
+from config import Config
+
+GONE = (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED)
+
+
+def _chat_key(chat):
+    """'@Name' / 'Name' / a Chat -> lower-case username without the @."""
+    username = chat if isinstance(chat, str) else (chat.username or "")
+    return username.lstrip("@").lower()
+
+
+def is_present(member):
+    """True when a ChatMember (or None for "not in the chat") counts as a member."""
+    if member is None or member.status in GONE:
+        return False
+    if member.status == ChatMemberStatus.RESTRICTED:
+        return bool(member.is_member)
+    return True
+
+
+class MembershipCache:
+    def __init__(self, client, chats, ttl=Config.MEMBERSHIP_TTL, negative_ttl=Config.MEMBERSHIP_NEGATIVE_TTL,
+                 maxsize=Config.MEMBERSHIP_CACHE_SIZE):
+        self.client = client
+        self.chats = tuple(chats)
+        self._watched = {_chat_key(c) for c in self.chats}
+        self._members = TTLCache(maxsize, ttl)             # (chat, user_id) -> True
+        self._outsiders = TTLCache(maxsize, negative_ttl)  # (chat, user_id) -> False
+        self._seen = {}  # user_id -> monotonic time of their last message/button, for prewarming
+        self.rpcs = 0
+        self._task = None
+
+    # ---------------- Lookups ----------------
+    def cached(self, chat, user_id):
+        """True / False from a fresh entry, None when Telegram has to be asked."""
+        key = (_chat_key(chat), user_id)
+        if self._members.get(key):
+            return True
+        if self._outsiders.get(key) is False:
+            return False
+        return None
+
+    async def check(self, chat, user_id):
+        answer = self.cached(chat, user_id)
+        if answer is None:
+            answer = await self._fetch(chat, user_id)
+        return answer
+
+    async def is_member(self, user_id):
+        """True if the user is in every watched chat."""
+        self.seen(user_id)
+        answers = await asyncio.gather(*(self.check(chat, user_id) for chat in self.chats))
+        return all(answers)
+
+    # ---------------- Updates ----------------
+    def record(self, chat, user_id, present):
+        key = (_chat_key(chat), user_id)
+        if present:
+            self._outsiders.pop(key)
+            self._members.set(key, True)
+        else:
+            self._members.pop(key)
+            self._outsiders.set(key, False)
+
+    def on_member_update(self, update):
+        """Apply a ChatMemberUpdated for one of the watched chats; ignores every other chat."""
+        if _chat_key(update.chat) not in self._watched:
+            return False
+        member = update.new_chat_member or update.old_chat_member
+        if member is None or member.user is None:
+            return False
+        self.record(update.chat, member.user.id, is_present(update.new_chat_member))
+        return True
+
+    def seen(self, user_id):
+        self._seen[user_id] = time.monotonic()
+
+    async def _fetch(self, chat, user_id, raise_flood=False):
+        self.rpcs += 1
+        try:
+            present = is_present(await self.client.get_chat_member(chat, user_id))
+        except UserNotParticipant:
+            present = False
+        except FloodWait:
+            if raise_flood:
+                raise
+            return self._stale(chat, user_id)
+        except RPCError as e:
+            # Telegram is busy or the chat is unreachable: keep a stale answer if we have one
+            print(f"⚠️ Membership check {chat}/{user_id} failed: {e}")
+            return self._stale(chat, user_id)
+        except Exception as e:
+            # Timeouts / connection errors must not escape into the reward handlers
+            print(f"⚠️ Membership check {chat}/{user_id} failed: {type(e).__name__}: {e}")
+            return self._stale(chat, user_id)
+        self.record(chat, user_id, present)
+        return present
+
+    def _stale(self, chat, user_id):
+        """Best answer when Telegram can't be asked: an expired membership still counts."""
+        value, _ = self._members.lookup((_chat_key(chat), user_id))
+        return value is True
+
+    # ---------------- Prewarming ----------------
+    def _due(self, chat, user_id, margin):
+        """True when a known membership is missing or expires within `margin` seconds."""
+        key = (_chat_key(chat), user_id)
+        if self._outsiders.get(key) is False:
+            return False  # non-members are re-asked when they claim, not in the background
+        age = self._members.age(key)
+        return age is None or age > self._members.ttl - margin
+
+    async def prewarm(self, window=60 * 60, rate=Config.MEMBERSHIP_PREWARM_RATE,
+                      margin=Config.MEMBERSHIP_PREWARM_INTERVAL):
+        """Re-check users active in the last `window` seconds whose entries expire soon. Returns checks made."""
+        cutoff = time.monotonic() - window
+        for user_id, at in list(self._seen.items()):
+            if at < cutoff:
+                del self._seen[user_id]
+        checks = 0
+        for user_id in list(self._seen):
+            for chat in self.chats:
+                if not self._due(chat, user_id, margin):
+                    continue
+                try:
+                    await self._fetch(chat, user_id, raise_flood=True)
+                except FloodWait:
+                    return checks  # leave the rest to the next pass
+                checks += 1
+                if checks % rate == 0:
+                    await asyncio.sleep(1)
+        return checks
+
+    async def _prewarm_loop(self):
+        while True:
+            await asyncio.sleep(Config.MEMBERSHIP_PREWARM_INTERVAL)
+            try:
+                checks = await self.prewarm()
+                if checks:
+                    print(f"👥 Membership prewarm: {checks} checks for {len(self._seen)} active users")
+            except Exception as e:
+                print(f"❌ Membership prewarm failed: {e}")
+
+    async def start(self):
+        self._task = asyncio.create_task(self._prewarm_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
@@ -0,0 +1,467 @@
+# migrations.py
+
+"""
+Versioned schema migrations.
+
+`migrate(conn)` runs once at startup (from Database.__init__) on the writer
+connection. Each step runs in its own transaction and is recorded in
+`schema_version`, so a step never runs twice. Append new steps to MIGRATIONS;
+never edit one that has already shipped.
+"""
+
+DEFAULT_WAIFU_IMAGE = "photo_2025-08-29_13-53-48.jpg"
+
+
+# ---------------- Helpers ----------------
+def _columns(conn, table):
+    return [info[1] for info in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _add_column(conn, table, column, decl):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# ---------------- Steps ----------------
+def _baseline(conn):
+    """Everything Database.setup*() and the handlers used to create on the fly."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            language TEXT DEFAULT 'en',
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            daily_crystals INTEGER DEFAULT 0,
+            weekly_crystals INTEGER DEFAULT 0,
+            monthly_crystals INTEGER DEFAULT 0,
+            daily_claim TEXT,
+            weekly_claim TEXT,
+            monthly_claim TEXT,
+            first_logged INTEGER DEFAULT 0,
+            store_refresh_claim TEXT
+        )
+    """)
+    # Legacy databases predate some of these columns
+    for col in ["daily_claim", "weekly_claim", "monthly_claim", "store_refresh_claim"]:
+        _add_column(conn, "users", col, "TEXT")
+    _add_column(conn, "users", "first_logged", "INTEGER DEFAULT 0")
+    _add_column(conn, "users", "given_crystals", "INTEGER DEFAULT 0")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            chat_id INTEGER PRIMARY KEY,
+            title TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT,
+            user_id INTEGER,
+            chat_id INTEGER,
+            details TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Profile system
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            level INTEGER DEFAULT 1,
+            rank TEXT DEFAULT 'Newbie',
+            badge TEXT DEFAULT 'None',
+            total_collected INTEGER DEFAULT 0,
+            progress INTEGER DEFAULT 0,
+            balance INTEGER DEFAULT 0,
+            global_position TEXT DEFAULT 'Unranked',
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_rarities (
+            user_id INTEGER,
+            rarity TEXT,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, rarity),
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+
+    # Cards and inventory
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS waifu_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            anime TEXT,
+            rarity TEXT,
+            event TEXT,
+            media_type TEXT,
+            media_file TEXT,
+            media_file_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_waifus (
+            user_id INTEGER,
+            waifu_id INTEGER,
+            amount INTEGER DEFAULT 1,
+            last_collected TEXT,
+            PRIMARY KEY (user_id, waifu_id)
+        )
+    """)
+    _add_column(conn, "user_waifus", "last_collected", "TEXT")
+
+    # Per-feature tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS current_drops (
+            chat_id INTEGER PRIMARY KEY,
+            waifu_id INTEGER,
+            collected_by INTEGER DEFAULT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_claims (
+            user_id INTEGER PRIMARY KEY,
+            last_claim INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_craft (
+            user_id INTEGER PRIMARY KEY,
+            last_claim INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_marry (
+            user_id INTEGER PRIMARY KEY,
+            last_marry INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_fav (
+            user_id INTEGER PRIMARY KEY,
+            waifu_id INTEGER
+        )
+    """)
+
+    # Cards without media fall back to the default image
+    conn.execute("UPDATE waifu_cards SET media_file=? WHERE media_file IS NULL OR media_file=''", (DEFAULT_WAIFU_IMAGE,))
+    conn.execute("UPDATE waifu_cards SET media_file_id=? WHERE media_file_id IS NULL OR media_file_id=''", (DEFAULT_WAIFU_IMAGE,))
+
+
+def _unique_inventory_rows(conn):
+    """
+    Old collect.py/give.py created user_waifus with a surrogate id and no unique
+    key, so one (user, card) pair could end up on several rows. Fold duplicates
+    and rebuild the table keyed by (user_id, waifu_id).
+    """
+    conn.execute("""
+        CREATE TABLE user_waifus_new (
+            user_id INTEGER,
+            waifu_id INTEGER,
+            amount INTEGER DEFAULT 1,
+            last_collected TEXT,
+            PRIMARY KEY (user_id, waifu_id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO user_waifus_new (user_id, waifu_id, amount, last_collected)
+        SELECT user_id, waifu_id, SUM(COALESCE(amount, 1)), MAX(last_collected)
+          FROM user_waifus
+         WHERE user_id IS NOT NULL AND waifu_id IS NOT NULL
+         GROUP BY user_id, waifu_id
+    """)
+    conn.execute("DROP TABLE user_waifus")
+    conn.execute("ALTER TABLE user_waifus_new RENAME TO user_waifus")
+
+
+def _hot_path_indexes(conn):
+    """Indexes behind the handler queries registered with database.hot_query()."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_waifus_waifu ON user_waifus (waifu_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_waifus_last_collected ON user_waifus (last_collected)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_waifu_cards_rarity ON waifu_cards (rarity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_waifu_cards_anime ON waifu_cards (anime)")
+
+
+def _drop_counters(conn):
+    """/setdrop targets and progress, checkpointed by drop_counter.DropCounters."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drop_counters (
+            chat_id INTEGER PRIMARY KEY,
+            target INTEGER NOT NULL,
+            count INTEGER DEFAULT 0,
+            updated_at INTEGER
+        )
+    """)
+
+
+def _inventory_keyset_index(conn):
+    """Covers inventory.py's (amount DESC, waifu_id) keyset pages per user."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_waifus_user_amount ON user_waifus (user_id, amount DESC, waifu_id)")
+
+
+def _broadcast_jobs(conn):
+    """Persistent /announce jobs (see broadcast.py) and dead-chat flags."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            text TEXT,
+            file_id TEXT,
+            status TEXT,
+            status_chat_id INTEGER,
+            status_message_id INTEGER,
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            pruned INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            job_id INTEGER,
+            chat_id INTEGER,
+            state INTEGER DEFAULT 0,
+            PRIMARY KEY (job_id, chat_id)
+        ) WITHOUT ROWID
+    """)
+    _add_column(conn, "users", "blocked", "INTEGER DEFAULT 0")
+    _add_column(conn, "groups", "blocked", "INTEGER DEFAULT 0")
+
+
+def _user_totals(conn):
+    """Per-user card and crystal counters behind /top and /ctop (leaderboard.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_totals (
+            user_id INTEGER PRIMARY KEY,
+            cards INTEGER DEFAULT 0,
+            crystals INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO user_totals (user_id, cards, crystals)
+        SELECT u.user_id,
+               COALESCE((SELECT SUM(amount) FROM user_waifus uw WHERE uw.user_id = u.user_id), 0),
+               COALESCE(u.daily_crystals, 0) + COALESCE(u.weekly_crystals, 0)
+                 + COALESCE(u.monthly_crystals, 0) + COALESCE(u.given_crystals, 0)
+          FROM users u
+    """)
+    # Collectors who never got a users row still count for /top
+    conn.execute("""
+        INSERT OR IGNORE INTO user_totals (user_id, cards)
+        SELECT user_id, SUM(amount) FROM user_waifus GROUP BY user_id
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_totals_cards ON user_totals (cards DESC, user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_totals_crystals ON user_totals (crystals DESC, user_id)")
+
+
+def _collection_buckets(conn):
+    """Cards acquired per user per UTC day (day = epoch seconds // 86400) for /tdtop, /wtop, /mtop."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS collection_buckets (
+            day INTEGER,
+            user_id INTEGER,
+            cards INTEGER DEFAULT 0,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_collection_buckets_day_cards ON collection_buckets (day, cards DESC, user_id)")
+
+
+def rebuild_user_rarities(conn):
+    """Recompute the whole user_rarities rollup from user_waifus in one pass. Returns rows written."""
+    conn.execute("DELETE FROM user_rarities")
+    return conn.execute("""
+        INSERT INTO user_rarities (user_id, rarity, count)
+        SELECT uw.user_id, wc.rarity, SUM(uw.amount)
+          FROM user_waifus uw
+          JOIN waifu_cards wc ON wc.id = uw.waifu_id
+         GROUP BY uw.user_id, wc.rarity
+    """).rowcount
+
+
+def _uploaded_assets(conn):
+    """Telegram file_ids for bundled images, keyed by content hash so an edited file is uploaded again."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS uploaded_assets (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT,
+            file_id TEXT NOT NULL,
+            uploaded_at INTEGER DEFAULT (strftime('%s','now'))
+        )
+    """)
+
+
+def _media_health(conn):
+    """Send outcomes per media_file: which kind works and which are known to fail."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_health (
+            media_file TEXT PRIMARY KEY,
+            working_kind TEXT,
+            bad_kinds TEXT DEFAULT '',
+            failures INTEGER DEFAULT 0,
+            last_error TEXT,
+            updated_at INTEGER DEFAULT (strftime('%s','now'))
+        )
+    """)
+
+
+def _unified_wallet(conn):
+    """
+    Make user_totals.crystals the one crystal balance: fold the old
+    daily/weekly/monthly/given buckets and user_profiles.balance into it and
+    zero those columns (kept only so older rows stay readable).
+    """
+    conn.execute("INSERT OR IGNORE INTO user_totals (user_id) SELECT user_id FROM users")
+    conn.execute("INSERT OR IGNORE INTO user_totals (user_id) SELECT user_id FROM user_profiles WHERE balance != 0")
+    conn.execute("""
+        UPDATE user_totals
+           SET crystals = COALESCE(u.daily_crystals, 0) + COALESCE(u.weekly_crystals, 0)
+                        + COALESCE(u.monthly_crystals, 0) + COALESCE(u.given_crystals, 0)
+          FROM users u
+         WHERE u.user_id = user_totals.user_id
+    """)
+    conn.execute("""
+        UPDATE user_totals SET crystals = crystals + p.balance
+          FROM user_profiles p
+         WHERE p.user_id = user_totals.user_id AND p.balance != 0
+    """)
+    # The old market fallback could push user_profiles.balance below zero
+    conn.execute("UPDATE user_totals SET crystals = 0 WHERE crystals < 0")
+    conn.execute("UPDATE user_profiles SET balance = 0 WHERE balance != 0")
+    conn.execute("""
+        UPDATE users SET daily_crystals = 0, weekly_crystals = 0, monthly_crystals = 0, given_crystals = 0
+         WHERE daily_crystals != 0 OR weekly_crystals != 0 OR monthly_crystals != 0 OR given_crystals != 0
+    """)
+
+
+def _economy_ledger(conn):
+    """
+    Append-only record of every crystal and card movement (ledger.py). Current
+    balances and inventories are written as "opening" entries so replaying the
+    whole ledger reproduces user_totals.crystals and user_waifus.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS economy_ledger (
+            id INTEGER PRIMARY KEY,
+            at INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            counterparty INTEGER,
+            waifu_id INTEGER,
+            cards INTEGER DEFAULT 0,
+            crystals INTEGER DEFAULT 0,
+            reason TEXT NOT NULL,
+            chat_id INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_economy_ledger_user ON economy_ledger (user_id, id)")
+    conn.execute("""
+        INSERT INTO economy_ledger (at, user_id, crystals, reason)
+        SELECT strftime('%s','now'), user_id, crystals, 'opening' FROM user_totals WHERE crystals != 0
+    """)
+    conn.execute("""
+        INSERT INTO economy_ledger (at, user_id, waifu_id, cards, reason)
+        SELECT strftime('%s','now'), user_id, waifu_id, amount, 'opening' FROM user_waifus WHERE amount != 0
+    """)
+
+
+def _pending_state(conn):
+    """Write-through copy of persistent pending interactions (state.py), so they survive restarts."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pending_state (
+            namespace TEXT,
+            key TEXT,
+            value TEXT NOT NULL,
+            expires_at INTEGER NOT NULL,
+            PRIMARY KEY (namespace, key)
+        ) WITHOUT ROWID
+    """)
+
+
+def _drop_last_collected_index(conn):
+    """No query filters or sorts on last_collected since the rankings moved to collection_buckets."""
+    conn.execute("DROP INDEX IF EXISTS idx_user_waifus_last_collected")
+
+
+def _purge_orphan_inventory(conn):
+    """
+    Drop user_waifus rows whose card was deleted. user_totals counted them but
+    the rarity rollup (joined on waifu_cards) did not, so profiles didn't add
+    up. Each removal is written to the ledger as a "purge" entry.
+    """
+    orphans = """
+        SELECT user_id, waifu_id, amount FROM user_waifus
+         WHERE waifu_id NOT IN (SELECT id FROM waifu_cards)
+    """
+    conn.execute(f"""
+        INSERT INTO economy_ledger (at, user_id, waifu_id, cards, reason)
+        SELECT strftime('%s','now'), user_id, waifu_id, -amount, 'purge' FROM ({orphans}) WHERE amount != 0
+    """)
+    conn.execute(f"""
+        UPDATE user_totals SET cards = cards - o.amount
+          FROM (SELECT user_id, SUM(amount) AS amount FROM ({orphans}) GROUP BY user_id) AS o
+         WHERE o.user_id = user_totals.user_id
+    """)
+    conn.execute("DELETE FROM user_waifus WHERE waifu_id NOT IN (SELECT id FROM waifu_cards)")
+
+
+# (version, name, step) — keep in order, append only
+MIGRATIONS = [
+    (1, "baseline", _baseline),
+    (2, "unique_inventory_rows", _unique_inventory_rows),
+    (3, "hot_path_indexes", _hot_path_indexes),
+    (4, "drop_counters", _drop_counters),
+    (5, "inventory_keyset_index", _inventory_keyset_index),
+    (6, "broadcast_jobs", _broadcast_jobs),
+    (7, "user_totals", _user_totals),
+    (8, "collection_buckets", _collection_buckets),
+    (9, "user_rarities_rollup", rebuild_user_rarities),
+    (10, "uploaded_assets", _uploaded_assets),
+    (11, "media_health", _media_health),
+    (12, "unified_wallet", _unified_wallet),
+    (13, "economy_ledger", _economy_ledger),
+    (14, "pending_state", _pending_state),
+    (15, "drop_last_collected_index", _drop_last_collected_index),
+    (16, "purge_orphan_inventory", _purge_orphan_inventory),
+]
+
+
+# ---------------- Runner ----------------
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Switch to WAL and apply every pending step. Returns the schema version."""
+    # journal_mode is persistent and cannot change inside a transaction
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    version = current_version(conn)
+    for step_version, name, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            step(conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (step_version, name))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        print(f"🗄️ Applied migration {step_version}: {name}")
+        version = step_version
+    return version
@@ -0,0 +1,194 @@
+# search_index.py
+
+"""
+In-memory card name search.
+
+Card names and animes are normalized (NFKD, accents stripped, casefolded) and
+split into words. Each distinct word points at the cards that use it, and
+words are reachable both by prefix (bisect over the sorted vocabulary) and by
+substring (trigram postings over the vocabulary). The vocabulary is much
+smaller than the catalogue, so a lookup costs a few set operations no matter
+how many cards there are. The index follows the catalogue through its change
+notifications.
+"""
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+
+from catalogue import get_catalogue
+
+_SPLIT = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    """Casefold and strip accents: 'Rém' and 'REM' both become 'rem'."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+
+def _words(text):
+    return {w for w in _SPLIT.split(text) if w}
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _format_key(key):
+    return ".".join(map(str, key))
+
+
+def _parse_key(cursor):
+    """'rank.length.id' -> tuple, or None for a missing/garbled cursor."""
+    try:
+        rank, length, cid = map(int, cursor.split("."))
+    except ValueError:
+        return None
+    return (rank, length, cid)
+
+
+class SearchIndex:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self._texts = {}     # card id -> (normalized name, normalized anime, name words)
+        self._postings = {}  # word -> {card ids}
+        self._vocab = []     # sorted words, for prefix lookups
+        self._grams = {}     # trigram -> {words}, for substring lookups
+        self._all_ids = []   # sorted card ids, for empty queries
+        for card in catalogue.by_id.values():
+            self._add(card, bulk=True)
+        # Sorted once here instead of an insort per word/card
+        self._vocab = sorted(self._postings)
+        self._all_ids.sort()
+        catalogue.subscribe(self._on_change)
+
+    # ---------------- Maintenance ----------------
+    def _on_change(self, old, new):
+        if old is not None:
+            self._remove(old.id)
+        if new is not None:
+            self._add(new)
+
+    def _add(self, card, bulk=False):
+        name, anime = normalize(card.name), normalize(card.anime)
+        name_words = _words(name)
+        self._texts[card.id] = (name, anime, tuple(name_words))
+        if bulk:
+            self._all_ids.append(card.id)
+        else:
+            insort(self._all_ids, card.id)
+        for word in name_words | _words(anime):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                if not bulk:
+                    insort(self._vocab, word)
+                for gram in _trigrams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            ids.add(card.id)
+
+    def _remove(self, card_id):
+        texts = self._texts.pop(card_id, None)
+        if texts is None:
+            return
+        i = bisect_left(self._all_ids, card_id)
+        if i < len(self._all_ids) and self._all_ids[i] == card_id:
+            self._all_ids.pop(i)
+        for word in _words(texts[0]) | _words(texts[1]):
+            ids = self._postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(card_id)
+            if ids:
+                continue
+            # Last card using this word: drop it from the vocabulary
+            del self._postings[word]
+            self._vocab.pop(bisect_left(self._vocab, word))
+            for gram in _trigrams(word):
+                words = self._grams.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self._grams[gram]
+
+    # ---------------- Lookups ----------------
+    def _words_matching(self, term):
+        """Vocabulary words that start with or contain `term`."""
+        lo = bisect_left(self._vocab, term)
+        hi = bisect_left(self._vocab, term + "\U0010ffff")
+        words = set(self._vocab[lo:hi])
+        if len(term) >= 3:
+            grams = sorted((self._grams.get(g, set()) for g in _trigrams(term)), key=len)
+            if grams and grams[0]:
+                words.update(w for w in set.intersection(*grams) if term in w)
+        return words
+
+    def _cards_matching(self, terms):
+        result = None
+        for term in sorted(terms, key=len, reverse=True):  # longest term is usually the most selective
+            ids = set()
+            for word in self._words_matching(term):
+                ids |= self._postings[word]
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def _rank(self, card_id, query, terms):
+        name, _, name_words = self._texts[card_id]
+        if name == query:
+            rank = 0
+        elif name.startswith(query):
+            rank = 1
+        elif all(any(w.startswith(t) for w in name_words) for t in terms):
+            rank = 2
+        elif all(t in name for t in terms):
+            rank = 3
+        else:
+            rank = 4  # matched through the anime title
+        return (rank, len(name), card_id)
+
+    def search(self, query, limit=50, cursor=""):
+        """
+        Card ids matching every word of `query`, best matches first.
+
+        Returns (ids, next_cursor). The cursor is the sort key of the last id
+        returned, so the next page seeks past it instead of counting an offset;
+        next_cursor is "" on the last page.
+        """
+        query = normalize(query)
+        if not query:
+            start = bisect_right(self._all_ids, int(cursor)) if cursor.isdigit() else 0
+            ids = self._all_ids[start:start + limit]
+            more = start + limit < len(self._all_ids)
+            return ids, (str(ids[-1]) if ids and more else "")
+
+        terms = list(_words(query)) or [query]
+        keyed = ((self._rank(cid, query, terms), cid) for cid in self._cards_matching(terms))
+        after = _parse_key(cursor)
+        if after is not None:
+            keyed = (item for item in keyed if item[0] > after)
+        best = heapq.nsmallest(limit + 1, keyed)
+        ids = [cid for _, cid in best[:limit]]
+        return ids, (_format_key(best[limit - 1][0]) if len(best) > limit else "")
+
+    def name_matches(self, card_id, guess):
+        """/collect check: the normalized guess appears in the card's name."""
+        guess = normalize(guess)
+        texts = self._texts.get(card_id)
+        return bool(guess) and texts is not None and guess in texts[0]
+
+
+# ---------------- Shared instance ----------------
+_index = None
+
+
+def get_search_index():
+    """Return the process-wide SearchIndex, building it on first use."""
+    global _index
+    if _index is None:
+        _index = SearchIndex(get_catalogue())
+    return _index
@@ -0,0 +1,218 @@
+# state.py
+
+"""
+Expiring store for pending interactive state (gift offers, proposals, edit
+and add previews, reset confirmations, buy prompts, cooldowns).
+
+Each handler gets a Namespace with its own TTL; a namespace reads like a
+dict, but entries disappear after their TTL and the whole store is capped at
+Config.STATE_MAX_ENTRIES with least-recently-used eviction, so abandoned
+prompts no longer pile up in module-level dicts for the life of the process.
+
+Expired entries are dropped on access and by a hashed timer wheel: every
+Config.STATE_SWEEP_TICK seconds the sweeper looks only at the slots of keys
+due since its last pass, instead of scanning everything.
+
+A namespace created with persist=True writes its entries (str/int keys,
+JSON-serializable values) through to the pending_state table and reloads the unexpired ones at
+startup, so e.g. a pending gift still works after a restart.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+from config import Config
+from database import get_db
+import lifecycle
+
+WHEEL_SLOTS = 64
+_MISSING = object()
+
+
+class Namespace:
+    def __init__(self, store, name, ttl, persist):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.persist = persist
+
+    def __setitem__(self, key, value):
+        self.store.set(self.name, key, value, self.ttl)
+
+    def __getitem__(self, key):
+        value = self.store.get(self.name, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.store.get(self.name, key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self.store.count(self.name)
+
+    def get(self, key, default=None):
+        return self.store.get(self.name, key, default)
+
+    def pop(self, key, default=_MISSING):
+        value = self.store.pop(self.name, key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return value
+
+
+class StateStore:
+    def __init__(self, db, maxsize=Config.STATE_MAX_ENTRIES, tick=Config.STATE_SWEEP_TICK):
+        self.db = db
+        self.maxsize = maxsize
+        self.tick = tick
+        self._entries = OrderedDict()  # (namespace, key) -> (value, expires_at), least recently used first
+        self._wheel = [set() for _ in range(WHEEL_SLOTS)]
+        self._namespaces = {}
+        self._counts = {}
+        self._writes = set()           # write-through tasks not finished yet
+        self._task = None
+        self._swept_tick = int(time.time() // tick)
+        self.expired = self.evicted = 0
+
+    def namespace(self, name, ttl, persist=False):
+        """Register (or return) the namespace `name` with entries living `ttl` seconds."""
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = self._namespaces[name] = Namespace(self, name, ttl, persist)
+            self._counts[name] = 0
+        return ns
+
+    # ---------------- Access ----------------
+    def get(self, name, key, default=None):
+        entry = self._entries.get((name, key))
+        if entry is None:
+            return default
+        if entry[1] <= time.time():
+            self._drop((name, key), expired=True)
+            return default
+        self._entries.move_to_end((name, key))
+        return entry[0]
+
+    def set(self, name, key, value, ttl):
+        full_key = (name, key)
+        old = self._entries.get(full_key)
+        if old is None:
+            self._counts[name] += 1
+        else:
+            self._wheel[self._slot(old[1])].discard(full_key)
+        expires_at = time.time() + ttl
+        self._entries[full_key] = (value, expires_at)
+        self._entries.move_to_end(full_key)
+        self._wheel[self._slot(expires_at)].add(full_key)
+        if self._namespaces[name].persist:
+            self._write(
+                "INSERT OR REPLACE INTO pending_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (name, json.dumps(key), json.dumps(value), int(expires_at))
+            )
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evicted += 1
+
+    def pop(self, name, key, default=None):
+        entry = self._entries.get((name, key))
+        if entry is None:
+            return default
+        self._drop((name, key))
+        return entry[0] if entry[1] > time.time() else default
+
+    def count(self, name):
+        return self._counts.get(name, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------------- Internals ----------------
+    def _slot(self, expires_at):
+        return int(expires_at // self.tick) % WHEEL_SLOTS
+
+    def _drop(self, full_key, expired=False):
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
+            return
+        self._counts[full_key[0]] -= 1
+        self._wheel[self._slot(entry[1])].discard(full_key)
+        if expired:
+            self.expired += 1
+        if self._namespaces[full_key[0]].persist:
+            self._write("DELETE FROM pending_state WHERE namespace = ? AND key = ?", (full_key[0], json.dumps(full_key[1])))
+
+    def _write(self, sql, params):
+        # Queued on the single writer in call order; awaited on shutdown
+        task = asyncio.get_running_loop().create_task(self.db.execute(sql, params))
+        self._writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"❌ Pending state write failed: {task.exception()}")
+
+    def sweep(self, now=None):
+        """Drop the expired keys of every wheel slot passed since the last sweep. Returns how many went."""
+        now = time.time() if now is None else now
+        current = int(now // self.tick)
+        first = max(self._swept_tick + 1, current - WHEEL_SLOTS + 1)
+        self._swept_tick = current - 1  # the current slot fills up until the tick ends
+        dropped = 0
+        for tick in range(first, current + 1):
+            slot = self._wheel[tick % WHEEL_SLOTS]
+            due = [k for k in slot if self._entries[k][1] <= now]
+            for full_key in due:
+                self._drop(full_key, expired=True)
+            dropped += len(due)
+        return dropped
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"❌ Pending state sweep failed: {e}")
+
+    # ---------------- Lifecycle ----------------
+    async def load(self):
+        """Reload unexpired entries of persistent namespaces and clear out the expired rows."""
+        now = int(time.time())
+        await self.db.execute("DELETE FROM pending_state WHERE expires_at <= ?", (now,))
+        rows = await self.db.fetchall("SELECT namespace, key, value, expires_at FROM pending_state")
+        loaded = 0
+        for name, key, value, expires_at in rows:
+            ns = self._namespaces.get(name)
+            if ns is None or not ns.persist:
+                continue
+            full_key = (name, json.loads(key))
+            if full_key not in self._entries:
+                self._counts[name] += 1
+            self._entries[full_key] = (json.loads(value), expires_at)
+            self._wheel[self._slot(expires_at)].add(full_key)
+            loaded += 1
+        if loaded:
+            print(f"⏳ Restored {loaded} pending interactions")
+
+    async def start(self):
+        await self.load()
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+# ---------------- Shared instance ----------------
+state = StateStore(get_db())
+lifecycle.on_startup(state.start)
+lifecycle.on_shutdown(state.stop)
@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# config.py refuses to import without credentials; the tests never talk to Telegram
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "test")
+
+# Modules build their shared Database at import time: keep it off the real bot database
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="waifu-tests-"), "bot.db"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
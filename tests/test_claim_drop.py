@@ -0,0 +1,47 @@
+# tests/test_claim_drop.py
+
+import asyncio
+
+import pytest
+
+from database import Database
+
+CHAT_ID = -100123
+WAIFU_ID = 7
+CLAIMERS = 300
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=str(tmp_path / "drops.db"), readers=4)
+    yield database
+    database.close()
+
+
+def test_concurrent_claims_have_exactly_one_winner(db):
+    async def race():
+        await db.write(lambda conn: conn.execute(
+            "INSERT INTO current_drops (chat_id, waifu_id, collected_by) VALUES (?, ?, NULL)",
+            (CHAT_ID, WAIFU_ID),
+        ))
+        return await asyncio.gather(*(
+            db.claim_drop(CHAT_ID, WAIFU_ID, user_id) for user_id in range(1, CLAIMERS + 1)
+        ))
+
+    results = asyncio.run(race())
+
+    winners = [user_id for user_id, won in zip(range(1, CLAIMERS + 1), results) if won]
+    assert len(winners) == 1
+    winner = winners[0]
+
+    def snapshot(conn):
+        return (
+            conn.execute("SELECT collected_by FROM current_drops WHERE chat_id = ?", (CHAT_ID,)).fetchone()[0],
+            conn.execute("SELECT user_id, waifu_id, amount FROM user_waifus").fetchall(),
+            conn.execute("SELECT user_id, cards FROM user_totals WHERE cards != 0").fetchall(),
+        )
+
+    collected_by, inventory, totals = db.read_blocking(snapshot)
+    assert collected_by == winner
+    assert inventory == [(winner, WAIFU_ID, 1)]
+    assert totals == [(winner, 1)]
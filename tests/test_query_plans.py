@@ -0,0 +1,39 @@
+# tests/test_query_plans.py
+
+import importlib
+import re
+
+import pytest
+
+from database import get_db, HOT_QUERIES
+
+# Every module that registers queries with hot_query()
+HOT_QUERY_MODULES = (
+    "broadcast", "inventory_cache", "leaderboard",
+    "handlers.checkwaifu", "handlers.collect", "handlers.profile",
+)
+WATCHED_TABLES = ("user_waifus", "waifu_cards")
+
+for module in HOT_QUERY_MODULES:
+    importlib.import_module(module)
+
+
+def watched_names(sql):
+    """The watched tables plus whatever aliases the query gives them."""
+    names = set(WATCHED_TABLES)
+    for match in re.finditer(r"\b(?:%s)\s+(?:AS\s+)?(\w+)" % "|".join(WATCHED_TABLES), sql, re.IGNORECASE):
+        names.add(match.group(1))
+    return names
+
+
+def test_hot_queries_are_registered():
+    assert HOT_QUERIES
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_never_scans_card_tables(name):
+    sql, params = HOT_QUERIES[name]
+    plan = get_db().read_blocking(lambda conn: [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)])
+    names = watched_names(sql)
+    scans = [step for step in plan if step.startswith("SCAN ") and step.split()[1] in names]
+    assert not scans, f"{name}: {'; '.join(scans)}"